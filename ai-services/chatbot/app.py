@@ -1,28 +1,44 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any, Union
 import uvicorn
+import asyncio
 import os
+import logging
 from dotenv import load_dotenv
-from google import genai 
 
 from chatbot_model import MedicationChatbot
 from drug_database import DrugDatabase
-from nlp_processor import NLPProcessor
+from nlp_processor import NLPProcessor, NLP_DATA_DIR
+from gemini_client import GeminiClient, GeminiUnavailable
+from response_cache import SemanticCache, SentenceEncoder, EMBEDDING_MODEL
+from service_common.service_logging import setup_logging, request_id_var, assign_request_id
+from service_common.startup import StartupTimings
+from service_common.fast_responses import FastResponse, ContentNegotiationMiddleware, dumps_json
+
+logger = logging.getLogger(__name__)
 
 # Load environment variables
 load_dotenv()
+setup_logging("chatbot")
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
-# Initialize Gemini client
-client = genai.Client(api_key=GEMINI_API_KEY)
+# /chat/batch limits: messages per batch, Gemini calls in flight and Gemini calls per batch
+CHAT_BATCH_MAX_ITEMS = int(os.getenv("CHAT_BATCH_MAX_ITEMS", 500))
+CHAT_BATCH_GEMINI_CONCURRENCY = int(os.getenv("CHAT_BATCH_GEMINI_CONCURRENCY", 4))
+CHAT_BATCH_GEMINI_BUDGET = int(os.getenv("CHAT_BATCH_GEMINI_BUDGET", 50))
+
+# Pooled async Gemini client, connected on the first low-confidence fallback
+gemini = GeminiClient(api_key=GEMINI_API_KEY)
 
 app = FastAPI(
     title="MediCare Assist Chatbot API",
     description="AI-powered medication assistance chatbot with Gemini integration",
-    version="1.1.0"
+    version="1.1.0",
+    default_response_class=FastResponse
 )
 
 # CORS
@@ -34,10 +50,28 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Serve MessagePack to clients that ask for it
+app.add_middleware(ContentNegotiationMiddleware)
+
+# Tag every log record written while handling a request with its correlation ID
+app.middleware("http")(assign_request_id)
+
+# Seconds spent building each component, reported by /health and startup_report.py
+startup_timings = StartupTimings()
+
 # Initialize custom modules
-chatbot = MedicationChatbot()
-drug_db = DrugDatabase()
-nlp_processor = NLPProcessor()
+chatbot = startup_timings.init('chatbot', MedicationChatbot)
+drug_db = startup_timings.init('drug_db', DrugDatabase)
+nlp_processor = startup_timings.init('nlp_processor', lambda: NLPProcessor(drug_names=drug_db.name_index()))
+
+# Gemini replies reused for repeated and paraphrased questions. The sentence
+# embedding model is loaded on the first cache lookup and unloaded when idle
+# like the other models; until it loads the cache uses its lexical encoder.
+response_cache = SemanticCache()
+chatbot.models.register('embedder', lambda: SentenceEncoder(EMBEDDING_MODEL, NLP_DATA_DIR))
+
+# Set once this worker has finished warming up; served by /ready
+service_ready = False
 
 # Request/response models
 class ChatRequest(BaseModel):
@@ -51,47 +85,274 @@ class ChatResponse(BaseModel):
     suggestions: Optional[List[str]] = []
     drug_info: Optional[Dict[str, Any]] = None
 
+class ChatBatchRequest(BaseModel):
+    messages: List[ChatRequest]
+
+class ChatBatchItem(BaseModel):
+    response: Optional[ChatResponse] = None
+    source: Optional[str] = None
+    error: Optional[str] = None
+
+class ChatBatchResponse(BaseModel):
+    results: List[ChatBatchItem]
+    gemini_calls: int
+
+GEMINI_PROMPT = "You are a friendly and accurate medical assistant. {message}"
+
+async def _rule_based_response(request: ChatRequest) -> Dict[str, Any]:
+    # Step 1: NLP Preprocessing
+    processed_message = await nlp_processor.process_message(request.message.strip())
+
+    # Step 2: Try your existing medication chatbot logic
+    return await chatbot.get_response(
+        message=processed_message,
+        context=request.context,
+        user_id=request.user_id
+    )
+
+def _needs_fallback(response: Dict[str, Any]) -> bool:
+    return response["confidence"] < 0.5 or not response.get("message")
+
+async def _cache_lookup(question: str) -> Dict[str, Any]:
+    """Cache key parts for a question plus any cached Gemini reply"""
+    normalized, entities = nlp_processor.analyze(question)
+    lookup = {
+        "normalized": normalized,
+        "entities": entities,
+        "intent": await nlp_processor.extract_intent(question)
+    }
+    async with chatbot.models.use('embedder') as encoder:
+        if encoder is not None:
+            lookup["embedding"] = await asyncio.get_running_loop().run_in_executor(
+                None, response_cache.embed, question, entities, encoder)
+        else:
+            lookup["embedding"] = response_cache.embed(normalized, entities)
+    cached = response_cache.get(normalized, entities, lookup["intent"], lookup["embedding"])
+    if cached is not None:
+        logger.info("Answering from cache (%s match, similarity %.3f) with a %s reply to %r",
+                    cached["match"], cached["similarity"], cached["source"], cached["question"])
+    lookup["cached"] = cached
+    return lookup
+
+def _cache_store(lookup: Dict[str, Any], question: str, reply: str):
+    response_cache.put(lookup["normalized"], lookup["entities"], reply, question,
+                       source=gemini.model, intent=lookup["intent"], embedding=lookup["embedding"])
+
+def _chat_response(response: Dict[str, Any]) -> ChatResponse:
+    return ChatResponse(
+        response=response["message"],
+        confidence=response["confidence"],
+        suggestions=response.get("suggestions", []),
+        drug_info=response.get("drug_info")
+    )
+
 # ✅ Modified Chat Endpoint with Gemini fallback
 @app.post("/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
     try:
-        user_message = request.message.strip()
-
-        # Step 1: NLP Preprocessing
-        processed_message = nlp_processor.process_message(user_message)
-
-        # Step 2: Try your existing medication chatbot logic
-        response = await chatbot.get_response(
-            message=processed_message,
-            context=request.context,
-            user_id=request.user_id
-        )
+        response = await _rule_based_response(request)
 
         # Step 3: If your model’s confidence is low → use Gemini
-        if response["confidence"] < 0.5 or not response.get("message"):
-            print("⚠️ Low confidence — calling Gemini API")
-            gemini_reply = client.models.generate_content(
-                model="models/gemini-2.0-flash",
-                contents=f"You are a friendly and accurate medical assistant. {user_message}"
-            )
-            response["message"] = gemini_reply.text
-            response["confidence"] = 0.95  # Assume strong confidence for Gemini
+        if _needs_fallback(response):
+            question = request.message.strip()
+            lookup = await _cache_lookup(question)
+            if lookup["cached"] is not None:
+                response["message"] = lookup["cached"]["reply"]
+                response["confidence"] = 0.95
+                return _chat_response(response)
+
+            logger.info("Low confidence, falling back to Gemini")
+            try:
+                response["message"] = await gemini.generate(GEMINI_PROMPT.format(message=question))
+                response["confidence"] = 0.95  # Assume strong confidence for Gemini
+                if response["message"]:
+                    _cache_store(lookup, question, response["message"])
+            except GeminiUnavailable as e:
+                # Keep the rule-based answer rather than failing the chat
+                logger.warning("Gemini fallback unavailable: %s", e)
 
-        return ChatResponse(
-            response=response["message"],
-            confidence=response["confidence"],
-            suggestions=response.get("suggestions", []),
-            drug_info=response.get("drug_info")
-        )
+        return _chat_response(response)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Chat processing error: {str(e)}")
 
+def _sse(event: str, data: Any) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + dumps_json(data) + b"\n\n"
+
+# Streaming chat over Server-Sent Events: confident rule-based answers are sent
+# at once, Gemini fallbacks token by token, and a final "done" event carries the
+# same metadata as /chat
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    # The logging middleware resets this before the body is streamed
+    request_id = request_id_var.get()
+
+    async def events():
+        request_id_var.set(request_id)
+        try:
+            response = await _rule_based_response(request)
+        except Exception as e:
+            yield _sse("error", {"detail": f"Chat processing error: {str(e)}"})
+            return
+
+        if not _needs_fallback(response):
+            yield _sse("start", {"source": "rules"})
+            yield _sse("token", {"text": response["message"]})
+            yield _sse("done", _chat_response(response))
+            return
+
+        question = request.message.strip()
+        lookup = await _cache_lookup(question)
+        cached = lookup["cached"]
+        if cached is not None:
+            response["message"] = cached["reply"]
+            response["confidence"] = 0.95
+            yield _sse("start", {
+                "source": "cache",
+                "match": cached["match"],
+                "similarity": cached["similarity"],
+                "cached_from": cached["source"]
+            })
+            yield _sse("token", {"text": response["message"]})
+            yield _sse("done", _chat_response(response))
+            return
+
+        logger.info("Low confidence, streaming from Gemini")
+        yield _sse("start", {"source": "gemini"})
+        parts = []
+        try:
+            async for text in gemini.stream(GEMINI_PROMPT.format(message=question)):
+                parts.append(text)
+                yield _sse("token", {"text": text})
+            response["confidence"] = 0.95  # Assume strong confidence for Gemini
+            if parts:
+                _cache_store(lookup, question, "".join(parts))
+        except GeminiUnavailable as e:
+            logger.warning("Gemini fallback unavailable: %s", e)
+
+        if parts:
+            response["message"] = "".join(parts)
+        elif response.get("message"):
+            # Nothing came back from Gemini: send the rule-based answer instead
+            yield _sse("token", {"text": response["message"]})
+
+        yield _sse("done", _chat_response(response))
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Batch chat for scripted check-ins: every message goes through the rule-based
+# chatbot in one pass, then low-confidence ones are answered from the cache or
+# by Gemini. Identical questions share one Gemini call, at most
+# CHAT_BATCH_GEMINI_CONCURRENCY run at once and at most CHAT_BATCH_GEMINI_BUDGET
+# are made per batch; the rest keep the rule-based answer. Results come back in
+# request order, with an error per item instead of failing the batch.
+@app.post("/chat/batch", response_model=ChatBatchResponse)
+async def chat_batch(request: ChatBatchRequest):
+    if len(request.messages) > CHAT_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {CHAT_BATCH_MAX_ITEMS} messages per batch")
+
+    results = [ChatBatchItem() for _ in request.messages]
+    responses: Dict[int, Dict[str, Any]] = {}
+
+    # Pass 1: local NLP and rule handlers
+    for index, item in enumerate(request.messages):
+        if not item.message.strip():
+            results[index].error = "Empty message"
+            continue
+        try:
+            responses[index] = await _rule_based_response(item)
+            results[index].source = "rules"
+        except Exception as e:
+            results[index].error = f"Chat processing error: {str(e)}"
+
+    # Pass 2: answer low-confidence messages from the cache, group the rest by question
+    pending: Dict[str, List[int]] = {}
+    lookups: Dict[str, Any] = {}
+    for index, response in responses.items():
+        if not _needs_fallback(response):
+            continue
+        question = request.messages[index].message.strip()
+        lookup = await _cache_lookup(question)
+        if lookup["cached"] is not None:
+            response["message"] = lookup["cached"]["reply"]
+            response["confidence"] = 0.95
+            results[index].source = "cache"
+            continue
+        pending.setdefault(lookup["normalized"], []).append(index)
+        lookups.setdefault(lookup["normalized"], (lookup, question))
+
+    # Pass 3: concurrent Gemini calls within the batch's budget
+    semaphore = asyncio.Semaphore(CHAT_BATCH_GEMINI_CONCURRENCY)
+
+    async def answer(key: str, indices: List[int]):
+        lookup, question = lookups[key]
+        async with semaphore:
+            try:
+                reply = await gemini.generate(GEMINI_PROMPT.format(message=question))
+            except GeminiUnavailable as e:
+                logger.warning("Gemini fallback unavailable: %s", e)
+                return
+        if not reply:
+            return
+        _cache_store(lookup, question, reply)
+        for index in indices:
+            responses[index]["message"] = reply
+            responses[index]["confidence"] = 0.95  # Assume strong confidence for Gemini
+            results[index].source = "gemini"
+
+    groups = list(pending.items())[:CHAT_BATCH_GEMINI_BUDGET]
+    if len(pending) > len(groups):
+        logger.info("Gemini budget reached, %d batch questions keep rule-based answers", len(pending) - len(groups))
+    await asyncio.gather(*(answer(key, indices) for key, indices in groups))
+
+    for index, response in responses.items():
+        results[index].response = _chat_response(response)
+
+    return ChatBatchResponse(results=results, gemini_calls=len(groups))
+
 # Health check
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "service": "chatbot (Gemini integrated)"}
-    
+    return {
+        "status": "healthy",
+        "service": "chatbot (Gemini integrated)",
+        "models": chatbot.models.get_stats(),
+        "gemini": gemini.get_stats(),
+        "cache": response_cache.get_stats(),
+        "startup": startup_timings
+    }
+
+# Readiness probe: only passes once this worker has warmed up
+@app.get("/ready")
+async def readiness_check():
+    if not service_ready:
+        return JSONResponse(status_code=503, content={"status": "starting"})
+    return {"status": "ready"}
+
+# Run a sample message through the local pipeline before serving traffic
+@app.on_event("startup")
+async def startup_event():
+    global service_ready
+    await chatbot.models.start()
+    with startup_timings.measure('warmup'):
+        try:
+            processed_message = await nlp_processor.process_message("What is the dosage of aspirin?")
+            await chatbot.get_response(message=processed_message)
+            service_ready = True
+        except Exception as e:
+            # Stay out of rotation: /ready keeps returning 503
+            logger.error("Error warming up chatbot, not marking ready: %s", e)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    global service_ready
+    service_ready = False
+    await chatbot.models.stop()
+
 
 if __name__ == "__main__":
     uvicorn.run(
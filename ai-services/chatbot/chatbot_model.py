@@ -1,40 +1,68 @@
 import asyncio
+import logging
 import json
-from typing import Dict, List, Any, Optional
-from transformers import pipeline, AutoTokenizer, AutoModelForCausalLM
-import torch
+import os
+from typing import Dict, List, Any, Optional, Tuple
 import re
 
+from model_manager import ModelManager
+from phrase_matcher import PhraseMatcher
+from drug_recognizer import DRUG_LABEL_PREFIX, DrugMention, DrugRecognizer
+
+logger = logging.getLogger(__name__)
+
+# Keyword phrases for each query type, matched anywhere in the message
+INTENT_KEYWORDS = {
+    "interaction": [
+        "interaction", "interact", "mix", "combine", "together",
+        "safe to take", "can i take", "with other"
+    ],
+    "dosage": [
+        "dosage", "dose", "how much", "how many", "mg", "ml",
+        "tablets", "capsules", "when to take"
+    ],
+    "side_effect": [
+        "side effect", "side effects", "adverse", "reaction",
+        "what happens", "symptoms", "feel sick"
+    ],
+    "medication_advice": [
+        "medication", "medicine", "drug", "pill", "prescription",
+        "take", "missed", "forgot", "when", "how"
+    ]
+}
+
 class MedicationChatbot:
     def __init__(self):
         self.model_name = "microsoft/DialoGPT-medium"
-        self.tokenizer = None
-        self.model = None
         self.drug_database = {}
         self.user_contexts = {}
         self.conversation_history = {}
         
-        # Initialize the model
-        self._load_model()
+        # Generative models are loaded only when a handler needs them
+        self.models = ModelManager()
+        self.models.register('dialogpt', self._load_dialogpt)
         
         # Load drug database
         self._load_drug_database()
+        
+        # Compiled once into one matcher: every intent keyword, and every drug
+        # name and misspelling
+        self.drug_recognizer = DrugRecognizer(self._drug_names(), os.getenv('CHATBOT_FORMULARY_FILE'))
+        self.message_router = self._build_message_router()
     
-    def _load_model(self):
-        """Load the pre-trained model and tokenizer"""
-        try:
-            self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
-            self.model = AutoModelForCausalLM.from_pretrained(self.model_name)
-            
-            # Add padding token if it doesn't exist
-            if self.tokenizer.pad_token is None:
-                self.tokenizer.pad_token = self.tokenizer.eos_token
-                
-        except Exception as e:
-            print(f"Error loading model: {e}")
-            # Fallback to a simple rule-based system
-            self.model = None
-            self.tokenizer = None
+    def _load_dialogpt(self) -> Tuple[Any, Any]:
+        """Load the DialoGPT tokenizer and model (blocking)"""
+        from transformers import AutoTokenizer, AutoModelForCausalLM
+        
+        tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        model = AutoModelForCausalLM.from_pretrained(self.model_name, low_cpu_mem_usage=True)
+        model.eval()
+        
+        # Add padding token if it doesn't exist
+        if tokenizer.pad_token is None:
+            tokenizer.pad_token = tokenizer.eos_token
+        
+        return tokenizer, model
     
     def _load_drug_database(self):
         """Load drug information database"""
@@ -63,6 +91,29 @@ class MedicationChatbot:
             }
         }
     
+    def _build_message_router(self) -> PhraseMatcher:
+        """Compile intent keywords (matched anywhere) and drug names (whole words) into one matcher"""
+        phrases: Dict[str, set] = {}
+        for intent, keywords in INTENT_KEYWORDS.items():
+            for keyword in keywords:
+                phrases.setdefault(keyword, set()).add(intent)
+        return PhraseMatcher(phrases, bounded_phrases=self.drug_recognizer.phrases)
+    
+    def _drug_names(self) -> Dict[str, str]:
+        """Map each drug's key and name to its key"""
+        names = {}
+        for drug_key, drug_info in self.drug_database.items():
+            names[drug_key] = drug_key
+            names[drug_info["name"]] = drug_key
+        return names
+    
+    def route(self, message: str) -> Tuple[List[DrugMention], set]:
+        """Every drug mentioned in the message, plus the set of intents found, from one scan"""
+        hits = self.message_router.finditer(message)
+        labels = set().union(*(hit.labels for hit in hits))
+        intents = {label for label in labels if not label.startswith(DRUG_LABEL_PREFIX)}
+        return self.drug_recognizer.mentions(message, hits), intents
+    
     async def get_response(self, message: str, context: Dict[str, Any] = None, user_id: str = None) -> Dict[str, Any]:
         """Generate a response to the user's message"""
         try:
@@ -70,26 +121,28 @@ class MedicationChatbot:
             if user_id:
                 self._update_user_context(user_id, context or {})
             
+            mentions, intents = self.route(message)
+            
             # Check for medication-related queries
-            drug_info = self._extract_drug_info(message)
+            drugs = self._extract_drug_info(mentions)
             
-            if drug_info:
-                return await self._handle_drug_query(message, drug_info, user_id)
+            if drugs:
+                return await self._handle_drug_query(message, drugs, user_id)
             
             # Check for interaction queries
-            if self._is_interaction_query(message):
+            if "interaction" in intents:
                 return await self._handle_interaction_query(message, user_id)
             
             # Check for dosage queries
-            if self._is_dosage_query(message):
+            if "dosage" in intents:
                 return await self._handle_dosage_query(message, user_id)
             
             # Check for side effect queries
-            if self._is_side_effect_query(message):
+            if "side_effect" in intents:
                 return await self._handle_side_effect_query(message, user_id)
             
             # General medication advice
-            if self._is_medication_advice_query(message):
+            if "medication_advice" in intents:
                 return await self._handle_medication_advice_query(message, user_id)
             
             # Generate general response
@@ -102,58 +155,23 @@ class MedicationChatbot:
                 "suggestions": ["Contact your doctor", "Speak with a pharmacist", "Check medication instructions"]
             }
     
-    def _extract_drug_info(self, message: str) -> Optional[Dict[str, Any]]:
-        """Extract drug information from the message"""
-        message_lower = message.lower()
-        
-        for drug_name, drug_info in self.drug_database.items():
-            if drug_name in message_lower or drug_info["name"].lower() in message_lower:
-                return drug_info
-        
-        return None
-    
-    def _is_interaction_query(self, message: str) -> bool:
-        """Check if the message is asking about drug interactions"""
-        interaction_keywords = [
-            "interaction", "interact", "mix", "combine", "together",
-            "safe to take", "can i take", "with other"
-        ]
-        return any(keyword in message.lower() for keyword in interaction_keywords)
-    
-    def _is_dosage_query(self, message: str) -> bool:
-        """Check if the message is asking about dosage"""
-        dosage_keywords = [
-            "dosage", "dose", "how much", "how many", "mg", "ml",
-            "tablets", "capsules", "when to take"
-        ]
-        return any(keyword in message.lower() for keyword in dosage_keywords)
-    
-    def _is_side_effect_query(self, message: str) -> bool:
-        """Check if the message is asking about side effects"""
-        side_effect_keywords = [
-            "side effect", "side effects", "adverse", "reaction",
-            "what happens", "symptoms", "feel sick"
-        ]
-        return any(keyword in message.lower() for keyword in side_effect_keywords)
-    
-    def _is_medication_advice_query(self, message: str) -> bool:
-        """Check if the message is asking for general medication advice"""
-        advice_keywords = [
-            "medication", "medicine", "drug", "pill", "prescription",
-            "take", "missed", "forgot", "when", "how"
-        ]
-        return any(keyword in message.lower() for keyword in advice_keywords)
+    def _extract_drug_info(self, mentions: List[DrugMention]) -> List[Dict[str, Any]]:
+        """Drug information for every known drug mentioned, in order of mention"""
+        drug_keys = dict.fromkeys(mention.drug_key for mention in mentions)
+        return [self.drug_database[key] for key in drug_keys if key in self.drug_database]
     
-    async def _handle_drug_query(self, message: str, drug_info: Dict[str, Any], user_id: str) -> Dict[str, Any]:
+    async def _handle_drug_query(self, message: str, drugs: List[Dict[str, Any]], user_id: str) -> Dict[str, Any]:
         """Handle queries about specific drugs"""
-        response = f"Here's information about {drug_info['name']}:\n\n"
-        response += f"**Dosage:** {drug_info['dosage']}\n\n"
-        
-        if drug_info['side_effects']:
-            response += f"**Common side effects:** {', '.join(drug_info['side_effects'])}\n\n"
-        
-        if drug_info['interactions']:
-            response += f"**Drug interactions:** {', '.join(drug_info['interactions'])}\n\n"
+        response = ""
+        for drug_info in drugs:
+            response += f"Here's information about {drug_info['name']}:\n\n"
+            response += f"**Dosage:** {drug_info['dosage']}\n\n"
+            
+            if drug_info['side_effects']:
+                response += f"**Common side effects:** {', '.join(drug_info['side_effects'])}\n\n"
+            
+            if drug_info['interactions']:
+                response += f"**Drug interactions:** {', '.join(drug_info['interactions'])}\n\n"
         
         response += "⚠️ **Important:** Always consult your healthcare provider before making any changes to your medication regimen."
         
@@ -165,7 +183,7 @@ class MedicationChatbot:
                 "Check for drug interactions",
                 "Consult your doctor"
             ],
-            "drug_info": drug_info
+            "drug_info": drugs[0]
         }
     
     async def _handle_interaction_query(self, message: str, user_id: str) -> Dict[str, Any]:
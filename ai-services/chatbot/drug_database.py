@@ -1,7 +1,6 @@
 import json
 import asyncio
 from typing import Dict, List, Any, Optional
-import requests
 
 class DrugDatabase:
     def __init__(self):
@@ -129,6 +128,15 @@ class DrugDatabase:
             ]
         }
     
+    def name_index(self) -> Dict[str, str]:
+        """Map every drug key, brand name and generic name to its drug key"""
+        index = {}
+        for key, drug_info in self.drugs.items():
+            index[key] = key
+            index[drug_info["name"].lower()] = key
+            index[drug_info["generic_name"].lower()] = key
+        return index
+    
     async def get_drug_info(self, drug_name: str) -> Optional[Dict[str, Any]]:
         """Get comprehensive drug information"""
         drug_key = drug_name.lower().replace(" ", "")
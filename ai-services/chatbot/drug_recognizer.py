@@ -0,0 +1,92 @@
+import logging
+from typing import Dict, Iterable, List, Mapping, NamedTuple, Optional
+
+from phrase_matcher import PhraseHit, PhraseMatcher
+from term_normalizer import load_term_table
+
+logger = logging.getLogger(__name__)
+
+# Frequent misspellings of common drug names, mapped to their drug key
+COMMON_MISSPELLINGS = {
+    'asprin': 'aspirin',
+    'asperin': 'aspirin',
+    'aspirine': 'aspirin',
+    'metforman': 'metformin',
+    'metphormin': 'metformin',
+    'metformine': 'metformin',
+    'lisinipril': 'lisinopril',
+    'lisinoprel': 'lisinopril',
+    'lysinopril': 'lisinopril',
+    'warfrin': 'warfarin',
+    'warfarine': 'warfarin',
+    'ibuprofin': 'ibuprofen',
+    'ibuprophen': 'ibuprofen',
+    'ibuprofren': 'ibuprofen',
+    'acetominophen': 'acetaminophen',
+    'acetaminophin': 'acetaminophen',
+    'tylenal': 'acetaminophen'
+}
+
+# Drug names are labelled with their key behind this prefix, so they can share
+# a matcher with other phrase lists
+DRUG_LABEL_PREFIX = 'drug:'
+
+
+class DrugMention(NamedTuple):
+    drug_key: str
+    text: str
+    start: int
+    end: int
+
+
+class DrugRecognizer:
+    """Find every drug named in a message, whatever the formulary size.
+
+    Brand names, generic names and misspellings are compiled once into a
+    word-boundary ``PhraseMatcher``, so a scan costs the same for three drugs
+    or for a 20k-name formulary and "aspirin" is not found inside
+    "aspirinate". A formulary file (JSON object or CSV of name,drug_key rows)
+    adds to the names given. ``phrases`` can be compiled into a larger
+    matcher and its hits turned into mentions with ``mentions``.
+    """
+
+    def __init__(self, names: Mapping[str, str], formulary_path: Optional[str] = None):
+        self.names: Dict[str, str] = {name.lower(): key for name, key in COMMON_MISSPELLINGS.items()}
+        self.names.update({name.lower(): key for name, key in names.items()})
+        if formulary_path:
+            try:
+                self.names.update({name.lower(): key for name, key in load_term_table(formulary_path).items()})
+            except (OSError, ValueError) as e:
+                logger.error("Error loading formulary %s: %s", formulary_path, e)
+
+        # Drug names, labelled with their key, to match on word boundaries
+        self.phrases = {name: [DRUG_LABEL_PREFIX + key] for name, key in self.names.items()}
+        self.matcher = PhraseMatcher(self.phrases, word_boundary=True)
+
+    @staticmethod
+    def mentions(text: str, hits: Iterable[PhraseHit]) -> List[DrugMention]:
+        """Drug mentions among the hits of a matcher compiled with ``phrases``.
+
+        Where names overlap (e.g. "warfarin" within "warfarin sodium") only the
+        longest counts.
+        """
+        mentions = []
+        covered_until = -1
+        for hit in hits:
+            if hit.start < covered_until:
+                continue
+            for label in hit.labels:
+                if label.startswith(DRUG_LABEL_PREFIX):
+                    mentions.append(DrugMention(label[len(DRUG_LABEL_PREFIX):], text[hit.start:hit.end],
+                                                hit.start, hit.end))
+                    covered_until = hit.end
+                    break
+        return mentions
+
+    def find(self, text: str) -> List[DrugMention]:
+        """Every drug mention in order of position"""
+        return self.mentions(text, self.matcher.finditer(text))
+
+    def drugs(self, text: str) -> List[str]:
+        """Distinct drug keys mentioned, in order of first mention"""
+        return list(dict.fromkeys(mention.drug_key for mention in self.find(text)))
@@ -0,0 +1,112 @@
+import os
+import re
+from functools import lru_cache
+from typing import Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+from phrase_matcher import trie_pattern
+
+# Drug names always recognized, mapped to their drug key; the drug database adds more
+DEFAULT_DRUG_NAMES = {
+    'aspirin': 'aspirin',
+    'metformin': 'metformin',
+    'lisinopril': 'lisinopril',
+    'warfarin': 'warfarin',
+    'ibuprofen': 'ibuprofen',
+    'acetaminophen': 'acetaminophen',
+    'tylenol': 'acetaminophen',
+    'advil': 'ibuprofen',
+    'motrin': 'ibuprofen'
+}
+
+# Dose units, mapped to their canonical abbreviation
+UNITS = {
+    'mg': 'mg', 'milligram': 'mg', 'milligrams': 'mg',
+    'ml': 'ml', 'milliliter': 'ml', 'milliliters': 'ml',
+    'g': 'g', 'gram': 'g', 'grams': 'g',
+    'mcg': 'mcg', 'microgram': 'mcg', 'micrograms': 'mcg',
+    'unit': 'units', 'units': 'units',
+    'tablet': 'tablets', 'tablets': 'tablets',
+    'capsule': 'capsules', 'capsules': 'capsules'
+}
+
+FREQUENCIES = ['once', 'twice', 'three times', 'four times', 'daily', 'weekly', 'monthly', 'as needed']
+
+TIMINGS = ['morning', 'afternoon', 'evening', 'night', 'bedtime', 'with food', 'without food']
+
+# Symptom phrases, mapped to the symptom they describe
+SYMPTOMS = {
+    'pain': 'pain', 'ache': 'pain', 'hurt': 'pain',
+    'headache': 'headache', 'head ache': 'headache',
+    'nausea': 'nausea', 'sick': 'nausea', 'queasy': 'nausea',
+    'dizzy': 'dizziness', 'dizziness': 'dizziness', 'vertigo': 'dizziness',
+    'fatigue': 'fatigue', 'tired': 'fatigue', 'exhausted': 'fatigue',
+    'fever': 'fever', 'temperature': 'fever', 'hot': 'fever',
+    'cough': 'cough', 'coughing': 'cough',
+    'rash': 'rash', 'skin problem': 'rash', 'itchy': 'rash',
+    'bleeding': 'bleeding', 'blood': 'bleeding',
+    'swelling': 'swelling', 'swollen': 'swelling'
+}
+
+
+class EntitySpan(NamedTuple):
+    type: str  # drug, dose, unit, frequency, timing or symptom
+    text: str
+    start: int
+    end: int
+    value: str  # drug key, dose amount, canonical unit or symptom
+
+
+class EntityExtractor:
+    """Extract typed medical entity spans from a message in one regex pass.
+
+    Doses (an amount followed by a unit) and every gazetteer phrase (drug
+    names, frequencies, timings and symptoms) are compiled into a single
+    pattern; the matched phrase is typed by dict lookup. A dose yields a
+    ``dose`` span and a ``unit`` span. Results are cached per lowercased
+    message, so the handlers of one request share a single scan.
+    """
+
+    def __init__(self, drug_names: Optional[Mapping[str, str]] = None, cache_size: Optional[int] = None):
+        self.gazetteer: Dict[str, Tuple[str, str]] = {}
+        for phrase in FREQUENCIES:
+            self.gazetteer[phrase] = ('frequency', phrase)
+        for phrase in TIMINGS:
+            self.gazetteer[phrase] = ('timing', phrase)
+        for phrase, symptom in SYMPTOMS.items():
+            self.gazetteer[phrase] = ('symptom', symptom)
+        for name, drug_key in {**DEFAULT_DRUG_NAMES, **(drug_names or {})}.items():
+            self.gazetteer[name.lower()] = ('drug', drug_key)
+
+        self.pattern = re.compile(
+            rf'(?P<amount>\d+(?:\.\d+)?)\s*(?P<unit>{trie_pattern(UNITS)})(?!\w)'
+            rf'|(?<!\w)(?P<phrase>{trie_pattern(self.gazetteer)})(?!\w)'
+        )
+        self._extract_cached = lru_cache(
+            maxsize=cache_size or int(os.getenv('CHATBOT_ENTITY_CACHE_SIZE', 4096))
+        )(self._scan)
+
+    def _scan(self, text: str) -> Tuple[EntitySpan, ...]:
+        spans = []
+        for match in self.pattern.finditer(text):
+            if match.group('phrase') is not None:
+                entity_type, value = self.gazetteer[match.group('phrase')]
+                spans.append(EntitySpan(entity_type, match.group(0), match.start(), match.end(), value))
+                continue
+            spans.append(EntitySpan('dose', match.group(0), match.start(), match.end(), match.group('amount')))
+            spans.append(EntitySpan('unit', match.group('unit'), match.start('unit'), match.end('unit'),
+                                    UNITS[match.group('unit')]))
+        return tuple(spans)
+
+    def extract(self, text: str) -> Tuple[EntitySpan, ...]:
+        """Entity spans in order of position; span text is lowercased"""
+        return self._extract_cached(text.lower())
+
+    def by_type(self, text: str) -> Dict[str, List[EntitySpan]]:
+        """Entity spans grouped by type"""
+        grouped: Dict[str, List[EntitySpan]] = {}
+        for span in self.extract(text):
+            grouped.setdefault(span.type, []).append(span)
+        return grouped
+
+    def cache_info(self):
+        return self._extract_cached.cache_info()
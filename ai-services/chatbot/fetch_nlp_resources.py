@@ -0,0 +1,67 @@
+"""Download the chatbot's NLTK corpora, spaCy model and embedding model into the local bundle.
+
+Usage:
+    python fetch_nlp_resources.py
+    python fetch_nlp_resources.py --dest /opt/medicare/nlp_data
+
+Run once when building the image or setting up a machine (this is the only
+step that needs network access). The service loads everything from
+``CHATBOT_NLP_DATA_DIR`` (default ``nlp_data/`` next to this file), so point
+that variable at ``--dest`` if you change it.
+"""
+import argparse
+import importlib
+import os
+
+from nlp_processor import NLP_DATA_DIR, NLTK_RESOURCES, SPACY_MODEL
+from response_cache import EMBEDDING_MODEL
+
+
+def fetch_nltk(dest: str):
+    import nltk
+    for resource in NLTK_RESOURCES:
+        if not nltk.download(resource, download_dir=dest, quiet=True):
+            raise SystemExit(f"Could not download NLTK resource {resource}")
+        print(f"nltk: {resource}")
+
+
+def fetch_spacy(dest: str):
+    import spacy
+    try:
+        nlp = spacy.load(SPACY_MODEL)
+    except OSError:
+        from spacy.cli import download
+        download(SPACY_MODEL)
+        importlib.invalidate_caches()
+        nlp = spacy.load(SPACY_MODEL)
+
+    path = os.path.join(dest, SPACY_MODEL)
+    nlp.to_disk(path)
+    print(f"spacy: {SPACY_MODEL} -> {path}")
+
+
+def fetch_embedding_model(dest: str):
+    from transformers import AutoModel, AutoTokenizer
+    path = os.path.join(dest, os.path.basename(EMBEDDING_MODEL))
+    AutoTokenizer.from_pretrained(EMBEDDING_MODEL).save_pretrained(path)
+    AutoModel.from_pretrained(EMBEDDING_MODEL).save_pretrained(path)
+    print(f"transformers: {EMBEDDING_MODEL} -> {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--dest', default=NLP_DATA_DIR, help="Bundle directory (default: %(default)s)")
+    parser.add_argument('--skip-spacy', action='store_true', help="Don't fetch the spaCy model")
+    parser.add_argument('--skip-embeddings', action='store_true', help="Don't fetch the response cache's embedding model")
+    args = parser.parse_args()
+
+    os.makedirs(args.dest, exist_ok=True)
+    fetch_nltk(args.dest)
+    if not args.skip_spacy:
+        fetch_spacy(args.dest)
+    if not args.skip_embeddings:
+        fetch_embedding_model(args.dest)
+
+
+if __name__ == '__main__':
+    main()
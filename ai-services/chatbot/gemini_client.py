@@ -0,0 +1,159 @@
+import asyncio
+import logging
+import os
+import random
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Status codes worth retrying: rate limiting and server-side failures
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class GeminiUnavailable(Exception):
+    """Raised when Gemini could not answer within the deadline"""
+
+
+class GeminiClient:
+    """Async Gemini client with bounded concurrency, deadlines and jittered retries.
+
+    One ``genai.Client`` is created lazily per process and reused, so its HTTP
+    connections are pooled across requests. At most ``max_concurrency`` calls
+    are in flight. Callers that cannot get a slot within ``queue_timeout``
+    seconds, or whose call (including retries) does not finish within
+    ``timeout`` seconds, get ``GeminiUnavailable`` and should fall back to a
+    local answer.
+    """
+
+    def __init__(self, api_key: Optional[str] = None, model: Optional[str] = None,
+                 max_concurrency: Optional[int] = None, timeout: Optional[float] = None,
+                 max_retries: Optional[int] = None, queue_timeout: Optional[float] = None):
+        self.api_key = api_key or os.getenv('GEMINI_API_KEY')
+        self.model = model or os.getenv('GEMINI_MODEL', 'models/gemini-2.0-flash')
+        self.max_concurrency = max_concurrency or int(os.getenv('GEMINI_MAX_CONCURRENCY', 8))
+        self.timeout = timeout or float(os.getenv('GEMINI_TIMEOUT_SECONDS', 15))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv('GEMINI_MAX_RETRIES', 2))
+        self.queue_timeout = queue_timeout or float(os.getenv('GEMINI_QUEUE_TIMEOUT_SECONDS', 2))
+        self._client = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+        self.in_flight = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.retries = 0
+
+    def _get_client(self):
+        if self._client is None:
+            from google import genai
+            self._client = genai.Client(api_key=self.api_key)
+        return self._client
+
+    def _ensure_semaphore(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def _acquire_slot(self):
+        self._ensure_semaphore()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise GeminiUnavailable("All Gemini slots are busy")
+        self.in_flight += 1
+
+    def _release_slot(self):
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    async def _with_retries(self, call: Callable[[], Awaitable[Any]]) -> Any:
+        """Run a Gemini call, retrying rate limits and server errors with full jitter"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await call()
+            except Exception as e:
+                code = getattr(e, 'code', None)
+                if attempt == self.max_retries or (code is not None and code not in RETRYABLE_STATUS_CODES):
+                    raise
+                self.retries += 1
+                logger.warning("Gemini call failed, retrying: %s", e)
+                # Full jitter: spread retries so a burst of failures doesn't retry in lockstep
+                await asyncio.sleep(random.uniform(0, 0.5 * 2 ** attempt))
+
+    async def generate(self, prompt: str) -> str:
+        """Generate a reply, raising GeminiUnavailable on saturation, timeout or error"""
+        try:
+            return await asyncio.wait_for(self._generate_with_slot(prompt), self.timeout)
+        except asyncio.TimeoutError:
+            self.failed += 1
+            raise GeminiUnavailable(f"No reply within {self.timeout}s")
+        except GeminiUnavailable:
+            self.failed += 1
+            raise
+        except Exception as e:
+            self.failed += 1
+            raise GeminiUnavailable(str(e)) from e
+
+    async def _generate_with_slot(self, prompt: str) -> str:
+        await self._acquire_slot()
+        try:
+            reply = await self._with_retries(
+                lambda: self._get_client().aio.models.generate_content(model=self.model, contents=prompt)
+            )
+            self.succeeded += 1
+            return reply.text
+        finally:
+            self._release_slot()
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        """Yield reply text as it is generated.
+
+        The first chunk must arrive within ``timeout`` seconds (retries included)
+        and each later chunk within ``timeout`` of the previous one; otherwise
+        GeminiUnavailable is raised, possibly after some text was yielded.
+        """
+        try:
+            await self._acquire_slot()
+        except GeminiUnavailable:
+            self.failed += 1
+            raise
+
+        try:
+            first, chunks = await asyncio.wait_for(self._with_retries(lambda: self._open_stream(prompt)), self.timeout)
+            chunk = first
+            while chunk is not None:
+                if chunk.text:
+                    yield chunk.text
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), self.timeout)
+                except StopAsyncIteration:
+                    chunk = None
+            self.succeeded += 1
+        except asyncio.TimeoutError:
+            self.failed += 1
+            raise GeminiUnavailable(f"No reply within {self.timeout}s")
+        except Exception as e:
+            self.failed += 1
+            raise GeminiUnavailable(str(e)) from e
+        finally:
+            self._release_slot()
+
+    async def _open_stream(self, prompt: str) -> Tuple[Any, Any]:
+        """Start a streaming call and wait for its first chunk"""
+        chunks = (await self._get_client().aio.models.generate_content_stream(
+            model=self.model, contents=prompt
+        )).__aiter__()
+        try:
+            first = await chunks.__anext__()
+        except StopAsyncIteration:
+            first = None
+        return first, chunks
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get Gemini call statistics"""
+        return {
+            'model': self.model,
+            'max_concurrency': self.max_concurrency,
+            'in_flight': self.in_flight,
+            'succeeded': self.succeeded,
+            'failed': self.failed,
+            'retries': self.retries
+        }
@@ -0,0 +1,47 @@
+"""Production server settings for the chatbot service.
+
+Run from this directory:
+    gunicorn app:app
+
+The app is imported once in the master process (``preload_app``) so the drug
+database, compiled matchers and any models named in ``CHATBOT_PRELOAD_MODELS``
+are built once and shared copy-on-write by the forked workers. NLTK, spaCy and
+the other generative models are loaded lazily, so each worker loads its own
+copy on first use. Send ``SIGHUP`` to the master for a graceful restart: new
+workers are booted before the old ones are drained.
+"""
+import gc
+import os
+import sys
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8001')}"
+workers = int(os.getenv('WEB_CONCURRENCY', os.cpu_count() or 1))
+worker_class = 'uvicorn.workers.UvicornWorker'
+preload_app = True
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+
+# Recycle workers periodically to bound slow leaks (0 disables)
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = max_requests // 10
+
+accesslog = '-'
+
+
+def when_ready(server):
+    # Move everything allocated at import into the permanent generation so
+    # garbage collection in the workers never writes to the shared pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # One full-width torch thread pool per worker would oversubscribe the cores.
+    # torch is imported lazily and sizes its pool from OMP_NUM_THREADS.
+    threads = os.getenv('CHATBOT_TORCH_THREADS', '1')
+    torch = sys.modules.get('torch')
+    if torch is not None:
+        torch.set_num_threads(int(threads))
+    else:
+        os.environ['OMP_NUM_THREADS'] = threads
@@ -0,0 +1,133 @@
+import asyncio
+import gc
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ModelManager:
+    """Load generative models on demand and unload them when idle.
+
+    Models are registered with a zero-argument loader. ``use(name)`` loads the
+    model in a worker thread the first time a handler needs it (concurrent
+    callers share one load) and keeps it while any handler holds it. A
+    background task unloads models that have been idle for ``idle_seconds``.
+    A failed load is remembered: for ``retry_seconds`` afterwards ``use`` yields
+    None straight away instead of trying (and failing) again on every request.
+
+    Models listed in ``CHATBOT_PRELOAD_MODELS`` are loaded at construction and
+    never unloaded. Under the gunicorn preload launcher that happens once in the
+    master, so every worker shares the weights copy-on-write.
+    """
+
+    def __init__(self, idle_seconds: Optional[float] = None, retry_seconds: Optional[float] = None):
+        self.idle_seconds = idle_seconds or float(os.getenv('CHATBOT_MODEL_IDLE_SECONDS', 600))
+        self.retry_seconds = retry_seconds or float(os.getenv('CHATBOT_MODEL_RETRY_SECONDS', 300))
+        self.preload = {name.strip() for name in os.getenv('CHATBOT_PRELOAD_MODELS', '').split(',') if name.strip()}
+        self._models: Dict[str, Dict[str, Any]] = {}
+        self._reaper: Optional[asyncio.Task] = None
+
+    def register(self, name: str, loader: Callable[[], Any]):
+        """Register a model loader; preloaded models are loaded immediately"""
+        self._models[name] = {
+            'loader': loader,
+            'model': None,
+            'state': 'unloaded',
+            'pinned': name in self.preload,
+            'in_use': 0,
+            'last_used': None,
+            'load_seconds': None,
+            'error': None,
+            'failed_at': None,
+            'lock': None
+        }
+        if name in self.preload:
+            self._load(name)
+
+    def _load(self, name: str) -> Any:
+        """Run a model's loader (blocking)"""
+        entry = self._models[name]
+        start = time.perf_counter()
+        try:
+            entry['model'] = entry['loader']()
+            entry['state'] = 'loaded'
+            entry['error'] = None
+            entry['failed_at'] = None
+        except Exception as e:
+            logger.error("Error loading model %s, retrying in %ss: %s", name, self.retry_seconds, e)
+            entry['model'] = None
+            entry['state'] = 'failed'
+            entry['error'] = str(e)
+            entry['failed_at'] = time.time()
+        entry['load_seconds'] = round(time.perf_counter() - start, 3)
+        entry['last_used'] = time.time()
+        return entry['model']
+
+    def _backing_off(self, entry: Dict[str, Any]) -> bool:
+        return entry['failed_at'] is not None and time.time() - entry['failed_at'] < self.retry_seconds
+
+    @asynccontextmanager
+    async def use(self, name: str):
+        """Yield a loaded model (or None if it failed to load) for the duration of a handler"""
+        entry = self._models[name]
+        entry['in_use'] += 1
+        try:
+            if entry['model'] is None and not self._backing_off(entry):
+                if entry['lock'] is None:
+                    entry['lock'] = asyncio.Lock()
+                async with entry['lock']:
+                    if entry['model'] is None and not self._backing_off(entry):
+                        entry['state'] = 'loading'
+                        await asyncio.get_running_loop().run_in_executor(None, self._load, name)
+            yield entry['model']
+        finally:
+            entry['in_use'] -= 1
+            entry['last_used'] = time.time()
+
+    def unload(self, name: str):
+        """Drop a model so its memory can be reclaimed"""
+        entry = self._models[name]
+        entry['model'] = None
+        entry['state'] = 'unloaded'
+        gc.collect()
+
+    async def start(self):
+        """Start the idle reaper"""
+        if self._reaper is None:
+            self._reaper = asyncio.create_task(self._reap_idle())
+
+    async def stop(self):
+        """Stop the idle reaper"""
+        if self._reaper is not None:
+            self._reaper.cancel()
+            await asyncio.gather(self._reaper, return_exceptions=True)
+            self._reaper = None
+
+    async def _reap_idle(self):
+        while True:
+            await asyncio.sleep(min(60.0, self.idle_seconds / 2))
+            now = time.time()
+            for name, entry in self._models.items():
+                if (entry['model'] is not None and not entry['pinned'] and not entry['in_use']
+                        and now - entry['last_used'] > self.idle_seconds):
+                    logger.info("Unloading idle model %s", name)
+                    self.unload(name)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Load state of every registered model"""
+        return {
+            name: {
+                'state': entry['state'],
+                'pinned': entry['pinned'],
+                'in_use': entry['in_use'],
+                'last_used': entry['last_used'],
+                'load_seconds': entry['load_seconds'],
+                'error': entry['error'],
+                'retry_at': entry['failed_at'] + self.retry_seconds if entry['failed_at'] else None
+            }
+            for name, entry in self._models.items()
+        }
@@ -1,73 +1,192 @@
 import re
-import nltk
-import spacy
-from typing import Dict, List, Any, Optional
+import os
+import logging
+import threading
+from typing import Dict, List, Any, Optional, Set, Tuple
 import asyncio
 
-# Download required NLTK data
-try:
-    nltk.download('punkt', quiet=True)
-    nltk.download('stopwords', quiet=True)
-    nltk.download('wordnet', quiet=True)
-    nltk.download('averaged_perceptron_tagger', quiet=True)
-except:
-    pass
+from phrase_matcher import PhraseMatcher
+from term_normalizer import TermNormalizer
+from entity_extractor import EntityExtractor
+
+logger = logging.getLogger(__name__)
+
+# Local bundle of NLTK corpora and the spaCy model, filled by fetch_nlp_resources.py
+NLP_DATA_DIR = os.getenv('CHATBOT_NLP_DATA_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'nlp_data'))
+
+NLTK_RESOURCES = ['punkt', 'stopwords', 'wordnet', 'averaged_perceptron_tagger']
+
+SPACY_MODEL = 'en_core_web_sm'
+
+# Only the entity recognizer is consulted, so the rest of the pipeline is never loaded
+SPACY_UNUSED_PIPES = ['tagger', 'parser', 'attribute_ruler', 'lemmatizer', 'senter']
+
+# Abbreviations expanded in every message; extend with CHATBOT_ABBREVIATIONS_FILE
+ABBREVIATIONS = {
+    'mg': 'milligrams',
+    'ml': 'milliliters',
+    'g': 'grams',
+    'mcg': 'micrograms',
+    'tab': 'tablet',
+    'caps': 'capsule',
+    'bid': 'twice daily',
+    'tid': 'three times daily',
+    'qid': 'four times daily',
+    'qd': 'daily',
+    'prn': 'as needed',
+    'po': 'by mouth',
+    'pr': 'rectally',
+    'im': 'intramuscular',
+    'iv': 'intravenous'
+}
+
+# Variants mapped to one canonical term; extend with CHATBOT_TERM_NORMALIZATIONS_FILE
+TERM_NORMALIZATIONS = {
+    'medication': 'medicine',
+    'medicines': 'medicine',
+    'drugs': 'medicine',
+    'pills': 'tablets',
+    'capsules': 'tablets',
+    'side effect': 'side effects',
+    'adverse effect': 'side effects',
+    'interaction': 'interactions',
+    'dosage': 'dose',
+    'dosing': 'dose'
+}
+
+# Phrases signalling each intent, in priority order
+INTENT_PATTERNS = {
+    'drug_info': [
+        'what is', 'tell me about', 'information about', 'details about',
+        'how does', 'what does', 'explain'
+    ],
+    'dosage': [
+        'how much', 'how many', 'dose', 'dosage', 'when to take',
+        'how often', 'frequency'
+    ],
+    'side_effects': [
+        'side effects', 'adverse effects', 'what happens', 'symptoms',
+        'reactions', 'problems'
+    ],
+    'interactions': [
+        'interaction', 'mix', 'combine', 'together', 'safe to take',
+        'can i take', 'with other'
+    ],
+    'contraindications': [
+        'contraindicated', 'should not take', 'avoid', 'not safe',
+        'allergic', 'pregnancy'
+    ],
+    'general_advice': [
+        'advice', 'tips', 'help', 'guidance', 'recommendation',
+        'suggest', 'what should'
+    ]
+}
+
+# Span types reported under each key of the entity dict used for message context
+ENTITY_KEYS = {
+    'drug': 'medications',
+    'dose': 'dosage',
+    'frequency': 'frequency',
+    'timing': 'time',
+    'symptom': 'symptoms'
+}
 
 class NLPProcessor:
-    def __init__(self):
-        self.stop_words = set()
-        self.lemmatizer = None
-        self.pos_tagger = None
-        self.nlp = None
-        
-        # Initialize NLTK components
-        self._init_nltk()
-        
-        # Initialize spaCy
-        self._init_spacy()
-        
-        # Medical terminology patterns
-        self.medical_patterns = {
-            'dosage': r'\b(\d+\s*(mg|ml|g|mcg|units?|tablets?|capsules?))\b',
-            'frequency': r'\b(once|twice|three times|four times|daily|weekly|monthly|as needed)\b',
-            'time': r'\b(morning|afternoon|evening|night|bedtime|with food|without food)\b',
-            'symptoms': r'\b(pain|headache|nausea|dizziness|fatigue|fever|cough|rash)\b',
-            'medications': r'\b(aspirin|metformin|lisinopril|warfarin|ibuprofen|acetaminophen)\b'
-        }
+    def __init__(self, drug_names: Optional[Dict[str, str]] = None):
+        # NLTK and spaCy are loaded from the local bundle on first use
+        self._stop_words: Optional[Set[str]] = None
+        self._lemmatizer = None
+        self._pos_tagger = None
+        self._nlp = None
+        self._spacy_loaded = False
+        self._load_lock = threading.Lock()
+        
+        # Drugs, doses, frequencies, timings and symptoms found in one pass
+        self.entity_extractor = EntityExtractor(drug_names)
+        
+        # Abbreviation and synonym tables, each compiled into one regex
+        self.abbreviation_normalizer = TermNormalizer(ABBREVIATIONS, os.getenv('CHATBOT_ABBREVIATIONS_FILE'))
+        self.term_normalizer = TermNormalizer(TERM_NORMALIZATIONS, os.getenv('CHATBOT_TERM_NORMALIZATIONS_FILE'))
+        
+        # All intent phrases compiled into one matcher
+        self.intent_matcher = PhraseMatcher({
+            pattern: [intent]
+            for intent, patterns in INTENT_PATTERNS.items()
+            for pattern in patterns
+        })
+    
+    @property
+    def stop_words(self) -> Set[str]:
+        if self._stop_words is None:
+            self._init_nltk()
+        return self._stop_words
+    
+    @property
+    def lemmatizer(self):
+        if self._stop_words is None:
+            self._init_nltk()
+        return self._lemmatizer
+    
+    @property
+    def pos_tagger(self):
+        if self._stop_words is None:
+            self._init_nltk()
+        return self._pos_tagger
+    
+    @property
+    def nlp(self):
+        if not self._spacy_loaded:
+            self._init_spacy()
+        return self._nlp
     
     def _init_nltk(self):
-        """Initialize NLTK components"""
-        try:
-            from nltk.corpus import stopwords
-            from nltk.stem import WordNetLemmatizer
-            from nltk.tag import pos_tag
-            
-            self.stop_words = set(stopwords.words('english'))
-            self.lemmatizer = WordNetLemmatizer()
-            self.pos_tagger = pos_tag
-        except Exception as e:
-            print(f"Error initializing NLTK: {e}")
+        """Initialize NLTK components from the local bundle (never downloads)"""
+        with self._load_lock:
+            if self._stop_words is not None:
+                return
+            try:
+                import nltk
+                if NLP_DATA_DIR not in nltk.data.path:
+                    nltk.data.path.insert(0, NLP_DATA_DIR)
+                
+                from nltk.corpus import stopwords
+                from nltk.stem import WordNetLemmatizer
+                from nltk.tag import pos_tag
+                
+                self._stop_words = set(stopwords.words('english'))
+                self._lemmatizer = WordNetLemmatizer()
+                self._pos_tagger = pos_tag
+            except Exception as e:
+                logger.error("Error initializing NLTK: %s. Bundle its data with: python fetch_nlp_resources.py", e)
+                self._stop_words = set()
     
     def _init_spacy(self):
-        """Initialize spaCy model"""
-        try:
-            # Try to load the English model
-            self.nlp = spacy.load("en_core_web_sm")
-        except OSError:
-            print("spaCy English model not found. Install with: python -m spacy download en_core_web_sm")
-            self.nlp = None
+        """Initialize the spaCy entity recognizer from the local bundle"""
+        with self._load_lock:
+            if self._spacy_loaded:
+                return
+            self._spacy_loaded = True
+            try:
+                import spacy
+                bundled_model = os.path.join(NLP_DATA_DIR, SPACY_MODEL)
+                model = os.getenv('CHATBOT_SPACY_MODEL') or (bundled_model if os.path.isdir(bundled_model) else SPACY_MODEL)
+                nlp = spacy.load(model, exclude=SPACY_UNUSED_PIPES)
+                
+                # In the small English model the shared tok2vec only feeds the excluded pipes
+                if 'tok2vec' in nlp.pipe_names:
+                    listeners = getattr(nlp.get_pipe('tok2vec'), 'listening_components', ['ner'])
+                    if 'ner' not in listeners:
+                        nlp.disable_pipe('tok2vec')
+                self._nlp = nlp
+            except ImportError:
+                logger.warning("spaCy is not installed; using pattern-based entity extraction only")
+            except OSError:
+                logger.warning("spaCy English model not found. Bundle it with: python fetch_nlp_resources.py")
     
     async def process_message(self, message: str) -> str:
         """Process and clean the input message"""
         try:
-            # Basic cleaning
-            cleaned_message = self._clean_text(message)
-            
-            # Extract medical entities
-            medical_entities = self._extract_medical_entities(cleaned_message)
-            
-            # Normalize medical terms
-            normalized_message = self._normalize_medical_terms(cleaned_message)
+            normalized_message, medical_entities = self.analyze(message)
             
             # Add context from extracted entities
             if medical_entities:
@@ -77,9 +196,22 @@ class NLPProcessor:
             return normalized_message
             
         except Exception as e:
-            print(f"Error processing message: {e}")
+            logger.error("Error processing message: %s", e)
             return message
     
+    def analyze(self, message: str) -> Tuple[str, Dict[str, List[str]]]:
+        """Normalized text and medical entities of a message"""
+        # Basic cleaning
+        cleaned_message = self._clean_text(message)
+        
+        # Extract medical entities
+        medical_entities = self._extract_medical_entities(cleaned_message)
+        
+        # Normalize medical terms
+        normalized_message = self._normalize_medical_terms(cleaned_message)
+        
+        return normalized_message, medical_entities
+    
     def _clean_text(self, text: str) -> str:
         """Clean and normalize text"""
         # Remove extra whitespace
@@ -95,37 +227,15 @@ class NLPProcessor:
     
     def _normalize_abbreviations(self, text: str) -> str:
         """Normalize common medical abbreviations"""
-        abbreviations = {
-            'mg': 'milligrams',
-            'ml': 'milliliters',
-            'g': 'grams',
-            'mcg': 'micrograms',
-            'tab': 'tablet',
-            'caps': 'capsule',
-            'bid': 'twice daily',
-            'tid': 'three times daily',
-            'qid': 'four times daily',
-            'qd': 'daily',
-            'prn': 'as needed',
-            'po': 'by mouth',
-            'pr': 'rectally',
-            'im': 'intramuscular',
-            'iv': 'intravenous'
-        }
-        
-        for abbr, full_form in abbreviations.items():
-            text = re.sub(rf'\b{abbr}\b', full_form, text, flags=re.IGNORECASE)
-        
-        return text
+        return self.abbreviation_normalizer.normalize(text)
     
     def _extract_medical_entities(self, text: str) -> Dict[str, List[str]]:
         """Extract medical entities from text"""
         entities = {}
         
-        for entity_type, pattern in self.medical_patterns.items():
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            if matches:
-                entities[entity_type] = [match[0] if isinstance(match, tuple) else match for match in matches]
+        for span in self.entity_extractor.extract(text):
+            if span.type in ENTITY_KEYS:
+                entities.setdefault(ENTITY_KEYS[span.type], []).append(span.text)
         
         return entities
     
@@ -135,23 +245,7 @@ class NLPProcessor:
         text = text.lower()
         
         # Normalize common variations
-        normalizations = {
-            'medication': 'medicine',
-            'medicines': 'medicine',
-            'drugs': 'medicine',
-            'pills': 'tablets',
-            'capsules': 'tablets',
-            'side effect': 'side effects',
-            'adverse effect': 'side effects',
-            'interaction': 'interactions',
-            'dosage': 'dose',
-            'dosing': 'dose'
-        }
-        
-        for old_term, new_term in normalizations.items():
-            text = re.sub(rf'\b{old_term}\b', new_term, text)
-        
-        return text
+        return self.term_normalizer.normalize(text)
     
     def _build_context(self, entities: Dict[str, List[str]]) -> str:
         """Build context string from extracted entities"""
@@ -173,52 +267,18 @@ class NLPProcessor:
     
     async def extract_intent(self, message: str) -> str:
         """Extract user intent from message"""
-        message_lower = message.lower()
+        intents = self.intent_matcher.labels(message)
         
-        # Define intent patterns
-        intent_patterns = {
-            'drug_info': [
-                'what is', 'tell me about', 'information about', 'details about',
-                'how does', 'what does', 'explain'
-            ],
-            'dosage': [
-                'how much', 'how many', 'dose', 'dosage', 'when to take',
-                'how often', 'frequency'
-            ],
-            'side_effects': [
-                'side effects', 'adverse effects', 'what happens', 'symptoms',
-                'reactions', 'problems'
-            ],
-            'interactions': [
-                'interaction', 'mix', 'combine', 'together', 'safe to take',
-                'can i take', 'with other'
-            ],
-            'contraindications': [
-                'contraindicated', 'should not take', 'avoid', 'not safe',
-                'allergic', 'pregnancy'
-            ],
-            'general_advice': [
-                'advice', 'tips', 'help', 'guidance', 'recommendation',
-                'suggest', 'what should'
-            ]
-        }
-        
-        for intent, patterns in intent_patterns.items():
-            if any(pattern in message_lower for pattern in patterns):
+        # Earlier intents take priority when several match
+        for intent in INTENT_PATTERNS:
+            if intent in intents:
                 return intent
         
         return 'general_query'
     
     async def extract_medications(self, message: str) -> List[str]:
         """Extract medication names from message"""
-        medications = []
-        
-        # Use regex patterns to find medication names
-        medication_pattern = r'\b(aspirin|metformin|lisinopril|warfarin|ibuprofen|acetaminophen|tylenol|advil|motrin)\b'
-        matches = re.findall(medication_pattern, message, re.IGNORECASE)
-        
-        if matches:
-            medications.extend(matches)
+        medications = [span.text for span in self.entity_extractor.extract(message) if span.type == 'drug']
         
         # Use spaCy for more sophisticated NER if available
         if self.nlp:
@@ -233,53 +293,22 @@ class NLPProcessor:
         """Extract dosage information from message"""
         dosage_info = {}
         
-        # Extract dosage amounts
-        dosage_pattern = r'(\d+(?:\.\d+)?)\s*(mg|ml|g|mcg|units?|tablets?|capsules?)'
-        dosage_matches = re.findall(dosage_pattern, message, re.IGNORECASE)
-        
-        if dosage_matches:
-            dosage_info['amount'] = dosage_matches[0][0]
-            dosage_info['unit'] = dosage_matches[0][1]
-        
-        # Extract frequency
-        frequency_pattern = r'\b(once|twice|three times|four times|daily|weekly|monthly|as needed)\b'
-        frequency_match = re.search(frequency_pattern, message, re.IGNORECASE)
-        
-        if frequency_match:
-            dosage_info['frequency'] = frequency_match.group(1)
-        
-        # Extract timing
-        timing_pattern = r'\b(morning|afternoon|evening|night|bedtime|with food|without food)\b'
-        timing_match = re.search(timing_pattern, message, re.IGNORECASE)
-        
-        if timing_match:
-            dosage_info['timing'] = timing_match.group(1)
+        # First dose amount, frequency and timing mentioned
+        for span in self.entity_extractor.extract(message):
+            if span.type == 'dose' and 'amount' not in dosage_info:
+                dosage_info['amount'] = span.value
+            elif span.type == 'unit' and 'unit' not in dosage_info:
+                dosage_info['unit'] = span.text
+            elif span.type == 'frequency' and 'frequency' not in dosage_info:
+                dosage_info['frequency'] = span.text
+            elif span.type == 'timing' and 'timing' not in dosage_info:
+                dosage_info['timing'] = span.text
         
         return dosage_info
     
     async def extract_symptoms(self, message: str) -> List[str]:
         """Extract symptoms from message"""
-        symptoms = []
-        
-        # Common symptom patterns
-        symptom_patterns = [
-            r'\b(pain|ache|hurt)\b',
-            r'\b(headache|head ache)\b',
-            r'\b(nausea|sick|queasy)\b',
-            r'\b(dizzy|dizziness|vertigo)\b',
-            r'\b(fatigue|tired|exhausted)\b',
-            r'\b(fever|temperature|hot)\b',
-            r'\b(cough|coughing)\b',
-            r'\b(rash|skin problem|itchy)\b',
-            r'\b(bleeding|blood)\b',
-            r'\b(swelling|swollen)\b'
-        ]
-        
-        for pattern in symptom_patterns:
-            matches = re.findall(pattern, message, re.IGNORECASE)
-            symptoms.extend(matches)
-        
-        return list(set(symptoms))
+        return list({span.text for span in self.entity_extractor.extract(message) if span.type == 'symptom'})
     
     async def is_emergency_query(self, message: str) -> bool:
         """Check if the message indicates an emergency"""
@@ -0,0 +1,110 @@
+import re
+from typing import Dict, FrozenSet, Iterable, List, Mapping, NamedTuple, Optional, Set, Tuple
+
+
+class PhraseHit(NamedTuple):
+    start: int
+    end: int
+    phrase: str
+    labels: FrozenSet[str]
+
+
+def trie_pattern(phrases: Iterable[str]) -> str:
+    """Regex alternation for ``phrases`` factored into a prefix trie.
+
+    The regex engine follows one branch per character instead of trying every
+    phrase in turn, so matching cost depends on phrase length, not phrase
+    count. Longer phrases are preferred over their prefixes.
+    """
+    trie: Dict[str, dict] = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[''] = {}
+    return _node_pattern(trie) if trie else '(?!)'
+
+
+def _node_pattern(node: Dict[str, dict]) -> str:
+    ends_here = '' in node
+    branches = [re.escape(char) + _node_pattern(child) for char, child in sorted(node.items()) if char]
+    if not branches:
+        return ''
+    if len(branches) == 1 and not ends_here:
+        return branches[0]
+    pattern = '(?:' + '|'.join(branches) + ')'
+    return pattern + '?' if ends_here else pattern
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == '_'
+
+
+def _at_boundary(text: str, index: int) -> bool:
+    """Whether ``index`` falls on a word boundary of ``text``, like regex ``\\b``"""
+    before = index > 0 and _is_word_char(text[index - 1])
+    after = index < len(text) and _is_word_char(text[index])
+    return before != after
+
+
+class PhraseMatcher:
+    """Find every labelled phrase in a text in one regex pass.
+
+    ``phrases`` maps each phrase to the labels it signals (an intent, a drug
+    key, ...) and matches anywhere, like ``phrase in text``; phrases in
+    ``bounded_phrases`` must also start and end on word boundaries, and
+    ``word_boundary`` makes that the rule for every phrase. One matcher can
+    therefore serve lists with different rules, e.g. intent keywords and drug
+    names. Overlapping phrases are all reported: at each position the compiled
+    trie finds the longest phrase, and every shorter phrase it starts with is
+    checked against the text from there.
+    """
+
+    def __init__(self, phrases: Mapping[str, Iterable[str]], word_boundary: bool = False,
+                 bounded_phrases: Optional[Mapping[str, Iterable[str]]] = None):
+        # phrase -> (labels matching anywhere, labels needing word boundaries)
+        self.phrases: Dict[str, Tuple[FrozenSet[str], FrozenSet[str]]] = {}
+        for bounded, group in ((word_boundary, phrases), (True, bounded_phrases or {})):
+            for phrase, labels in group.items():
+                phrase = phrase.lower()
+                free, fenced = self.phrases.get(phrase, (frozenset(), frozenset()))
+                if bounded:
+                    fenced |= frozenset(labels)
+                else:
+                    free |= frozenset(labels)
+                self.phrases[phrase] = (free, fenced)
+
+        # The phrases each phrase starts with, longest first, with their labels
+        self._prefixes: Dict[str, List[Tuple[int, str, FrozenSet[str], FrozenSet[str]]]] = {
+            phrase: [(end, phrase[:end], *self.phrases[phrase[:end]])
+                     for end in range(len(phrase), 0, -1) if phrase[:end] in self.phrases]
+            for phrase in self.phrases
+        }
+
+        body = trie_pattern(self.phrases)
+        if not any(free for free, _ in self.phrases.values()):
+            # Only word starts can match, so skip the other positions in the regex
+            body = rf'\b{body}'
+        # Lookahead so matches may overlap: every start position is tried
+        self.pattern = re.compile(f'(?=({body}))')
+
+    def finditer(self, text: str) -> List[PhraseHit]:
+        """Every phrase found in ``text``, in order of position and longest first"""
+        hits = []
+        lowered = text.lower()
+        for match in self.pattern.finditer(lowered):
+            start = match.start()
+            starts_word = _at_boundary(lowered, start)
+            for length, phrase, free, fenced in self._prefixes[match.group(1)]:
+                if fenced and starts_word and _at_boundary(lowered, start + length):
+                    hits.append(PhraseHit(start, start + length, phrase, free | fenced))
+                elif free:
+                    hits.append(PhraseHit(start, start + length, phrase, free))
+        return hits
+
+    def labels(self, text: str) -> Set[str]:
+        """Labels of every phrase found in ``text``"""
+        found: Set[str] = set()
+        for hit in self.finditer(text):
+            found |= hit.labels
+        return found
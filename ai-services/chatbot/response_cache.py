@@ -0,0 +1,261 @@
+import logging
+import os
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Entity types that must match exactly before two questions can share an answer
+KEY_ENTITY_TYPES = ('medications', 'dosage', 'frequency', 'time', 'symptoms')
+
+# Intent reported when no intent pattern matched; it is compatible with every intent
+GENERAL_INTENT = 'general_query'
+
+WORD_PATTERN = re.compile(r'[a-z0-9]+')
+
+# Sentence embedding model for the semantic tier; fetch_nlp_resources.py bundles it
+EMBEDDING_MODEL = os.getenv('CHAT_CACHE_EMBEDDING_MODEL', 'sentence-transformers/all-MiniLM-L6-v2')
+
+# Function words and question filler the lexical encoder ignores. Shipped here
+# rather than read from NLTK so the cache behaves the same whether or not the
+# NLP bundle is installed.
+STOP_WORDS = frozenset("""
+a about am an and any are as at be been being but by can could did do does doing
+for from had has have having he her his how i if in into is it its just me might
+mine my of ok okay on or our please she should so some than that the their them
+then there these they this those to too us was we were what when where which
+while who whom why will with would you your
+""".split())
+
+
+class HashedEncoder:
+    """Lexical embedding: a hashed bag of words and character trigrams.
+
+    Words of the key entities (which must match exactly anyway) and stop words
+    are left out, so the vector reflects what is asked about the entities. It
+    catches rewordings that keep the same content words ("aspirin side effects"
+    for "what are the side effects of aspirin"), not free paraphrases; it is the
+    fallback when no sentence model is available.
+    """
+
+    name = 'hashed'
+
+    def __init__(self, dims: int = 1024, threshold: Optional[float] = None,
+                 stop_words: Iterable[str] = STOP_WORDS):
+        self.dims = dims
+        self.threshold = threshold or float(os.getenv('CHAT_CACHE_SIMILARITY', 0.85))
+        self.stop_words = frozenset(stop_words)
+
+    def _feature_index(self, feature: str) -> Tuple[int, float]:
+        """Stable hashed bucket and sign for a feature"""
+        digest = zlib.crc32(feature.encode('utf-8'))
+        return digest % self.dims, 1.0 if digest & 0x80000000 else -1.0
+
+    def encode(self, text: str, entities: Optional[Dict[str, List[str]]] = None) -> np.ndarray:
+        """L2-normalized embedding of ``text``"""
+        skip = set(self.stop_words)
+        for entity_type in KEY_ENTITY_TYPES:
+            for value in (entities or {}).get(entity_type, []):
+                skip.update(WORD_PATTERN.findall(value.lower()))
+
+        vector = np.zeros(self.dims, dtype=np.float32)
+        for word in WORD_PATTERN.findall(text.lower()):
+            if word in skip:
+                continue
+            index, sign = self._feature_index(word)
+            vector[index] += sign
+            padded = f" {word} "
+            for i in range(len(padded) - 2):
+                index, sign = self._feature_index(padded[i:i + 3])
+                vector[index] += 0.5 * sign
+
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+class SentenceEncoder:
+    """Local CPU sentence embedding with a small transformer (MiniLM by default).
+
+    Token embeddings are mean-pooled over the attention mask and L2-normalized,
+    as sentence-transformers does, so paraphrases with few words in common
+    ("can I take aspirin with warfarin" / "is aspirin ok with my warfarin") land
+    close together. The model is read from ``local_dir`` when
+    fetch_nlp_resources.py has bundled it there, otherwise from the Hugging Face
+    cache. Loading is blocking; the chatbot loads it through its ModelManager.
+    """
+
+    def __init__(self, model_name: str, local_dir: Optional[str] = None, threshold: Optional[float] = None):
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+
+        path = model_name
+        if local_dir and os.path.isdir(os.path.join(local_dir, os.path.basename(model_name))):
+            path = os.path.join(local_dir, os.path.basename(model_name))
+
+        self.name = model_name
+        self.threshold = threshold or float(os.getenv('CHAT_CACHE_EMBEDDING_SIMILARITY', 0.75))
+        self._torch = torch
+        self.tokenizer = AutoTokenizer.from_pretrained(path)
+        self.model = AutoModel.from_pretrained(path)
+        self.model.eval()
+        self._lock = threading.Lock()
+
+    def encode(self, text: str, entities: Optional[Dict[str, List[str]]] = None) -> np.ndarray:
+        """L2-normalized embedding of ``text`` (blocking)"""
+        with self._lock, self._torch.no_grad():
+            inputs = self.tokenizer(text, return_tensors='pt', truncation=True, max_length=128)
+            hidden = self.model(**inputs).last_hidden_state
+            mask = inputs['attention_mask'].unsqueeze(-1).to(hidden.dtype)
+            vector = ((hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9))[0]
+        vector = vector.numpy().astype(np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+class SemanticCache:
+    """Two-tier cache for Gemini fallback replies.
+
+    Tier one is an exact match on the NLPProcessor-normalized message. Tier two
+    compares embeddings and returns the most similar cached question above the
+    encoder's threshold. Embeddings come from the encoder passed to ``embed``
+    (normally a ``SentenceEncoder``), or from the lexical ``HashedEncoder`` when
+    none is; each encoder's vectors are only compared with its own.
+
+    Semantic matches are only considered between questions naming the same
+    medications, doses, frequencies, timings and symptoms, so "aspirin with
+    warfarin" never answers "aspirin with ibuprofen" and "twice daily" never
+    answers "once daily". They must also have the same intent unless either is
+    ``general_query`` (no intent recognized). Entries expire after ``ttl``
+    seconds and the least recently used entry is evicted when the cache is full.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, ttl: Optional[float] = None,
+                 fallback_encoder: Optional[HashedEncoder] = None):
+        self.max_entries = max_entries or int(os.getenv('CHAT_CACHE_MAX_ENTRIES', 2000))
+        self.ttl = ttl or float(os.getenv('CHAT_CACHE_TTL_SECONDS', 86400))
+        self.fallback_encoder = fallback_encoder or HashedEncoder()
+
+        self.entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # (encoder name, entity key) -> keys of the entries sharing them
+        self._buckets: Dict[Tuple[str, Tuple[str, ...]], Dict[str, None]] = {}
+
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def entity_key(entities: Dict[str, List[str]]) -> Tuple[str, ...]:
+        return tuple(sorted({
+            f"{entity_type}:{value.lower()}"
+            for entity_type in KEY_ENTITY_TYPES
+            for value in entities.get(entity_type, [])
+        }))
+
+    def embed(self, text: str, entities: Dict[str, List[str]], encoder=None) -> Tuple[Any, np.ndarray]:
+        """The encoder used and its embedding of ``text``; blocking for a sentence encoder"""
+        encoder = encoder or self.fallback_encoder
+        return encoder, encoder.encode(text, entities)
+
+    @staticmethod
+    def _intents_compatible(a: Optional[str], b: Optional[str]) -> bool:
+        return a == b or not a or not b or GENERAL_INTENT in (a, b)
+
+    def _expired(self, entry: Dict[str, Any], now: float) -> bool:
+        return now - entry['created_at'] > self.ttl
+
+    def get(self, normalized: str, entities: Dict[str, List[str]], intent: Optional[str] = None,
+            embedding: Optional[Tuple[Any, np.ndarray]] = None) -> Optional[Dict[str, Any]]:
+        """Look up a reply; returns the entry plus how it matched, or None"""
+        now = time.time()
+        entry = self.entries.get(normalized)
+        if entry is not None and self._expired(entry, now):
+            self._remove(normalized)
+            self.expirations += 1
+            entry = None
+
+        if entry is not None:
+            self.exact_hits += 1
+            return self._hit(entry, 'exact', 1.0, now)
+
+        encoder, vector = embedding or self.embed(normalized, entities)
+        bucket = self._buckets.get((encoder.name, self.entity_key(entities)))
+        if bucket:
+            keys = [key for key in bucket if self._intents_compatible(self.entries[key]['intent'], intent)]
+            if keys:
+                similarities = np.stack([self.entries[key]['vector'] for key in keys]) @ vector
+                # Best first; an expired candidate is dropped and the next one tried
+                for index in np.argsort(-similarities):
+                    if similarities[index] < encoder.threshold:
+                        break
+                    entry = self.entries[keys[index]]
+                    if self._expired(entry, now):
+                        self._remove(entry['key'])
+                        self.expirations += 1
+                        continue
+                    self.semantic_hits += 1
+                    return self._hit(entry, 'semantic', float(similarities[index]), now)
+
+        self.misses += 1
+        return None
+
+    def _hit(self, entry: Dict[str, Any], match: str, similarity: float, now: float) -> Dict[str, Any]:
+        entry['hits'] += 1
+        entry['last_hit'] = now
+        self.entries.move_to_end(entry['key'])
+        return {**{k: v for k, v in entry.items() if k != 'vector'}, 'match': match,
+                'similarity': round(similarity, 4)}
+
+    def put(self, normalized: str, entities: Dict[str, List[str]], reply: str, question: str, source: str,
+            intent: Optional[str] = None, embedding: Optional[Tuple[Any, np.ndarray]] = None):
+        """Cache a reply along with where it came from"""
+        if normalized in self.entries:
+            self._remove(normalized)
+        while len(self.entries) >= self.max_entries:
+            self._remove(next(iter(self.entries)))
+            self.evictions += 1
+
+        encoder, vector = embedding or self.embed(normalized, entities)
+        bucket_key = (encoder.name, self.entity_key(entities))
+        self._buckets.setdefault(bucket_key, {})[normalized] = None
+        self.entries[normalized] = {
+            'key': normalized,
+            'reply': reply,
+            'question': question,
+            'source': source,
+            'intent': intent,
+            'encoder': encoder.name,
+            'created_at': time.time(),
+            'last_hit': None,
+            'hits': 0,
+            'vector': vector,
+            'bucket': bucket_key
+        }
+
+    def _remove(self, key: str):
+        entry = self.entries.pop(key)
+        bucket = self._buckets.get(entry['bucket'])
+        if bucket is not None:
+            bucket.pop(key, None)
+            if not bucket:
+                del self._buckets[entry['bucket']]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'exact_hits': self.exact_hits,
+            'semantic_hits': self.semantic_hits,
+            'misses': self.misses,
+            'hit_rate': round((self.exact_hits + self.semantic_hits) / lookups, 4) if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations
+        }
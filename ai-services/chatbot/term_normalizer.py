@@ -0,0 +1,45 @@
+import json
+import logging
+import re
+from typing import Dict, Mapping, Optional
+
+from phrase_matcher import trie_pattern
+
+logger = logging.getLogger(__name__)
+
+
+def load_term_table(path: str) -> Dict[str, str]:
+    """Read a term -> replacement table from JSON (an object) or CSV (term,replacement rows)"""
+    if path.endswith('.csv'):
+        import csv
+        with open(path, newline='', encoding='utf-8') as f:
+            return {row[0].strip(): row[1].strip() for row in csv.reader(f) if len(row) >= 2 and row[0].strip()}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+class TermNormalizer:
+    """Replace whole-word terms using a table compiled into one regex.
+
+    Every term is folded into a single prefix-trie alternation and replaced
+    through a dict lookup, so one pass over the text handles the whole table
+    (thousands of pharmacy sig codes cost about the same as a dozen). Matching
+    is case-insensitive, prefers the longest term, and requires the term not to
+    be part of a longer word; terms may contain punctuation, e.g. ``q.i.d.``.
+    """
+
+    def __init__(self, table: Mapping[str, str], path: Optional[str] = None):
+        self.table: Dict[str, str] = {term.lower(): replacement for term, replacement in table.items()}
+        if path:
+            try:
+                self.table.update({term.lower(): replacement for term, replacement in load_term_table(path).items()})
+            except (OSError, ValueError) as e:
+                logger.error("Error loading term table %s: %s", path, e)
+
+        self.pattern = re.compile(rf'(?<!\w){trie_pattern(self.table)}(?!\w)', re.IGNORECASE)
+
+    def _replace(self, match: re.Match) -> str:
+        return self.table[match.group(0).lower()]
+
+    def normalize(self, text: str) -> str:
+        return self.pattern.sub(self._replace, text)
@@ -0,0 +1,9 @@
+import os
+import sys
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Service modules are imported flat, as app.py does; service_common is used
+# from the source tree when it has not been installed
+sys.path.insert(0, SERVICE_DIR)
+sys.path.append(os.path.join(os.path.dirname(SERVICE_DIR), 'common'))
@@ -0,0 +1,5 @@
+def test_importing_app_does_not_load_nltk_or_spacy():
+    import app
+
+    assert app.nlp_processor._stop_words is None
+    assert not app.nlp_processor._spacy_loaded
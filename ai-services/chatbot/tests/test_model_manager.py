@@ -0,0 +1,64 @@
+import asyncio
+
+from chatbot_model import MedicationChatbot
+from model_manager import ModelManager
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_concurrent_users_share_one_load():
+    calls = []
+    manager = ModelManager()
+    manager.register('tiny', lambda: calls.append(1) or 'weights')
+
+    async def scenario():
+        async def borrow():
+            async with manager.use('tiny') as model:
+                return model
+
+        return await asyncio.gather(*[borrow() for _ in range(5)])
+
+    assert run(scenario()) == ['weights'] * 5
+    assert calls == [1]
+    assert manager.get_stats()['tiny']['state'] == 'loaded'
+
+
+def test_failed_load_backs_off_before_retrying():
+    calls = []
+
+    def broken_loader():
+        calls.append(1)
+        raise OSError("weights not found")
+
+    manager = ModelManager(retry_seconds=300)
+    manager.register('broken', broken_loader)
+
+    async def borrow():
+        async with manager.use('broken') as model:
+            return model
+
+    assert run(borrow()) is None
+    assert run(borrow()) is None
+    assert calls == [1]
+    stats = manager.get_stats()['broken']
+    assert stats['state'] == 'failed' and stats['retry_at'] is not None
+
+    # Once the back-off has passed the load is tried again
+    manager._models['broken']['failed_at'] -= 301
+    assert run(borrow()) is None
+    assert calls == [1, 1]
+
+
+def test_general_response_does_not_load_dialogpt():
+    chatbot = MedicationChatbot()
+    loads = []
+    chatbot.models.register('dialogpt', lambda: loads.append(1) or ('tokenizer', 'model'))
+
+    response = run(chatbot.get_response("hello there"))
+
+    assert response['message'].startswith("I'm here to help with medication-related questions.")
+    assert loads == []
+    stats = chatbot.models.get_stats()['dialogpt']
+    assert stats['state'] == 'unloaded' and stats['last_used'] is None
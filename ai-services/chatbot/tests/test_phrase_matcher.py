@@ -0,0 +1,43 @@
+from chatbot_model import MedicationChatbot
+from drug_recognizer import DrugRecognizer
+from phrase_matcher import PhraseMatcher
+
+
+def test_free_and_bounded_phrases_share_one_matcher():
+    matcher = PhraseMatcher({'take': ['intake'], 'mg': ['dose']}, bounded_phrases={'aspirin': ['drug']})
+
+    assert matcher.labels("he takes 5mg of aspirinate") == {'intake', 'dose'}
+    assert matcher.labels("Aspirin, 5 MG") == {'drug', 'dose'}
+
+
+def test_same_phrase_free_and_bounded():
+    matcher = PhraseMatcher({'pill': ['advice']}, bounded_phrases={'pill': ['product']})
+
+    assert matcher.labels("pillbox") == {'advice'}
+    assert matcher.labels("one pill") == {'advice', 'product'}
+
+
+def test_overlapping_hits_are_reported_longest_first():
+    matcher = PhraseMatcher({}, bounded_phrases={'warfarin': ['w'], 'warfarin sodium': ['ws']})
+
+    hits = matcher.finditer("warfarin sodium tablets")
+    assert [(hit.start, hit.end, hit.phrase) for hit in hits] == [(0, 15, 'warfarin sodium'), (0, 8, 'warfarin')]
+
+
+def test_drug_recognizer_keeps_longest_whole_word_mention():
+    recognizer = DrugRecognizer({'warfarin': 'warfarin', 'warfarin sodium': 'warfarin'})
+
+    mentions = recognizer.find("Warfarin Sodium or asprin, not aspirinate")
+    assert [(m.drug_key, m.text) for m in mentions] == [('warfarin', 'Warfarin Sodium'), ('aspirin', 'asprin')]
+
+
+def test_route_finds_drugs_and_intents_in_one_scan():
+    chatbot = MedicationChatbot()
+
+    mentions, intents = chatbot.route("Can I take asprin together with metformin?")
+    assert [m.drug_key for m in mentions] == ['aspirin', 'metformin']
+    assert {'interaction', 'medication_advice'} <= intents
+    assert not any(intent.startswith('drug:') for intent in intents)
+
+    mentions, intents = chatbot.route("aspirinate dosage")
+    assert mentions == [] and intents == {'dosage'}
@@ -0,0 +1,153 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from nlp_processor import NLPProcessor, NLP_DATA_DIR
+from response_cache import EMBEDDING_MODEL, HashedEncoder, SemanticCache, SentenceEncoder
+
+
+@pytest.fixture(scope='module')
+def nlp():
+    return NLPProcessor()
+
+
+@pytest.fixture
+def cache():
+    return SemanticCache(max_entries=10, ttl=3600)
+
+
+def _key(nlp, question):
+    normalized, entities = nlp.analyze(question)
+    return normalized, entities, asyncio.run(nlp.extract_intent(question))
+
+
+def _put(cache, nlp, question, reply, encoder=None):
+    normalized, entities, intent = _key(nlp, question)
+    embedding = cache.embed(question, entities, encoder) if encoder else None
+    cache.put(normalized, entities, reply, question, source='gemini', intent=intent, embedding=embedding)
+
+
+def _get(cache, nlp, question, encoder=None):
+    normalized, entities, intent = _key(nlp, question)
+    embedding = cache.embed(question, entities, encoder) if encoder else None
+    return cache.get(normalized, entities, intent, embedding)
+
+
+def test_exact_match(cache, nlp):
+    _put(cache, nlp, "What are the side effects of aspirin?", "reply")
+    hit = _get(cache, nlp, "what are the side effects of aspirin")
+    assert hit['match'] == 'exact'
+    assert hit['reply'] == "reply"
+
+
+def test_reworded_question_matches(cache, nlp):
+    _put(cache, nlp, "What are the side effects of aspirin?", "reply")
+    hit = _get(cache, nlp, "aspirin side effects")
+    assert hit is not None and hit['match'] == 'semantic'
+
+
+@pytest.mark.parametrize('cached, asked', [
+    ("Can I take metformin once daily?", "Can I take metformin twice daily?"),
+    ("Should I take aspirin in the morning?", "Should I take aspirin at night?"),
+    ("Can I take aspirin with warfarin?", "Can I take aspirin with ibuprofen?"),
+    ("Is 100 mg of aspirin safe?", "Is 500 mg of aspirin safe?"),
+])
+def test_different_entities_never_share_a_reply(cache, nlp, cached, asked):
+    _put(cache, nlp, cached, "reply")
+    assert _get(cache, nlp, asked) is None
+
+
+def test_different_intent_misses(cache, nlp):
+    _put(cache, nlp, "What are the side effects of aspirin?", "reply")
+    assert _get(cache, nlp, "How much aspirin can I take?") is None
+
+
+def test_lru_eviction_and_ttl(nlp):
+    cache = SemanticCache(max_entries=2, ttl=3600)
+    for drug in ('aspirin', 'metformin', 'warfarin'):
+        _put(cache, nlp, f"side effects of {drug}", drug)
+    assert _get(cache, nlp, "side effects of aspirin") is None
+    assert cache.get_stats()['evictions'] == 1
+
+    cache.ttl = -1
+    assert _get(cache, nlp, "side effects of warfarin") is None
+    assert cache.get_stats()['expirations'] == 1
+
+
+def test_expired_best_match_falls_back_to_next_best(cache, nlp):
+    _put(cache, nlp, "aspirin side effects", "stale")
+    _put(cache, nlp, "side effects of aspirin please", "fresh")
+    cache.entries['aspirin side effects']['created_at'] -= 7200
+
+    hit = _get(cache, nlp, "aspirin side effects?!")
+    assert hit is not None and hit['reply'] == "fresh"
+    assert 'aspirin side effects' not in cache.entries
+    assert cache.get_stats()['expirations'] == 1
+
+
+def test_unrecognized_intent_matches_any_intent(cache, nlp):
+    _put(cache, nlp, "Can I take aspirin with warfarin?", "reply")
+    normalized, entities, _ = _key(nlp, "Could I take aspirin with warfarin")
+    assert cache.get(normalized, entities, 'general_query') is not None
+    assert cache.get(normalized, entities, 'dosage') is None
+
+
+class FakeEncoder:
+    """Maps known questions onto fixed unit vectors"""
+
+    name = 'fake'
+    threshold = 0.8
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def encode(self, text, entities=None):
+        return np.asarray(self.vectors[text], dtype=np.float32)
+
+
+def test_sentence_encoder_vectors_are_kept_apart_from_lexical_ones(cache, nlp):
+    encoder = FakeEncoder({
+        "can I take aspirin with warfarin": [1.0, 0.0],
+        "is aspirin ok with my warfarin": [0.96, 0.28],
+    })
+    _put(cache, nlp, "can I take aspirin with warfarin", "reply", encoder)
+
+    hit = _get(cache, nlp, "is aspirin ok with my warfarin", encoder)
+    assert hit is not None and hit['match'] == 'semantic' and hit['encoder'] == 'fake'
+    # A lexical lookup never compares against the sentence encoder's vectors
+    assert _get(cache, nlp, "aspirin ok warfarin") is None
+
+
+@pytest.fixture(scope='module')
+def sentence_encoder():
+    pytest.importorskip('transformers')
+    pytest.importorskip('torch')
+    try:
+        return SentenceEncoder(EMBEDDING_MODEL, NLP_DATA_DIR)
+    except OSError as e:
+        pytest.skip(f"Embedding model not available: {e}")
+
+
+@pytest.mark.parametrize('cached, asked', [
+    ("can I take aspirin with warfarin", "is aspirin ok with my warfarin"),
+    ("What are the side effects of aspirin?", "Does aspirin have any side effects?"),
+])
+def test_paraphrase_matches_with_sentence_embeddings(cache, nlp, sentence_encoder, cached, asked):
+    _put(cache, nlp, cached, "reply", sentence_encoder)
+    hit = _get(cache, nlp, asked, sentence_encoder)
+    assert hit is not None and hit['match'] == 'semantic'
+
+
+def test_sentence_embeddings_keep_entities_apart(cache, nlp, sentence_encoder):
+    _put(cache, nlp, "can I take aspirin with warfarin", "reply", sentence_encoder)
+    assert _get(cache, nlp, "can I take aspirin with ibuprofen", sentence_encoder) is None
+
+
+def test_lexical_encoder_needs_no_nlp_data():
+    # Shipped stop words: the docstring example scores well above the threshold
+    encoder = HashedEncoder()
+    entities = {'medications': ['aspirin']}
+    similarity = encoder.encode("what are the side effects of aspirin", entities) @ \
+        encoder.encode("aspirin side effects", entities)
+    assert similarity >= encoder.threshold
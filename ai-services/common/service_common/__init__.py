@@ -0,0 +1,4 @@
+"""Code shared by the chatbot, pill identification and fall detection services.
+
+Each service's requirements.txt installs this package from ``../common``.
+"""
@@ -0,0 +1,115 @@
+"""Fast response encoding with optional MessagePack content negotiation.
+
+``FastResponse`` is the apps' default response class. It encodes with orjson
+(falling back to the standard library when orjson is not installed) and
+serializes NumPy scalars and arrays natively. Clients that send
+``Accept: application/msgpack`` (or ``application/x-msgpack``) get MessagePack
+instead when msgpack is installed; responses then carry ``Vary: Accept`` so
+shared caches keep the two encodings apart.
+
+Endpoints whose payloads carry NumPy values should return ``FastResponse``
+directly so FastAPI's ``jsonable_encoder`` pass is skipped::
+
+    return FastResponse(FallDetectionResponse(...))
+"""
+import contextvars
+import datetime
+import json
+from typing import Any, Optional
+
+import numpy as np
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MSGPACK_MEDIA_TYPES = ('application/msgpack', 'application/x-msgpack')
+
+# Encoding picked for the current request by ContentNegotiationMiddleware
+response_format_var: contextvars.ContextVar = contextvars.ContextVar('response_format', default='json')
+
+
+def _to_builtin(obj: Any) -> Any:
+    """Convert values the encoders don't handle natively"""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if hasattr(obj, 'model_dump'):
+        return obj.model_dump()
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if isinstance(obj, (datetime.datetime, datetime.date)):
+        return obj.isoformat()
+    if isinstance(obj, (bytes, bytearray)):
+        return obj.decode('utf-8', errors='replace')
+    raise TypeError(f"Object of type {type(obj).__name__} is not serializable")
+
+
+def dumps_json(content: Any) -> bytes:
+    """Encode content as JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(content, default=_to_builtin,
+                            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_to_builtin, separators=(',', ':')).encode('utf-8')
+
+
+def dumps_msgpack(content: Any) -> bytes:
+    """Encode content as MessagePack bytes"""
+    return msgpack.packb(content, default=_to_builtin, use_bin_type=True)
+
+
+def negotiate_format(accept: Optional[str]) -> str:
+    """Pick 'msgpack' when the client accepts it and it is available, else 'json'"""
+    if msgpack is not None and accept and any(media_type in accept for media_type in MSGPACK_MEDIA_TYPES):
+        return 'msgpack'
+    return 'json'
+
+
+class FastResponse(Response):
+    """Response encoded as JSON or MessagePack depending on the negotiated format"""
+
+    media_type = 'application/json'
+
+    def __init__(self, content: Any = None, *args, **kwargs):
+        if response_format_var.get() == 'msgpack':
+            self.media_type = MSGPACK_MEDIA_TYPES[0]
+        super().__init__(content, *args, **kwargs)
+        if msgpack is not None:
+            # The encoding depends on Accept whenever MessagePack can be negotiated
+            self.headers.add_vary_header('Accept')
+
+    def render(self, content: Any) -> bytes:
+        if self.media_type == MSGPACK_MEDIA_TYPES[0]:
+            return dumps_msgpack(content)
+        return dumps_json(content)
+
+
+class ContentNegotiationMiddleware:
+    """ASGI middleware recording the response format the client asked for"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        accept = None
+        for name, value in scope['headers']:
+            if name == b'accept':
+                accept = value.decode('latin-1')
+                break
+
+        token = response_format_var.set(negotiate_format(accept))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            response_format_var.reset(token)
@@ -0,0 +1,179 @@
+"""Structured, non-blocking logging shared by the AI services.
+
+``setup_logging`` routes every record through a bounded in-memory queue to a
+background thread that writes JSON lines to stderr, so a request never waits on
+stdout. Repeated errors from the same call site are rate limited, and each
+record carries the correlation ID of the request that produced it.
+
+Modules log through the standard library::
+
+    logger = logging.getLogger(__name__)
+    logger.error("Error detecting shape: %s", e)
+
+Each app installs ``assign_request_id`` as HTTP middleware to set the ID.
+"""
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+import uuid
+from typing import Dict, Optional, Tuple
+
+# Correlation ID of the request being handled, set by ``assign_request_id``
+request_id_var: contextvars.ContextVar = contextvars.ContextVar('request_id', default=None)
+
+_state: Dict[str, object] = {}
+
+
+class JsonFormatter(logging.Formatter):
+    """Render a record as one JSON object per line"""
+
+    def __init__(self, service: str):
+        super().__init__()
+        self.service = service
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'service': self.service,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        if getattr(record, 'request_id', None):
+            entry['request_id'] = record.request_id
+        if getattr(record, 'suppressed', 0):
+            entry['suppressed'] = record.suppressed
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class RequestIdFilter(logging.Filter):
+    """Attach the current request's correlation ID to the record"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class RateLimitFilter(logging.Filter):
+    """Let through at most ``burst`` records per call site and ``window`` seconds.
+
+    Call sites are identified by logger, level and message template, so the same
+    error with different details counts once. The first record after a window
+    with suppressions reports how many were dropped.
+    """
+
+    def __init__(self, burst: int = 5, window: float = 10.0):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self._sites: Dict[Tuple[str, int, str], list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING:
+            return True
+
+        key = (record.name, record.levelno, str(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            # [window start, records let through, records suppressed]
+            site = self._sites.get(key)
+            if site is None or now - site[0] >= self.window:
+                suppressed = site[2] if site else 0
+                self._sites[key] = [now, 1, 0]
+                record.suppressed = suppressed
+                return True
+
+            if site[1] < self.burst:
+                site[1] += 1
+                return True
+
+            site[2] += 1
+            return False
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that drops records instead of blocking when the queue is full"""
+
+    dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only merge the arguments here; the writer thread does the formatting
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DroppingQueueHandler.dropped += 1
+
+
+def _start_listener():
+    """(Re)create the queue and writer thread for the current process"""
+    log_queue = queue.Queue(maxsize=int(os.getenv('LOG_QUEUE_SIZE', 10000)))
+    _state['handler'].queue = log_queue
+    listener = logging.handlers.QueueListener(log_queue, _state['stream_handler'], respect_handler_level=False)
+    listener.start()
+    _state['listener'] = listener
+
+
+def setup_logging(service: str, level: Optional[str] = None):
+    """Install the queued JSON handler on the root logger (idempotent)"""
+    if _state:
+        return
+
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(JsonFormatter(service))
+
+    handler = DroppingQueueHandler(queue.Queue())
+    handler.addFilter(RateLimitFilter(
+        burst=int(os.getenv('LOG_RATE_LIMIT_BURST', 5)),
+        window=float(os.getenv('LOG_RATE_LIMIT_WINDOW_SECONDS', 10))
+    ))
+    handler.addFilter(RequestIdFilter())
+
+    _state['handler'] = handler
+    _state['stream_handler'] = stream_handler
+    _start_listener()
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel((level or os.getenv('LOG_LEVEL', 'INFO')).upper())
+
+    # The writer thread does not survive a fork (e.g. gunicorn preload)
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=_start_listener)
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread"""
+    listener = _state.pop('listener', None)
+    if listener is not None:
+        listener.stop()
+
+
+async def assign_request_id(request, call_next):
+    """HTTP middleware tagging every log record written while handling a request
+    with its correlation ID (the caller's ``X-Request-ID`` or a new one)"""
+    request_id = request.headers.get("x-request-id") or uuid.uuid4().hex
+    token = request_id_var.set(request_id)
+    try:
+        response = await call_next(request)
+    finally:
+        request_id_var.reset(token)
+    response.headers["X-Request-ID"] = request_id
+    return response
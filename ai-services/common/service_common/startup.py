@@ -0,0 +1,34 @@
+"""Startup timing shared by the AI services.
+
+Each app keeps a module-level ``startup_timings`` that ``/health`` reports and
+``startup_report.py`` reads::
+
+    startup_timings = StartupTimings()
+    pill_detector = startup_timings.init('pill_detector', PillDetector)
+
+    with startup_timings.measure('warmup'):
+        ...
+"""
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, TypeVar
+
+T = TypeVar('T')
+
+
+class StartupTimings(dict):
+    """Seconds spent on each startup step, keyed by step name"""
+
+    @contextmanager
+    def measure(self, name: str) -> Iterator[None]:
+        """Record how long the block takes, even if it raises"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self[name] = round(time.perf_counter() - start, 3)
+
+    def init(self, name: str, factory: Callable[[], T]) -> T:
+        """Build a component with ``factory`` and record how long it took"""
+        with self.measure(name):
+            return factory()
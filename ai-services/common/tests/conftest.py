@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Import service_common from the source tree, as the services do once it is installed
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
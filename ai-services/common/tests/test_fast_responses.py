@@ -0,0 +1,68 @@
+import json
+
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from service_common import fast_responses
+from service_common.fast_responses import ContentNegotiationMiddleware, FastResponse
+
+
+class FakeMsgpack:
+    """Stands in for msgpack so negotiation can be tested without it installed"""
+
+    @staticmethod
+    def packb(content, default=None, use_bin_type=True):
+        return b'msgpack:' + json.dumps(content, default=default).encode()
+
+
+def _client():
+    app = FastAPI(default_response_class=FastResponse)
+    app.add_middleware(ContentNegotiationMiddleware)
+
+    @app.get("/reading")
+    async def reading():
+        return FastResponse({"score": np.float32(0.5), "samples": np.arange(3)})
+
+    @app.get("/plain")
+    async def plain():
+        return {"ok": True}
+
+    return TestClient(app)
+
+
+def test_json_with_numpy_values(monkeypatch):
+    monkeypatch.setattr(fast_responses, 'msgpack', None)
+    response = _client().get("/reading", headers={"Accept": "application/msgpack"})
+
+    assert response.headers["content-type"] == "application/json"
+    assert response.json() == {"score": 0.5, "samples": [0, 1, 2]}
+    # Nothing varies when MessagePack cannot be served
+    assert "vary" not in response.headers
+
+
+@pytest.mark.parametrize('accept', ['application/msgpack', 'application/x-msgpack, application/json;q=0.5'])
+def test_msgpack_is_served_when_asked_for(monkeypatch, accept):
+    monkeypatch.setattr(fast_responses, 'msgpack', FakeMsgpack)
+    response = _client().get("/plain", headers={"Accept": accept})
+
+    assert response.headers["content-type"] == "application/msgpack"
+    assert response.content == b'msgpack:{"ok": true}'
+    assert response.headers["vary"] == "Accept"
+
+
+def test_json_response_varies_on_accept_when_msgpack_is_available(monkeypatch):
+    monkeypatch.setattr(fast_responses, 'msgpack', FakeMsgpack)
+    response = _client().get("/plain")
+
+    assert response.headers["content-type"] == "application/json"
+    assert response.json() == {"ok": True}
+    assert response.headers["vary"] == "Accept"
+
+
+def test_vary_merges_with_existing_header(monkeypatch):
+    monkeypatch.setattr(fast_responses, 'msgpack', FakeMsgpack)
+    response = FastResponse({"ok": True}, headers={"Vary": "Origin"})
+
+    assert response.headers["vary"] == "Origin, Accept"
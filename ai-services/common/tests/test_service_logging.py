@@ -0,0 +1,46 @@
+import logging
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from service_common.service_logging import JsonFormatter, RequestIdFilter, assign_request_id, request_id_var
+
+
+def _client():
+    app = FastAPI()
+    app.middleware("http")(assign_request_id)
+
+    @app.get("/whoami")
+    async def whoami():
+        return {"request_id": request_id_var.get()}
+
+    return TestClient(app)
+
+
+def test_request_id_is_taken_from_the_caller():
+    response = _client().get("/whoami", headers={"X-Request-ID": "abc123"})
+
+    assert response.json() == {"request_id": "abc123"}
+    assert response.headers["X-Request-ID"] == "abc123"
+
+
+def test_request_id_is_generated_and_reset():
+    response = _client().get("/whoami")
+
+    request_id = response.headers["X-Request-ID"]
+    assert len(request_id) == 32
+    assert response.json() == {"request_id": request_id}
+    assert request_id_var.get() is None
+
+
+def test_records_carry_the_request_id():
+    record = logging.LogRecord("svc", logging.ERROR, __file__, 1, "failed: %s", ("boom",), None)
+    token = request_id_var.set("req-1")
+    try:
+        RequestIdFilter().filter(record)
+    finally:
+        request_id_var.reset(token)
+
+    line = JsonFormatter("test").format(record)
+    assert '"request_id": "req-1"' in line
+    assert '"message": "failed: boom"' in line
@@ -0,0 +1,21 @@
+import pytest
+
+from service_common.startup import StartupTimings
+
+
+def test_init_returns_the_component_and_records_its_time():
+    timings = StartupTimings()
+
+    assert timings.init('detector', lambda: 'built') == 'built'
+    assert list(timings) == ['detector']
+    assert timings['detector'] >= 0
+
+
+def test_measure_records_failed_steps():
+    timings = StartupTimings()
+
+    with pytest.raises(RuntimeError):
+        with timings.measure('warmup'):
+            raise RuntimeError("model missing")
+
+    assert 'warmup' in timings
@@ -1,24 +1,35 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, File, UploadFile, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 import uvicorn
 import os
+import logging
 import asyncio
-import json
+import io
+import numpy as np
+import soundfile as sf
 from dotenv import load_dotenv
 
 from audio_fall_detector import AudioFallDetector
 from keyword_detector import KeywordDetector
 from model_trainer import ModelTrainer
+from service_common.service_logging import setup_logging, request_id_var, assign_request_id
+from service_common.startup import StartupTimings
+from service_common.fast_responses import FastResponse, ContentNegotiationMiddleware, dumps_json
+
+logger = logging.getLogger(__name__)
 
 # Load environment variables
 load_dotenv()
+setup_logging("fall-detection")
 
 app = FastAPI(
     title="MediCare Assist Fall Detection API",
     description="AI-powered fall detection using audio analysis and keyword detection",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastResponse
 )
 
 # CORS middleware
@@ -30,14 +41,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Serve MessagePack to clients that ask for it
+app.add_middleware(ContentNegotiationMiddleware)
+
+# Tag every log record written while handling a request with its correlation ID
+app.middleware("http")(assign_request_id)
+
+# Seconds spent building each component, reported by /health and startup_report.py
+startup_timings = StartupTimings()
+
 # Initialize components
-audio_detector = AudioFallDetector()
-keyword_detector = KeywordDetector()
-model_trainer = ModelTrainer()
+audio_detector = startup_timings.init('audio_detector', AudioFallDetector)
+keyword_detector = startup_timings.init('keyword_detector', KeywordDetector)
+model_trainer = startup_timings.init('model_trainer', ModelTrainer)
 
 # WebSocket connections
 active_connections: Dict[str, WebSocket] = {}
 
+# Set once this worker has finished warming up; served by /ready
+service_ready = False
+
 # Pydantic models
 class FallDetectionRequest(BaseModel):
     elderly_id: str
@@ -71,7 +94,14 @@ class TrainingRequest(BaseModel):
 # Health check endpoint
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "service": "fall-detection"}
+    return {"status": "healthy", "service": "fall-detection", "startup": startup_timings}
+
+# Readiness probe: only passes once this worker has warmed up
+@app.get("/ready")
+async def readiness_check():
+    if not service_ready:
+        return JSONResponse(status_code=503, content={"status": "starting"})
+    return {"status": "ready"}
 
 # WebSocket endpoint for real-time monitoring
 @app.websocket("/ws/{elderly_id}")
@@ -102,7 +132,7 @@ async def websocket_endpoint(websocket: WebSocket, elderly_id: str):
                 "recommendations": _get_recommendations(fall_detected, keywords)
             }
             
-            await websocket.send_text(json.dumps(response))
+            await websocket.send_text(dumps_json(response).decode())
             
     except WebSocketDisconnect:
         if elderly_id in active_connections:
@@ -131,7 +161,8 @@ async def process_audio(file: UploadFile = File(...), elderly_id: str = None):
         # Get recommendations
         recommendations = _get_recommendations(fall_detected, keywords)
         
-        return FallDetectionResponse(
+        # Returned directly so the NumPy feature values skip jsonable_encoder
+        return FastResponse(FallDetectionResponse(
             fall_detected=fall_detected,
             confidence=fall_result.get('confidence', 0.0),
             audio_features=fall_result.get('features'),
@@ -139,7 +170,7 @@ async def process_audio(file: UploadFile = File(...), elderly_id: str = None):
             location=fall_result.get('location'),
             timestamp=fall_result.get('timestamp'),
             recommendations=recommendations
-        )
+        ))
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Audio processing error: {str(e)}")
@@ -297,12 +328,32 @@ async def process_websocket_audio():
             # Process any pending audio data
             await asyncio.sleep(0.1)  # Small delay to prevent high CPU usage
         except Exception as e:
-            print(f"Error in background audio processing: {e}")
+            logger.error("Error in background audio processing: %s", e)
+
+def _warmup_audio() -> bytes:
+    """Half a second of quiet noise, enough to exercise feature extraction"""
+    samples = np.random.default_rng(0).normal(0, 0.01, audio_detector.sample_rate // 2).astype(np.float32)
+    buffer = io.BytesIO()
+    sf.write(buffer, samples, audio_detector.sample_rate, format='WAV')
+    return buffer.getvalue()
 
-# Start background task
+# Start background task and warm up librosa before serving traffic
 @app.on_event("startup")
 async def startup_event():
+    global service_ready
     asyncio.create_task(process_websocket_audio())
+    with startup_timings.measure('warmup'):
+        try:
+            await audio_detector.process_audio(_warmup_audio())
+            service_ready = True
+        except Exception as e:
+            # Stay out of rotation: /ready keeps returning 503
+            logger.error("Error warming up audio pipeline, not marking ready: %s", e)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    global service_ready
+    service_ready = False
 
 if __name__ == "__main__":
     uvicorn.run(
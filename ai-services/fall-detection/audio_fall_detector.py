@@ -1,6 +1,7 @@
 import librosa
 import numpy as np
 import asyncio
+import logging
 import json
 import os
 from typing import Dict, List, Any, Optional, Tuple
@@ -11,6 +12,8 @@ import pickle
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.preprocessing import StandardScaler
 
+logger = logging.getLogger(__name__)
+
 class AudioFallDetector:
     def __init__(self):
         self.model = None
@@ -51,7 +54,7 @@ class AudioFallDetector:
                     self.scaler = pickle.load(f)
                     
         except Exception as e:
-            print(f"Error loading model: {e}")
+            logger.error("Error loading model: %s", e)
             self.model = None
             self.is_trained = False
     
@@ -83,7 +86,7 @@ class AudioFallDetector:
             }
             
         except Exception as e:
-            print(f"Error processing audio: {e}")
+            logger.error("Error processing audio: %s", e)
             return {
                 'fall_detected': False,
                 'confidence': 0.0,
@@ -106,7 +109,7 @@ class AudioFallDetector:
             return audio_array
             
         except Exception as e:
-            print(f"Error converting bytes to audio: {e}")
+            logger.error("Error converting bytes to audio: %s", e)
             # Fallback: try to read as raw audio
             return np.frombuffer(audio_data, dtype=np.int16).astype(np.float32) / 32768.0
     
@@ -125,7 +128,7 @@ class AudioFallDetector:
             return audio
             
         except Exception as e:
-            print(f"Error preprocessing audio: {e}")
+            logger.error("Error preprocessing audio: %s", e)
             return audio
     
     def _extract_features(self, audio: np.ndarray) -> Dict[str, float]:
@@ -188,7 +191,7 @@ class AudioFallDetector:
             return features
             
         except Exception as e:
-            print(f"Error extracting features: {e}")
+            logger.error("Error extracting features: %s", e)
             return {}
     
     def _calculate_voice_activity_ratio(self, audio: np.ndarray) -> float:
@@ -215,7 +218,7 @@ class AudioFallDetector:
             return active_frames / len(energies)
             
         except Exception as e:
-            print(f"Error calculating voice activity ratio: {e}")
+            logger.error("Error calculating voice activity ratio: %s", e)
             return 0.0
     
     def _analyze_audio_characteristics(self, audio: np.ndarray) -> Dict[str, Any]:
@@ -254,7 +257,7 @@ class AudioFallDetector:
             return characteristics
             
         except Exception as e:
-            print(f"Error analyzing audio characteristics: {e}")
+            logger.error("Error analyzing audio characteristics: %s", e)
             return {}
     
     def _detect_fall(self, features: Dict[str, float]) -> Tuple[bool, float]:
@@ -277,7 +280,7 @@ class AudioFallDetector:
             return fall_detected, fall_probability
             
         except Exception as e:
-            print(f"Error detecting fall: {e}")
+            logger.error("Error detecting fall: %s", e)
             return False, 0.0
     
     def _rule_based_fall_detection(self, features: Dict[str, float]) -> Tuple[bool, float]:
@@ -305,7 +308,7 @@ class AudioFallDetector:
             return fall_detected, confidence
             
         except Exception as e:
-            print(f"Error in rule-based fall detection: {e}")
+            logger.error("Error in rule-based fall detection: %s", e)
             return False, 0.0
     
     def _prepare_feature_vector(self, features: Dict[str, float]) -> List[float]:
@@ -354,7 +357,7 @@ class AudioFallDetector:
                 self.confidence_threshold = 0.6
                 
         except Exception as e:
-            print(f"Error starting monitoring: {e}")
+            logger.error("Error starting monitoring: %s", e)
     
     async def stop_monitoring(self, elderly_id: str):
         """Stop monitoring for a specific elderly person"""
@@ -364,7 +367,7 @@ class AudioFallDetector:
                 self.monitoring_sessions[elderly_id]['end_time'] = datetime.now()
                 
         except Exception as e:
-            print(f"Error stopping monitoring: {e}")
+            logger.error("Error stopping monitoring: %s", e)
     
     async def get_fall_history(self, elderly_id: str, limit: int = 10) -> List[Dict[str, Any]]:
         """Get fall history for a specific elderly person"""
@@ -377,7 +380,7 @@ class AudioFallDetector:
             return recent_falls
             
         except Exception as e:
-            print(f"Error getting fall history: {e}")
+            logger.error("Error getting fall history: %s", e)
             return []
     
     async def update_fall_incident(self, incident_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
@@ -392,7 +395,7 @@ class AudioFallDetector:
             }
             
         except Exception as e:
-            print(f"Error updating fall incident: {e}")
+            logger.error("Error updating fall incident: %s", e)
             return {}
     
     async def get_monitoring_status(self, elderly_id: str) -> Dict[str, Any]:
@@ -411,7 +414,7 @@ class AudioFallDetector:
             }
             
         except Exception as e:
-            print(f"Error getting monitoring status: {e}")
+            logger.error("Error getting monitoring status: %s", e)
             return {'active': False, 'message': 'Error retrieving status'}
     
     async def get_system_stats(self) -> Dict[str, Any]:
@@ -428,7 +431,7 @@ class AudioFallDetector:
             }
             
         except Exception as e:
-            print(f"Error getting system stats: {e}")
+            logger.error("Error getting system stats: %s", e)
             return {}
     
     def _record_fall(self, elderly_id: str, confidence: float, features: Dict[str, float]):
@@ -451,7 +454,7 @@ class AudioFallDetector:
                 self.monitoring_sessions[elderly_id]['fall_count'] += 1
                 
         except Exception as e:
-            print(f"Error recording fall: {e}")
+            logger.error("Error recording fall: %s", e)
     
     async def train_model(self, training_data: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Train the fall detection model"""
@@ -468,7 +471,7 @@ class AudioFallDetector:
             }
             
         except Exception as e:
-            print(f"Error training model: {e}")
+            logger.error("Error training model: %s", e)
             return {
                 'status': 'error',
                 'message': f'Model training failed: {str(e)}'
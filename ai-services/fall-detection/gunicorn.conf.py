@@ -0,0 +1,36 @@
+"""Production server settings for the fall detection service.
+
+Run from this directory:
+    gunicorn app:app
+
+The app is imported once in the master process (``preload_app``) so librosa,
+the fall detection model and the keyword tables are loaded once and shared
+copy-on-write by the forked workers. Send ``SIGHUP`` to the master for a
+graceful restart: new workers are booted before the old ones are drained.
+
+Monitoring sessions and fall history are kept in process memory, so each
+worker only sees its own; keep ``WEB_CONCURRENCY=1`` unless that is acceptable.
+"""
+import gc
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8003')}"
+workers = int(os.getenv('WEB_CONCURRENCY', 1))
+worker_class = 'uvicorn.workers.UvicornWorker'
+preload_app = True
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+
+# Recycle workers periodically to bound slow leaks (0 disables)
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = max_requests // 10
+
+accesslog = '-'
+
+
+def when_ready(server):
+    # Move everything allocated at import into the permanent generation so
+    # garbage collection in the workers never writes to the shared pages
+    gc.freeze()
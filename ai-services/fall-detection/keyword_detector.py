@@ -1,5 +1,6 @@
 import asyncio
 import json
+import logging
 import re
 from typing import Dict, List, Any, Optional
 import numpy as np
@@ -7,7 +8,8 @@ import librosa
 import soundfile as sf
 import io
 from datetime import datetime
-import speech_recognition as sr
+
+logger = logging.getLogger(__name__)
 
 class KeywordDetector:
     def __init__(self):
@@ -18,9 +20,9 @@ class KeywordDetector:
             'stuck', 'trapped', 'danger', 'urgent', 'critical'
         ]
         
-        # Initialize speech recognition
-        self.recognizer = sr.Recognizer()
-        self.microphone = sr.Microphone()
+        # Speech recognition (and its audio device) is only set up on first use
+        self._recognizer = None
+        self._microphone = None
         
         # Audio processing parameters
         self.sample_rate = 16000
@@ -35,6 +37,20 @@ class KeywordDetector:
         # Load custom keywords if available
         self._load_custom_keywords()
     
+    @property
+    def recognizer(self):
+        if self._recognizer is None:
+            import speech_recognition as sr
+            self._recognizer = sr.Recognizer()
+        return self._recognizer
+    
+    @property
+    def microphone(self):
+        if self._microphone is None:
+            import speech_recognition as sr
+            self._microphone = sr.Microphone()
+        return self._microphone
+    
     def _load_custom_keywords(self):
         """Load custom distress keywords from file"""
         try:
@@ -42,7 +58,7 @@ class KeywordDetector:
             # For now, we'll use the default keywords
             pass
         except Exception as e:
-            print(f"Error loading custom keywords: {e}")
+            logger.error("Error loading custom keywords: %s", e)
     
     async def detect_keywords(self, audio_data: bytes) -> List[str]:
         """Detect distress keywords in audio data"""
@@ -71,7 +87,7 @@ class KeywordDetector:
             return all_keywords
             
         except Exception as e:
-            print(f"Error detecting keywords: {e}")
+            logger.error("Error detecting keywords: %s", e)
             return []
     
     def _bytes_to_audio(self, audio_data: bytes) -> np.ndarray:
@@ -87,7 +103,7 @@ class KeywordDetector:
             return audio_array
             
         except Exception as e:
-            print(f"Error converting bytes to audio: {e}")
+            logger.error("Error converting bytes to audio: %s", e)
             # Fallback: try to read as raw audio
             return np.frombuffer(audio_data, dtype=np.int16).astype(np.float32) / 32768.0
     
@@ -106,12 +122,14 @@ class KeywordDetector:
             return audio
             
         except Exception as e:
-            print(f"Error preprocessing audio: {e}")
+            logger.error("Error preprocessing audio: %s", e)
             return audio
     
     async def _extract_text(self, audio: np.ndarray) -> str:
         """Extract text from audio using speech recognition"""
         try:
+            import speech_recognition as sr
+            
             # Convert numpy array to audio data for speech recognition
             audio_data = (audio * 32767).astype(np.int16).tobytes()
             
@@ -126,11 +144,11 @@ class KeywordDetector:
                 # Speech not recognized
                 return ""
             except sr.RequestError as e:
-                print(f"Speech recognition error: {e}")
+                logger.warning("Speech recognition error: %s", e)
                 return ""
                 
         except Exception as e:
-            print(f"Error extracting text: {e}")
+            logger.error("Error extracting text: %s", e)
             return ""
     
     def _find_keywords(self, text: str) -> List[str]:
@@ -156,7 +174,7 @@ class KeywordDetector:
             return list(set(detected_keywords))
             
         except Exception as e:
-            print(f"Error finding keywords: {e}")
+            logger.error("Error finding keywords: %s", e)
             return []
     
     def _is_keyword_variation(self, keyword: str, text: str) -> bool:
@@ -172,7 +190,7 @@ class KeywordDetector:
             return False
             
         except Exception as e:
-            print(f"Error checking keyword variation: {e}")
+            logger.error("Error checking keyword variation: %s", e)
             return False
     
     def _get_keyword_variations(self, keyword: str) -> List[str]:
@@ -240,7 +258,7 @@ class KeywordDetector:
             return detected_keywords
             
         except Exception as e:
-            print(f"Error detecting audio keywords: {e}")
+            logger.error("Error detecting audio keywords: %s", e)
             return []
     
     def _analyze_audio_features(self, audio: np.ndarray) -> Dict[str, float]:
@@ -278,7 +296,7 @@ class KeywordDetector:
             return features
             
         except Exception as e:
-            print(f"Error analyzing audio features: {e}")
+            logger.error("Error analyzing audio features: %s", e)
             return {}
     
     def _calculate_voice_activity_ratio(self, audio: np.ndarray) -> float:
@@ -305,7 +323,7 @@ class KeywordDetector:
             return voice_frames / total_frames if total_frames > 0 else 0.0
             
         except Exception as e:
-            print(f"Error calculating voice activity ratio: {e}")
+            logger.error("Error calculating voice activity ratio: %s", e)
             return 0.0
     
     def _is_distress_pattern(self, features: Dict[str, float]) -> bool:
@@ -327,7 +345,7 @@ class KeywordDetector:
             return False
             
         except Exception as e:
-            print(f"Error checking distress pattern: {e}")
+            logger.error("Error checking distress pattern: %s", e)
             return False
     
     def _is_emergency_pattern(self, features: Dict[str, float]) -> bool:
@@ -349,7 +367,7 @@ class KeywordDetector:
             return False
             
         except Exception as e:
-            print(f"Error checking emergency pattern: {e}")
+            logger.error("Error checking emergency pattern: %s", e)
             return False
     
     def _is_pain_pattern(self, features: Dict[str, float]) -> bool:
@@ -371,7 +389,7 @@ class KeywordDetector:
             return False
             
         except Exception as e:
-            print(f"Error checking pain pattern: {e}")
+            logger.error("Error checking pain pattern: %s", e)
             return False
     
     async def get_distress_keywords(self) -> List[str]:
@@ -389,7 +407,7 @@ class KeywordDetector:
                 return f"Keyword '{keyword}' already exists"
                 
         except Exception as e:
-            print(f"Error adding distress keyword: {e}")
+            logger.error("Error adding distress keyword: %s", e)
             return f"Error adding keyword: {str(e)}"
     
     async def remove_distress_keyword(self, keyword: str) -> bool:
@@ -402,7 +420,7 @@ class KeywordDetector:
                 return False
                 
         except Exception as e:
-            print(f"Error removing distress keyword: {e}")
+            logger.error("Error removing distress keyword: %s", e)
             return False
     
     async def update_keyword_confidence(self, keyword: str, confidence: float):
@@ -414,7 +432,7 @@ class KeywordDetector:
                 self.confidence_threshold = confidence
                 
         except Exception as e:
-            print(f"Error updating keyword confidence: {e}")
+            logger.error("Error updating keyword confidence: %s", e)
     
     async def get_keyword_statistics(self) -> Dict[str, Any]:
         """Get keyword detection statistics"""
@@ -428,7 +446,7 @@ class KeywordDetector:
             }
             
         except Exception as e:
-            print(f"Error getting keyword statistics: {e}")
+            logger.error("Error getting keyword statistics: %s", e)
             return {}
     
     async def test_keyword_detection(self, text: str) -> Dict[str, Any]:
@@ -444,7 +462,7 @@ class KeywordDetector:
             }
             
         except Exception as e:
-            print(f"Error testing keyword detection: {e}")
+            logger.error("Error testing keyword detection: %s", e)
             return {
                 'input_text': text,
                 'detected_keywords': [],
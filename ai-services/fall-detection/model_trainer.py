@@ -1,4 +1,5 @@
 import asyncio
+import logging
 import numpy as np
 import librosa
 import soundfile as sf
@@ -12,6 +13,8 @@ from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
 import joblib
 
+logger = logging.getLogger(__name__)
+
 class ModelTrainer:
     def __init__(self):
         self.models = {}
@@ -48,7 +51,7 @@ class ModelTrainer:
                         valid_labels.append(labels[i])
                         
                 except Exception as e:
-                    print(f"Error processing audio file {audio_file}: {e}")
+                    logger.error("Error processing audio file %s: %s", audio_file, e)
                     continue
             
             if not features:
@@ -137,7 +140,7 @@ class ModelTrainer:
             }
             
         except Exception as e:
-            print(f"Error training model: {e}")
+            logger.error("Error training model: %s", e)
             return {
                 'status': 'error',
                 'message': f'Model training failed: {str(e)}'
@@ -163,7 +166,7 @@ class ModelTrainer:
             return audio
             
         except Exception as e:
-            print(f"Error loading audio file: {e}")
+            logger.error("Error loading audio file: %s", e)
             raise
     
     async def _extract_audio_features(self, audio: np.ndarray) -> Optional[List[float]]:
@@ -226,7 +229,7 @@ class ModelTrainer:
             return features
             
         except Exception as e:
-            print(f"Error extracting audio features: {e}")
+            logger.error("Error extracting audio features: %s", e)
             return None
     
     def _calculate_voice_activity_ratio(self, audio: np.ndarray) -> float:
@@ -255,7 +258,7 @@ class ModelTrainer:
             return voice_frames / len(energy) if len(energy) > 0 else 0.0
             
         except Exception as e:
-            print(f"Error calculating voice activity ratio: {e}")
+            logger.error("Error calculating voice activity ratio: %s", e)
             return 0.0
     
     async def get_model_performance(self, model_type: str) -> Dict[str, Any]:
@@ -270,7 +273,7 @@ class ModelTrainer:
                 }
                 
         except Exception as e:
-            print(f"Error getting model performance: {e}")
+            logger.error("Error getting model performance: %s", e)
             return {
                 'status': 'error',
                 'message': f'Error retrieving performance metrics: {str(e)}'
@@ -293,7 +296,7 @@ class ModelTrainer:
                 return False
                 
         except Exception as e:
-            print(f"Error loading model: {e}")
+            logger.error("Error loading model: %s", e)
             return False
     
     async def predict(self, audio_features: List[float], model_type: str) -> Tuple[str, float]:
@@ -317,7 +320,7 @@ class ModelTrainer:
             return prediction, confidence
             
         except Exception as e:
-            print(f"Error making prediction: {e}")
+            logger.error("Error making prediction: %s", e)
             return "unknown", 0.0
     
     async def get_available_models(self) -> List[str]:
@@ -334,7 +337,7 @@ class ModelTrainer:
             return models
             
         except Exception as e:
-            print(f"Error getting available models: {e}")
+            logger.error("Error getting available models: %s", e)
             return []
     
     async def delete_model(self, model_type: str) -> bool:
@@ -363,7 +366,7 @@ class ModelTrainer:
             return True
             
         except Exception as e:
-            print(f"Error deleting model: {e}")
+            logger.error("Error deleting model: %s", e)
             return False
     
     async def get_model_info(self, model_type: str) -> Dict[str, Any]:
@@ -396,7 +399,7 @@ class ModelTrainer:
             return info
             
         except Exception as e:
-            print(f"Error getting model info: {e}")
+            logger.error("Error getting model info: %s", e)
             return {
                 'model_type': model_type,
                 'error': str(e)
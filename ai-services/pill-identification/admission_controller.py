@@ -0,0 +1,131 @@
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Any, Optional
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted within its deadline"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class AdmissionController:
+    """Bound the number of concurrent image pipelines and queue the rest fairly.
+
+    Up to ``max_in_flight`` requests run at once. Further requests wait in a
+    per-client FIFO; slots are handed out round-robin across clients so that a
+    single caller uploading a burst cannot starve everyone else. Requests are
+    rejected up front when the queue is full or when the estimated wait already
+    exceeds ``queue_timeout``, and rejected later if they wait that long anyway.
+    """
+
+    def __init__(self, max_in_flight: Optional[int] = None, max_queue: Optional[int] = None,
+                 max_queue_per_client: Optional[int] = None, queue_timeout: Optional[float] = None):
+        self.max_in_flight = max_in_flight or int(os.getenv('PILL_MAX_IN_FLIGHT', os.cpu_count() or 1))
+        self.max_queue = max_queue if max_queue is not None else int(os.getenv('PILL_MAX_QUEUE', 32))
+        self.max_queue_per_client = max_queue_per_client or int(os.getenv('PILL_MAX_QUEUE_PER_CLIENT', 4))
+        self.queue_timeout = queue_timeout or float(os.getenv('PILL_QUEUE_TIMEOUT_SECONDS', 10))
+
+        self.in_flight = 0
+        self.queued = 0
+        self.rejected = 0
+        self._queues: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+
+        # Exponentially weighted average of pipeline service time, in seconds
+        self._avg_service_time = 0.5
+        self._ewma_alpha = 0.2
+
+    def _estimated_wait(self, position: int) -> float:
+        """Estimate how long a request at the given queue position will wait"""
+        return math.ceil(position / self.max_in_flight) * self._avg_service_time
+
+    def _reject(self, reason: str, position: int):
+        self.rejected += 1
+        raise AdmissionRejected(reason, self._estimated_wait(position))
+
+    async def acquire(self, client_id: str):
+        """Wait for a pipeline slot or raise AdmissionRejected"""
+        if self.in_flight < self.max_in_flight and self.queued == 0:
+            self.in_flight += 1
+            return
+
+        client_queue = self._queues.get(client_id)
+        if self.queued >= self.max_queue:
+            self._reject("Server is at capacity", self.queued + 1)
+        if client_queue and len(client_queue) >= self.max_queue_per_client:
+            self._reject("Too many pending requests for this client", self.queued + 1)
+        if self._estimated_wait(self.queued + 1) > self.queue_timeout:
+            self._reject("Estimated wait exceeds deadline", self.queued + 1)
+
+        future = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(client_id, deque()).append(future)
+        self.queued += 1
+
+        try:
+            await asyncio.wait_for(future, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._discard(client_id, future)
+            self._reject("Timed out waiting for capacity", self.queued + 1)
+        except asyncio.CancelledError:
+            # Client went away; hand the slot on if it was already granted
+            if future.done() and not future.cancelled():
+                self.release(None)
+            else:
+                self._discard(client_id, future)
+            raise
+
+    def _discard(self, client_id: str, future: asyncio.Future):
+        """Remove a waiter that gave up before being granted a slot"""
+        client_queue = self._queues.get(client_id)
+        if client_queue and future in client_queue:
+            client_queue.remove(future)
+            self.queued -= 1
+            if not client_queue:
+                del self._queues[client_id]
+
+    def release(self, service_time: Optional[float]):
+        """Release a slot and grant it to the next client in round-robin order"""
+        if service_time is not None:
+            self._avg_service_time += self._ewma_alpha * (service_time - self._avg_service_time)
+
+        while self._queues:
+            client_id, client_queue = self._queues.popitem(last=False)
+            future = client_queue.popleft()
+            self.queued -= 1
+            if client_queue:
+                self._queues[client_id] = client_queue
+
+            if not future.done():
+                # The slot passes directly to the waiter; in_flight is unchanged
+                future.set_result(True)
+                return
+
+        self.in_flight -= 1
+
+    @asynccontextmanager
+    async def slot(self, client_id: str):
+        """Hold a pipeline slot for the duration of the block"""
+        await self.acquire(client_id)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - start)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get admission statistics"""
+        return {
+            'in_flight': self.in_flight,
+            'queued': self.queued,
+            'rejected': self.rejected,
+            'max_in_flight': self.max_in_flight,
+            'max_queue': self.max_queue,
+            'avg_service_time': round(self._avg_service_time, 4)
+        }
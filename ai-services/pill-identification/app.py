@@ -1,21 +1,43 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import FastAPI, File, UploadFile, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 import uvicorn
 import os
+import logging
+import asyncio
+import cv2
+import numpy as np
 from dotenv import load_dotenv
 
 from pill_detector import PillDetector
-from image_processor import ImageProcessor
+from image_processor import ImageProcessor, ImageTooLargeError
+from pill_classifier import PillClassifier, MicroBatcher
+from admission_controller import AdmissionController, AdmissionRejected
+from request_coalescer import RequestCoalescer
+from processing_profiles import get_profile
+from metrics import REGISTRY, REQUEST_LATENCY, Counter, Gauge
+from job_manager import JobManager, JobStoreFull, InvalidCallbackURL
+from upload_limit import UploadSizeLimitMiddleware
+from service_common.service_logging import setup_logging, request_id_var, assign_request_id
+from service_common.startup import StartupTimings
+from service_common.fast_responses import FastResponse, ContentNegotiationMiddleware
+import time
+
+logger = logging.getLogger(__name__)
 
 # Load environment variables
 load_dotenv()
+setup_logging("pill-identification")
 
 app = FastAPI(
     title="MediCare Assist Pill Identification API",
     description="AI-powered pill identification using computer vision",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastResponse
 )
 
 # CORS middleware
@@ -27,13 +49,47 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Serve MessagePack to clients that ask for it
+app.add_middleware(ContentNegotiationMiddleware)
+
+# Seconds spent building each component, reported by /health and startup_report.py
+startup_timings = StartupTimings()
+
 # Initialize components
-pill_detector = PillDetector()
-image_processor = ImageProcessor()
+pill_detector = startup_timings.init('pill_detector', PillDetector)
+image_processor = startup_timings.init('image_processor', ImageProcessor)
+pill_classifier = startup_timings.init('pill_classifier', PillClassifier)
+classifier_batcher = MicroBatcher(pill_classifier)
+admission_controller = AdmissionController()
+request_coalescer = RequestCoalescer()
+job_manager = JobManager()
+
+# Set once this worker has finished warming up; served by /ready
+service_ready = False
+
+# Live service state exposed on /metrics
+REGISTRY.register(Gauge('pill_admission_in_flight', 'Image pipelines currently running',
+                        callback=lambda: admission_controller.in_flight))
+REGISTRY.register(Gauge('pill_admission_queue_depth', 'Requests waiting for a pipeline slot',
+                        callback=lambda: admission_controller.queued))
+REGISTRY.register(Counter('pill_admission_rejected_total', 'Requests rejected with 429',
+                          callback=lambda: admission_controller.rejected))
+REGISTRY.register(Counter('pill_coalescer_executed_total', 'Identification requests computed',
+                          callback=lambda: request_coalescer.executed))
+REGISTRY.register(Counter('pill_coalescer_hits_total', 'Identification requests served by an in-flight duplicate',
+                          callback=lambda: request_coalescer.coalesced))
+REGISTRY.register(Gauge('pill_classifier_queue_depth', 'Images waiting for the classifier micro-batcher',
+                        callback=lambda: classifier_batcher.queue.qsize() if classifier_batcher.queue else 0))
+REGISTRY.register(Gauge('pill_job_queue_depth', 'Asynchronous identification jobs waiting for a worker',
+                        callback=lambda: job_manager.queue.qsize() if job_manager.queue else 0))
 
 # Pydantic models
 class PillIdentificationRequest(BaseModel):
     image_url: str
+    profile: Optional[str] = None  # fast, balanced, accurate
+
+class PillIdentificationJobRequest(PillIdentificationRequest):
+    callback_url: Optional[str] = None
 
 class PillIdentificationResponse(BaseModel):
     pill_id: str
@@ -55,63 +111,307 @@ class PillSearchRequest(BaseModel):
     shape: Optional[str] = None
     imprint: Optional[str] = None
 
+def _warmup_pipeline():
+    """Run one synthetic image through the pipeline so lazy OpenCV/NumPy setup isn't paid by a request"""
+    image = np.full((256, 256, 3), 40, dtype=np.uint8)
+    cv2.circle(image, (128, 128), 60, (245, 245, 245), -1)
+    _, buffer = cv2.imencode('.png', image)
+
+    profile = get_profile('balanced')
+    processed = image_processor.preprocess_image_sync(buffer.tobytes(), profile)
+    pill_detector.extract_characteristics(processed, profile)
+
+# Warm up the learned classifier and image pipeline before serving traffic
+@app.on_event("startup")
+async def startup_event():
+    global service_ready
+    await classifier_batcher.start()
+    await job_manager.start()
+    with startup_timings.measure('warmup'):
+        try:
+            await run_in_threadpool(_warmup_pipeline)
+            service_ready = True
+        except Exception as e:
+            # Stay out of rotation: /ready keeps returning 503
+            logger.error("Error warming up pipeline, not marking ready: %s", e)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    global service_ready
+    service_ready = False
+    await job_manager.stop()
+    await classifier_batcher.stop()
+
+# Reject oversized uploads while the body is received, before the multipart
+# parser spools it; allow some slack for multipart boundaries and headers
+app.add_middleware(UploadSizeLimitMiddleware, max_body_bytes=image_processor.max_image_bytes + 64 * 1024)
+
+# Record end-to-end latency per route template
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        REQUEST_LATENCY.observe(
+            time.perf_counter() - start,
+            route=route.path if route else "unmatched",
+            status=status
+        )
+
+# Tag every log record written while handling a request with its correlation ID
+app.middleware("http")(assign_request_id)
+
+def _run_image_pipeline(image_data: bytearray, profile: Dict[str, Any]):
+    """Decode, preprocess and analyse an image (blocking)"""
+    processed_image = image_processor.preprocess_image_sync(image_data, profile)
+    return processed_image, pill_detector.extract_characteristics(processed_image, profile)
+
+async def _extract_characteristics(image_data: bytearray, profile: Dict[str, Any]) -> Dict[str, Any]:
+    """Run the image pipeline off the event loop and attach learned classifier scores if enabled"""
+    processed_image, pill_characteristics = await run_in_threadpool(_run_image_pipeline, image_data, profile)
+    
+    if pill_classifier.enabled and profile.get('classifier', True):
+        pill_characteristics['classifier_scores'] = await classifier_batcher.classify(processed_image)
+    
+    return pill_characteristics
+
+def _resolve_profile(name: Optional[str]) -> Dict[str, Any]:
+    try:
+        return get_profile(name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def _identify(client_id: str, load_image, profile: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Load, admit and identify a single image"""
+    # Downloads are I/O (capped at PILL_MAX_UPLOAD_BYTES): fetch before taking a CPU slot
+    image_data = await load_image()
+    
+    async with admission_controller.slot(client_id):
+        # Process image and detect pill characteristics
+        pill_characteristics = await _extract_characteristics(image_data, profile)
+    
+    return await pill_detector.identify_pill(pill_characteristics)
+
+async def _identify_job(key: str, client_id: str, load_image, profile: Dict[str, Any],
+                        max_attempts: int = 5) -> Dict[str, Any]:
+    """Background job body: identify, waiting out admission backpressure instead of failing"""
+    loaded = []
+    
+    async def load_once():
+        # Retries after a rejection reuse the image instead of downloading it again
+        if not loaded:
+            loaded.append(await load_image())
+        return loaded[0]
+    
+    for attempt in range(max_attempts):
+        try:
+            identification_result = await request_coalescer.run(
+                key, lambda: _identify(client_id, load_once, profile)
+            )
+            break
+        except AdmissionRejected as rejection:
+            if attempt == max_attempts - 1:
+                raise
+            await asyncio.sleep(rejection.retry_after)
+    
+    if not identification_result:
+        raise HTTPException(status_code=404, detail="Pill not identified")
+    
+    return jsonable_encoder(PillIdentificationResponse(**identification_result))
+
+def _job_accepted(job: Dict[str, Any]) -> JSONResponse:
+    return JSONResponse(
+        status_code=202,
+        content={"job_id": job['job_id'], "status": job['status'], "poll_url": f"/jobs/{job['job_id']}"}
+    )
+
+def _client_id(request: Request) -> str:
+    """Identify the caller for fair queueing"""
+    return request.headers.get("X-Client-ID") or (request.client.host if request.client else "anonymous")
+
+def _too_busy(rejection: AdmissionRejected) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail=rejection.reason,
+        headers={"Retry-After": str(rejection.retry_after)}
+    )
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "service": "pill-identification"}
+    return {
+        "status": "healthy",
+        "service": "pill-identification",
+        "classifier_enabled": pill_classifier.enabled,
+        "admission": admission_controller.get_stats(),
+        "coalescing": request_coalescer.get_stats(),
+        "jobs": job_manager.get_stats(),
+        "startup": startup_timings
+    }
+
+# Readiness probe: only passes once this worker has warmed up
+@app.get("/ready")
+async def readiness_check():
+    if not service_ready:
+        return JSONResponse(status_code=503, content={"status": "starting"})
+    return {"status": "ready"}
+
+# Prometheus metrics
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
 
 # Identify pill from uploaded image
 @app.post("/identify", response_model=PillIdentificationResponse)
-async def identify_pill(file: UploadFile = File(...)):
+async def identify_pill(request: Request, file: UploadFile = File(...), profile: Optional[str] = None):
     try:
         # Validate file type
         if not file.content_type.startswith('image/'):
             raise HTTPException(status_code=400, detail="File must be an image")
         
-        # Read image data
-        image_data = await file.read()
+        processing_profile = _resolve_profile(profile)
         
-        # Process image
-        processed_image = image_processor.preprocess_image(image_data)
+        # Read image data into a single buffer, enforcing the size cap
+        image_data = await image_processor.read_upload(file)
         
-        # Detect pill characteristics
-        pill_characteristics = pill_detector.extract_characteristics(processed_image)
+        async def load_image():
+            return image_data
         
-        # Identify pill
-        identification_result = await pill_detector.identify_pill(pill_characteristics)
+        # Identify pill, sharing the work with identical concurrent uploads
+        identification_result = await request_coalescer.run(
+            f"{processing_profile['name']}:{request_coalescer.content_key(image_data)}",
+            lambda: _identify(_client_id(request), load_image, processing_profile)
+        )
         
         if not identification_result:
             raise HTTPException(status_code=404, detail="Pill not identified")
         
         return PillIdentificationResponse(**identification_result)
         
+    except AdmissionRejected as rejection:
+        raise _too_busy(rejection)
+    except ImageTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Pill identification error: {str(e)}")
 
 # Identify pill from URL
 @app.post("/identify-url", response_model=PillIdentificationResponse)
-async def identify_pill_from_url(request: PillIdentificationRequest):
+async def identify_pill_from_url(request: PillIdentificationRequest, http_request: Request):
     try:
-        # Download image from URL
-        image_data = image_processor.download_image_from_url(request.image_url)
-        
-        # Process image
-        processed_image = image_processor.preprocess_image(image_data)
+        processing_profile = _resolve_profile(request.profile)
         
-        # Detect pill characteristics
-        pill_characteristics = pill_detector.extract_characteristics(processed_image)
+        async def load_image():
+            # Download image from URL
+            return await image_processor.download_image_from_url(request.image_url)
         
-        # Identify pill
-        identification_result = await pill_detector.identify_pill(pill_characteristics)
+        # Identify pill, sharing the work with identical concurrent requests
+        identification_result = await request_coalescer.run(
+            f"{processing_profile['name']}:{request_coalescer.url_key(request.image_url)}",
+            lambda: _identify(_client_id(http_request), load_image, processing_profile)
+        )
         
         if not identification_result:
             raise HTTPException(status_code=404, detail="Pill not identified")
         
         return PillIdentificationResponse(**identification_result)
         
+    except AdmissionRejected as rejection:
+        raise _too_busy(rejection)
+    except ImageTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Pill identification error: {str(e)}")
 
+# Submit an identification job for an uploaded image
+@app.post("/jobs/identify", status_code=202)
+async def submit_identify_job(request: Request, file: UploadFile = File(...), profile: Optional[str] = None,
+                              callback_url: Optional[str] = None):
+    try:
+        if not file.content_type.startswith('image/'):
+            raise HTTPException(status_code=400, detail="File must be an image")
+        
+        processing_profile = _resolve_profile(profile)
+        
+        if callback_url:
+            await run_in_threadpool(job_manager.validate_callback_url, callback_url)
+        
+        # The upload is closed once we respond, so buffer it now
+        image_data = await image_processor.read_upload(file)
+        
+        async def load_image():
+            return image_data
+        
+        job = job_manager.submit(
+            lambda: _identify_job(
+                f"{processing_profile['name']}:{request_coalescer.content_key(image_data)}",
+                _client_id(request), load_image, processing_profile
+            ),
+            callback_url=callback_url,
+            metadata={'profile': processing_profile['name']}
+        )
+        return _job_accepted(job)
+        
+    except JobStoreFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
+    except InvalidCallbackURL as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except ImageTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error submitting identification job: {str(e)}")
+
+# Submit an identification job for an image URL
+@app.post("/jobs/identify-url", status_code=202)
+async def submit_identify_url_job(request: PillIdentificationJobRequest, http_request: Request):
+    try:
+        processing_profile = _resolve_profile(request.profile)
+        if request.callback_url:
+            await run_in_threadpool(job_manager.validate_callback_url, request.callback_url)
+        
+        async def load_image():
+            return await image_processor.download_image_from_url(request.image_url)
+        
+        job = job_manager.submit(
+            lambda: _identify_job(
+                f"{processing_profile['name']}:{request_coalescer.url_key(request.image_url)}",
+                _client_id(http_request), load_image, processing_profile
+            ),
+            callback_url=request.callback_url,
+            metadata={'profile': processing_profile['name'], 'image_url': request.image_url}
+        )
+        return _job_accepted(job)
+        
+    except JobStoreFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
+    except InvalidCallbackURL as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error submitting identification job: {str(e)}")
+
+# Poll (or long-poll with ?wait=seconds) for a job result
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, wait: float = 0):
+    job = await job_manager.get(job_id, wait=min(max(wait, 0), 30))
+    
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    
+    return job
+
 # Get pill details by ID
 @app.get("/pill-details/{pill_id}")
 async def get_pill_details(pill_id: str):
@@ -0,0 +1,301 @@
+"""Benchmark the pill identification pipeline on a synthetic image corpus.
+
+Usage:
+    python benchmark.py --images 200 --output bench.json
+    python benchmark.py --images 200 --compare bench.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List, Any, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from image_processor import ImageProcessor
+from pill_detector import PillDetector
+from processing_profiles import get_profile
+
+PILL_COLORS = {
+    'white': (245, 245, 245),
+    'yellow': (40, 220, 240),
+    'orange': (30, 140, 250),
+    'red': (40, 40, 210),
+    'pink': (180, 150, 245),
+    'blue': (200, 120, 40),
+    'green': (70, 170, 60),
+    'brown': (40, 80, 130)
+}
+PILL_SHAPES = ['round', 'oval', 'capsule', 'rectangle', 'triangle']
+BACKGROUNDS = ['dark', 'light', 'gradient', 'noise']
+IMPRINTS = ['', '81', 'M500', 'L10', 'A7', '325']
+
+
+def _draw_pill(canvas: np.ndarray, shape: str, center: Tuple[int, int], size: int, color: Tuple[int, int, int]):
+    """Draw a filled pill outline onto the canvas"""
+    cx, cy = center
+    if shape == 'round':
+        cv2.circle(canvas, center, size, color, -1, cv2.LINE_AA)
+    elif shape == 'oval':
+        cv2.ellipse(canvas, center, (size, int(size * 0.65)), 0, 0, 360, color, -1, cv2.LINE_AA)
+    elif shape == 'capsule':
+        half = int(size * 0.6)
+        radius = int(size * 0.45)
+        cv2.rectangle(canvas, (cx - half, cy - radius), (cx + half, cy + radius), color, -1)
+        cv2.circle(canvas, (cx - half, cy), radius, color, -1, cv2.LINE_AA)
+        cv2.circle(canvas, (cx + half, cy), radius, color, -1, cv2.LINE_AA)
+    elif shape == 'rectangle':
+        cv2.rectangle(canvas, (cx - size, cy - int(size * 0.6)), (cx + size, cy + int(size * 0.6)), color, -1)
+    elif shape == 'triangle':
+        points = np.array([[cx, cy - size], [cx - size, cy + size], [cx + size, cy + size]], dtype=np.int32)
+        cv2.fillPoly(canvas, [points], color, cv2.LINE_AA)
+
+
+def _render_background(kind: str, height: int, width: int, rng: np.random.Generator) -> np.ndarray:
+    """Render a background of the given kind"""
+    if kind == 'dark':
+        return np.full((height, width, 3), 40, dtype=np.uint8)
+    if kind == 'light':
+        return np.full((height, width, 3), 200, dtype=np.uint8)
+    if kind == 'gradient':
+        ramp = np.linspace(30, 220, width, dtype=np.uint8)
+        return np.repeat(np.tile(ramp, (height, 1))[:, :, None], 3, axis=2)
+    return rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+
+
+def render_synthetic_pill(spec: Dict[str, Any], rng: np.random.Generator) -> np.ndarray:
+    """Render a single synthetic pill image from a spec"""
+    height, width = spec['resolution']
+    image = _render_background(spec['background'], height, width, rng)
+
+    center = (width // 2, height // 2)
+    size = int(min(height, width) * spec['scale'])
+    _draw_pill(image, spec['shape'], center, size, PILL_COLORS[spec['color']])
+
+    if spec['imprint']:
+        font_scale = size / 40.0
+        (text_w, text_h), _ = cv2.getTextSize(spec['imprint'], cv2.FONT_HERSHEY_SIMPLEX, font_scale, 2)
+        origin = (center[0] - text_w // 2, center[1] + text_h // 2)
+        cv2.putText(image, spec['imprint'], origin, cv2.FONT_HERSHEY_SIMPLEX, font_scale, (60, 60, 60), 2, cv2.LINE_AA)
+
+    if spec['blur'] > 0:
+        kernel = spec['blur'] * 2 + 1
+        image = cv2.GaussianBlur(image, (kernel, kernel), 0)
+
+    return image
+
+
+def build_corpus(count: int, seed: int = 42) -> List[Dict[str, Any]]:
+    """Build a reproducible corpus of encoded synthetic pill images"""
+    rng = np.random.default_rng(seed)
+    picker = random.Random(seed)
+    corpus = []
+
+    for _ in range(count):
+        spec = {
+            'color': picker.choice(list(PILL_COLORS)),
+            'shape': picker.choice(PILL_SHAPES),
+            'scale': picker.uniform(0.1, 0.35),
+            'imprint': picker.choice(IMPRINTS),
+            'background': picker.choice(BACKGROUNDS),
+            'blur': picker.choice([0, 0, 1, 3]),
+            'resolution': picker.choice([(480, 640), (720, 960), (1080, 1440)])
+        }
+        image = render_synthetic_pill(spec, rng)
+        encoding = picker.choice(['.jpg', '.png'])
+        _, buffer = cv2.imencode(encoding, image)
+        corpus.append({'spec': spec, 'encoding': encoding, 'data': buffer.tobytes()})
+
+    return corpus
+
+
+class StageTimer:
+    """Collect per-stage latency samples in nanoseconds"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[int]] = {}
+
+    def run(self, stage: str, func: Callable, *args, **kwargs):
+        start = time.perf_counter_ns()
+        result = func(*args, **kwargs)
+        self.samples.setdefault(stage, []).append(time.perf_counter_ns() - start)
+        return result
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        report = {}
+        for stage, samples in self.samples.items():
+            values = np.array(samples, dtype=np.float64) / 1e6
+            report[stage] = {
+                'count': int(values.size),
+                'mean_ms': round(float(values.mean()), 4),
+                'p50_ms': round(float(np.percentile(values, 50)), 4),
+                'p95_ms': round(float(np.percentile(values, 95)), 4),
+                'max_ms': round(float(values.max()), 4)
+            }
+        return report
+
+
+def benchmark_stages(corpus: List[Dict[str, Any]], processor: ImageProcessor,
+                     detector: PillDetector) -> Dict[str, Dict[str, float]]:
+    """Time every pipeline stage individually"""
+    timer = StageTimer()
+    loop = asyncio.new_event_loop()
+
+    try:
+        for item in corpus:
+            image = timer.run('decode', processor._bytes_to_image, item['data'])
+            image = timer.run('resize', processor._resize_image, image)
+            image = timer.run('enhance', processor._enhance_image, image)
+            image = timer.run('remove_background', processor._remove_background, image)
+
+            gray = timer.run('to_gray', cv2.cvtColor, image, cv2.COLOR_BGR2GRAY)
+            contour = timer.run('find_contour', detector._find_pill_contour, gray)
+            shape = timer.run('detect_shape', detector._detect_shape, gray, contour)
+            texture = timer.run('detect_texture', detector._detect_texture, gray)
+            characteristics = {
+                'color': timer.run('detect_color', detector._detect_color, image),
+                'shape': shape['shape'],
+                'shape_similarities': shape['similarities'],
+                'size': timer.run('detect_size', detector._detect_size, gray, contour),
+                'imprint': timer.run('detect_imprint', detector._detect_imprint, image, use_ocr=False),
+                'edges': timer.run('detect_edges', detector._detect_edges, gray),
+                'texture_descriptor': texture,
+                'texture': detector._texture_label(texture)
+            }
+
+            timer.run('matching', loop.run_until_complete, detector.identify_pill(characteristics))
+    finally:
+        loop.close()
+
+    return timer.summary()
+
+
+def _identify_all(corpus: List[Dict[str, Any]], processor: ImageProcessor, detector: PillDetector,
+                  profile: Dict[str, Any], timer: Optional[StageTimer] = None):
+    """Run every image through the full pipeline, optionally timing each one"""
+    loop = asyncio.new_event_loop()
+    try:
+        for item in corpus:
+            def identify():
+                image = processor.preprocess_image_sync(item['data'], profile)
+                characteristics = detector.extract_characteristics(image, profile)
+                return loop.run_until_complete(detector.identify_pill(characteristics))
+
+            if timer is not None:
+                timer.run('end_to_end', identify)
+            else:
+                identify()
+    finally:
+        loop.close()
+
+
+def benchmark_pipeline(corpus: List[Dict[str, Any]], processor: ImageProcessor, detector: PillDetector,
+                       profile: Dict[str, Any]) -> Dict[str, Any]:
+    """Measure end-to-end throughput and peak memory for one profile.
+
+    Latency and throughput are timed with tracing off; tracemalloc hooks every
+    allocation and would inflate them. Peak memory comes from a second,
+    untimed pass with tracemalloc running.
+    """
+    timer = StageTimer()
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    _identify_all(corpus, processor, detector, profile, timer)
+    wall_seconds = time.perf_counter() - wall_start
+    cpu_seconds = time.process_time() - cpu_start
+
+    tracemalloc.start()
+    try:
+        _identify_all(corpus, processor, detector, profile)
+        _, peak_traced = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'profile': profile['name'],
+        'images': len(corpus),
+        'latency': timer.summary()['end_to_end'],
+        'throughput_images_per_sec': round(len(corpus) / wall_seconds, 2),
+        'throughput_per_core_images_per_sec': round(len(corpus) / cpu_seconds, 2) if cpu_seconds else None,
+        'peak_traced_memory_mb': round(peak_traced / 1024 / 1024, 2)
+    }
+
+
+def _environment() -> Dict[str, Any]:
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+        'opencv_threads': cv2.getNumThreads()
+    }
+
+
+def compare_results(current: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """Describe p50/p95 changes between two benchmark runs"""
+    lines = []
+    for stage, stats in current['stages'].items():
+        previous = baseline.get('stages', {}).get(stage)
+        if not previous:
+            continue
+        for key in ('p50_ms', 'p95_ms'):
+            if previous[key]:
+                change = (stats[key] - previous[key]) / previous[key] * 100
+                lines.append(f"{stage:<20} {key:<7} {previous[key]:>9.3f} -> {stats[key]:>9.3f} ms ({change:+.1f}%)")
+    return lines
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark the pill identification pipeline")
+    parser.add_argument('--images', type=int, default=100, help="Number of synthetic images")
+    parser.add_argument('--seed', type=int, default=42, help="Corpus random seed")
+    parser.add_argument('--profiles', default='fast,balanced,accurate', help="Comma-separated profiles to run end to end")
+    parser.add_argument('--output', default='bench_results.json', help="Where to write the JSON report")
+    parser.add_argument('--compare', help="Previous JSON report to compare against")
+    args = parser.parse_args(argv)
+
+    processor = ImageProcessor()
+    detector = PillDetector()
+    # Never call out to Vision during benchmarks
+    detector.vision_client = None
+
+    corpus = build_corpus(args.images, args.seed)
+
+    results = {
+        'environment': _environment(),
+        'corpus': {'images': len(corpus), 'seed': args.seed},
+        'stages': benchmark_stages(corpus, processor, detector),
+        'pipelines': [
+            benchmark_pipeline(corpus, processor, detector, get_profile(name))
+            for name in args.profiles.split(',') if name
+        ],
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2)
+    }
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    for stage, stats in results['stages'].items():
+        print(f"{stage:<20} p50 {stats['p50_ms']:>9.3f} ms   p95 {stats['p95_ms']:>9.3f} ms")
+    for pipeline in results['pipelines']:
+        print(f"profile {pipeline['profile']:<10} {pipeline['throughput_per_core_images_per_sec']} img/s/core, "
+              f"p95 {pipeline['latency']['p95_ms']} ms, peak {pipeline['peak_traced_memory_mb']} MB")
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print("\n".join(compare_results(results, baseline)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""Build a precomputed pill catalog artifact from catalog rows and reference images.
+
+Usage:
+    python catalog_ingest.py catalog.csv --images-dir images/ --output catalog.json.gz
+    PILL_CATALOG_PATH=catalog.json.gz python app.py
+
+Each row needs a ``pill_id`` and may provide ``name``, ``dosage``, ``manufacturer``,
+``color``, ``shape``, ``size``, ``imprint``, ``description``, ``storage``,
+``administration``, ``image`` and the list fields ``side_effects``,
+``interactions`` and ``contraindications`` (``;``-separated in CSV).
+
+Finished rows are appended to ``<output>.partial.jsonl`` so an interrupted run
+resumes where it stopped.
+"""
+import argparse
+import json
+import os
+import time
+from multiprocessing import Pool
+from typing import Dict, List, Any, Optional, Tuple
+
+import numpy as np
+
+from pill_catalog import iter_catalog_rows, write_catalog, CATALOG_FORMAT_VERSION
+from processing_profiles import get_profile
+
+LIST_FIELDS = ['side_effects', 'interactions', 'contraindications']
+
+# Per-worker pipeline state, created once per process by _init_worker
+_worker: Dict[str, Any] = {}
+
+
+def _init_worker(profile_name: str, use_ocr: bool):
+    from image_processor import ImageProcessor
+    from pill_detector import PillDetector
+
+    detector = PillDetector()
+    if not use_ocr:
+        detector.vision_client = None
+
+    _worker['processor'] = ImageProcessor()
+    _worker['detector'] = detector
+    _worker['profile'] = get_profile(profile_name)
+
+
+def _json_features(characteristics: Dict[str, Any]) -> Dict[str, Any]:
+    """Keep only compact, JSON-serializable descriptors"""
+    features = {}
+    for key, value in characteristics.items():
+        if isinstance(value, np.ndarray):
+            # Full-resolution maps such as the edge image are not stored
+            if value.ndim == 1 and value.size <= 256:
+                features[key] = [round(float(v), 6) for v in value]
+        elif isinstance(value, (np.floating, np.integer)):
+            features[key] = value.item()
+        elif isinstance(value, (str, int, float, bool, list, dict)) or value is None:
+            features[key] = value
+    return features
+
+
+def _normalize_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    record = {key: value for key, value in row.items() if key != 'image' and value not in (None, '')}
+    for field in LIST_FIELDS:
+        value = record.get(field)
+        if isinstance(value, str):
+            record[field] = [item.strip() for item in value.split(';') if item.strip()]
+    return record
+
+
+def _process_row(task: Tuple[Dict[str, Any], Optional[str]]) -> Tuple[str, Optional[Dict[str, Any]], Optional[str]]:
+    """Extract features for one catalog row (runs in a worker process)"""
+    row, image_path = task
+    pill_id = str(row.get('pill_id', ''))
+
+    try:
+        record = _normalize_row(row)
+        record['features'] = {}
+
+        if image_path:
+            with open(image_path, 'rb') as f:
+                image_data = f.read()
+            image = _worker['processor'].preprocess_image_sync(image_data, _worker['profile'])
+            characteristics = _worker['detector'].extract_characteristics(image, _worker['profile'])
+            record['features'] = _json_features(characteristics)
+
+        return pill_id, record, None
+
+    except Exception as e:
+        return pill_id, None, str(e)
+
+
+def _load_checkpoint(path: str) -> Dict[str, Dict[str, Any]]:
+    completed = {}
+    if not os.path.exists(path):
+        return completed
+
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A truncated final line from an interrupted run
+                continue
+            completed[record['pill_id']] = record
+    return completed
+
+
+def _resolve_image(row: Dict[str, Any], images_dir: str) -> Optional[str]:
+    image = row.get('image')
+    if not image:
+        return None
+    return image if os.path.isabs(image) else os.path.join(images_dir, image)
+
+
+def ingest(catalog_path: str, output_path: str, images_dir: Optional[str] = None, workers: Optional[int] = None,
+           profile_name: str = 'accurate', use_ocr: bool = False) -> Dict[str, Any]:
+    """Run the ingestion and return a summary"""
+    images_dir = images_dir or os.path.dirname(os.path.abspath(catalog_path))
+    checkpoint_path = f"{output_path}.partial.jsonl"
+    completed = _load_checkpoint(checkpoint_path)
+    resumed = len(completed)
+    failures: List[Dict[str, str]] = []
+    start = time.time()
+
+    def pending_tasks():
+        for row in iter_catalog_rows(catalog_path):
+            pill_id = str(row.get('pill_id') or '')
+            if not pill_id:
+                failures.append({'pill_id': '', 'error': 'missing pill_id'})
+                continue
+            if pill_id not in completed:
+                yield row, _resolve_image(row, images_dir)
+
+    with open(checkpoint_path, 'a', encoding='utf-8') as checkpoint, \
+            Pool(processes=workers or os.cpu_count(), initializer=_init_worker,
+                 initargs=(profile_name, use_ocr)) as pool:
+        for pill_id, record, error in pool.imap_unordered(_process_row, pending_tasks(), chunksize=8):
+            if error:
+                failures.append({'pill_id': pill_id, 'error': error})
+                continue
+            completed[pill_id] = record
+            checkpoint.write(json.dumps(record, separators=(',', ':')) + '\n')
+            checkpoint.flush()
+
+    content_hash = write_catalog(output_path, completed, {
+        'source': os.path.basename(catalog_path),
+        'profile': profile_name,
+        'ocr': use_ocr
+    })
+
+    # Keep the checkpoint when rows failed so a rerun only retries those
+    if not failures:
+        os.remove(checkpoint_path)
+
+    return {
+        'output': output_path,
+        'format_version': CATALOG_FORMAT_VERSION,
+        'content_hash': content_hash,
+        'pills': len(completed),
+        'resumed': resumed,
+        'failed': failures,
+        'seconds': round(time.time() - start, 2)
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Precompute a pill catalog artifact")
+    parser.add_argument('catalog', help="CSV, JSON array or JSON-lines catalog file")
+    parser.add_argument('--images-dir', help="Directory reference image paths are relative to")
+    parser.add_argument('--output', default='catalog.json.gz', help="Artifact path (always gzip-compressed)")
+    parser.add_argument('--workers', type=int, help="Worker processes (default: all cores)")
+    parser.add_argument('--profile', default='accurate', help="Processing profile for feature extraction")
+    parser.add_argument('--ocr', action='store_true', help="Use Google Vision OCR for imprints")
+    args = parser.parse_args(argv)
+
+    summary = ingest(args.catalog, args.output, args.images_dir, args.workers, args.profile, args.ocr)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
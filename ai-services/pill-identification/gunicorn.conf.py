@@ -0,0 +1,47 @@
+"""Production server settings for the pill identification service.
+
+Run from this directory:
+    gunicorn app:app
+
+The app is imported once in the master process (``preload_app``) so the pill
+catalog and shape templates are built once and shared copy-on-write by the
+forked workers. The classifier's TFLite interpreters and the Vision client are
+created in each worker after the fork. Send ``SIGHUP`` to the master for a graceful restart:
+new workers are booted before the old ones are drained.
+
+Job results (``/jobs``) and ``/metrics`` live in the worker's memory, and
+workers share one listening socket, so a job poll or metrics scrape can land on
+any of them. The service therefore runs a single worker by default; scale it
+by running more instances (each with its own port) rather than raising
+``WEB_CONCURRENCY``.
+"""
+import gc
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8002')}"
+# One worker: jobs and metrics are held in process memory
+workers = int(os.getenv('WEB_CONCURRENCY', 1))
+worker_class = 'uvicorn.workers.UvicornWorker'
+preload_app = True
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+
+# Recycle workers periodically to bound slow leaks (0 disables)
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = max_requests // 10
+
+accesslog = '-'
+
+
+def when_ready(server):
+    # Move everything allocated at import into the permanent generation so
+    # garbage collection in the workers never writes to the shared pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # One OpenCV thread pool per worker would oversubscribe the cores
+    import cv2
+    cv2.setNumThreads(int(os.getenv('PILL_OPENCV_THREADS', 1)))
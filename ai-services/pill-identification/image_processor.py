@@ -1,66 +1,82 @@
 import cv2
 import numpy as np
-import requests
-from PIL import Image
-import io
-from typing import Optional, Tuple
+import os
+import logging
+from typing import Optional, Tuple, Dict, Any, Union
 import asyncio
+from metrics import timed, STAGE_ERRORS
+
+logger = logging.getLogger(__name__)
+
+ImageBuffer = Union[bytes, bytearray, memoryview]
+
+class ImageTooLargeError(ValueError):
+    """Raised when an upload or download exceeds the configured size cap"""
 
 class ImageProcessor:
     def __init__(self):
         self.target_size = (512, 512)
         self.min_contour_area = 1000
+        self.max_image_bytes = int(os.getenv('PILL_MAX_UPLOAD_BYTES', 10 * 1024 * 1024))
+        self.chunk_size = 64 * 1024
     
-    async def preprocess_image(self, image_data: bytes) -> np.ndarray:
+    async def preprocess_image(self, image_data: ImageBuffer, profile: Optional[Dict[str, Any]] = None) -> np.ndarray:
         """Preprocess image for pill detection"""
+        return self.preprocess_image_sync(image_data, profile)
+    
+    @timed('preprocess')
+    def preprocess_image_sync(self, image_data: ImageBuffer, profile: Optional[Dict[str, Any]] = None) -> np.ndarray:
+        """Preprocess image for pill detection (blocking, safe to run in a worker thread)"""
         try:
+            profile = profile or {}
+            
             # Convert bytes to numpy array
             image = self._bytes_to_image(image_data)
             
             # Resize image
-            image = self._resize_image(image)
+            image = self._resize_image(image, profile.get('target_size'))
             
             # Enhance image quality
-            image = self._enhance_image(image)
+            if profile.get('enhance', True):
+                image = self._enhance_image(image)
             
             # Remove background
-            image = self._remove_background(image)
+            if profile.get('remove_background', True):
+                image = self._remove_background(image)
             
             return image
             
         except Exception as e:
-            print(f"Error preprocessing image: {e}")
+            logger.error("Error preprocessing image: %s", e)
             raise
     
-    def _bytes_to_image(self, image_data: bytes) -> np.ndarray:
+    @timed('decode')
+    def _bytes_to_image(self, image_data: ImageBuffer) -> np.ndarray:
         """Convert bytes to OpenCV image"""
         try:
-            # Use PIL to load image from bytes
-            pil_image = Image.open(io.BytesIO(image_data))
-            
-            # Convert PIL image to OpenCV format
-            if pil_image.mode == 'RGBA':
-                pil_image = pil_image.convert('RGB')
-            
-            # Convert to numpy array
-            image = np.array(pil_image)
+            # View the encoded bytes without copying and decode straight to BGR
+            # (alpha is dropped, grayscale is expanded, EXIF orientation applied)
+            buffer = np.frombuffer(image_data, dtype=np.uint8)
+            image = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
             
-            # Convert RGB to BGR for OpenCV
-            image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+            if image is None:
+                raise ValueError("Unsupported or corrupt image data")
             
             return image
             
         except Exception as e:
-            print(f"Error converting bytes to image: {e}")
+            logger.error("Error converting bytes to image: %s", e)
             raise
     
-    def _resize_image(self, image: np.ndarray) -> np.ndarray:
+    @timed('resize')
+    def _resize_image(self, image: np.ndarray, target_size: Optional[Tuple[int, int]] = None) -> np.ndarray:
         """Resize image to target size while maintaining aspect ratio"""
         try:
+            target_size = target_size or self.target_size
             h, w = image.shape[:2]
             
             # Calculate scaling factor
-            scale = min(self.target_size[0] / w, self.target_size[1] / h)
+            scale = min(target_size[0] / w, target_size[1] / h)
             
             # Calculate new dimensions
             new_w = int(w * scale)
@@ -70,20 +86,22 @@ class ImageProcessor:
             resized = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_AREA)
             
             # Create canvas with target size
-            canvas = np.zeros((self.target_size[1], self.target_size[0], 3), dtype=np.uint8)
+            canvas = np.zeros((target_size[1], target_size[0], 3), dtype=np.uint8)
             
             # Center the resized image on canvas
-            y_offset = (self.target_size[1] - new_h) // 2
-            x_offset = (self.target_size[0] - new_w) // 2
+            y_offset = (target_size[1] - new_h) // 2
+            x_offset = (target_size[0] - new_w) // 2
             
             canvas[y_offset:y_offset+new_h, x_offset:x_offset+new_w] = resized
             
             return canvas
             
         except Exception as e:
-            print(f"Error resizing image: {e}")
+            STAGE_ERRORS.inc(stage='resize')
+            logger.error("Error resizing image: %s", e)
             return image
     
+    @timed('enhance')
     def _enhance_image(self, image: np.ndarray) -> np.ndarray:
         """Enhance image quality for better detection"""
         try:
@@ -107,9 +125,11 @@ class ImageProcessor:
             return enhanced
             
         except Exception as e:
-            print(f"Error enhancing image: {e}")
+            STAGE_ERRORS.inc(stage='enhance')
+            logger.error("Error enhancing image: %s", e)
             return image
     
+    @timed('remove_background')
     def _remove_background(self, image: np.ndarray) -> np.ndarray:
         """Remove background and isolate pill"""
         try:
@@ -149,20 +169,63 @@ class ImageProcessor:
             return image
             
         except Exception as e:
-            print(f"Error removing background: {e}")
+            STAGE_ERRORS.inc(stage='remove_background')
+            logger.error("Error removing background: %s", e)
             return image
     
-    async def download_image_from_url(self, url: str) -> bytes:
+    @timed('upload')
+    async def read_upload(self, upload) -> bytearray:
+        """Read an UploadFile into a single buffer, enforcing the size cap"""
+        size = getattr(upload, 'size', None)
+        
+        if size is not None:
+            if size > self.max_image_bytes:
+                raise ImageTooLargeError(f"Image exceeds {self.max_image_bytes} bytes")
+            
+            # Known size: fill one preallocated buffer from the spooled file
+            buffer = bytearray(size)
+            await upload.seek(0)
+            read = await asyncio.get_running_loop().run_in_executor(None, upload.file.readinto, buffer)
+            return buffer if read == size else buffer[:read]
+        
+        buffer = bytearray()
+        while True:
+            chunk = await upload.read(self.chunk_size)
+            if not chunk:
+                return buffer
+            if len(buffer) + len(chunk) > self.max_image_bytes:
+                raise ImageTooLargeError(f"Image exceeds {self.max_image_bytes} bytes")
+            buffer += chunk
+    
+    @timed('download')
+    async def download_image_from_url(self, url: str) -> bytearray:
         """Download image from URL"""
         try:
-            response = requests.get(url, timeout=30)
-            response.raise_for_status()
-            return response.content
+            return await asyncio.get_running_loop().run_in_executor(None, self._download, url)
             
         except Exception as e:
-            print(f"Error downloading image from URL: {e}")
+            logger.error("Error downloading image from URL: %s", e)
             raise
     
+    def _download(self, url: str) -> bytearray:
+        """Stream a remote image into a buffer, enforcing the size cap"""
+        import requests
+        
+        with requests.get(url, timeout=30, stream=True) as response:
+            response.raise_for_status()
+            
+            declared = int(response.headers.get('Content-Length') or 0)
+            if declared > self.max_image_bytes:
+                raise ImageTooLargeError(f"Image exceeds {self.max_image_bytes} bytes")
+            
+            buffer = bytearray()
+            for chunk in response.iter_content(chunk_size=self.chunk_size):
+                if len(buffer) + len(chunk) > self.max_image_bytes:
+                    raise ImageTooLargeError(f"Image exceeds {self.max_image_bytes} bytes")
+                buffer += chunk
+            
+            return buffer
+    
     def detect_pill_region(self, image: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
         """Detect the region containing the pill"""
         try:
@@ -194,7 +257,7 @@ class ImageProcessor:
             return (x, y, w, h)
             
         except Exception as e:
-            print(f"Error detecting pill region: {e}")
+            logger.error("Error detecting pill region: %s", e)
             return None
     
     def crop_pill_region(self, image: np.ndarray, region: Tuple[int, int, int, int]) -> np.ndarray:
@@ -204,7 +267,7 @@ class ImageProcessor:
             return image[y:y+h, x:x+w]
             
         except Exception as e:
-            print(f"Error cropping pill region: {e}")
+            logger.error("Error cropping pill region: %s", e)
             return image
     
     def normalize_lighting(self, image: np.ndarray) -> np.ndarray:
@@ -226,7 +289,7 @@ class ImageProcessor:
             return normalized
             
         except Exception as e:
-            print(f"Error normalizing lighting: {e}")
+            logger.error("Error normalizing lighting: %s", e)
             return image
     
     def detect_edges(self, image: np.ndarray) -> np.ndarray:
@@ -244,7 +307,7 @@ class ImageProcessor:
             return edges
             
         except Exception as e:
-            print(f"Error detecting edges: {e}")
+            logger.error("Error detecting edges: %s", e)
             return np.array([])
     
     def find_contours(self, image: np.ndarray) -> list:
@@ -262,7 +325,7 @@ class ImageProcessor:
             return contours
             
         except Exception as e:
-            print(f"Error finding contours: {e}")
+            logger.error("Error finding contours: %s", e)
             return []
     
     def calculate_image_quality(self, image: np.ndarray) -> float:
@@ -291,5 +354,5 @@ class ImageProcessor:
             return quality_score
             
         except Exception as e:
-            print(f"Error calculating image quality: {e}")
+            logger.error("Error calculating image quality: %s", e)
             return 0.0
@@ -0,0 +1,246 @@
+import asyncio
+import ipaddress
+import logging
+import os
+import socket
+import time
+import uuid
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Any, Optional, Set
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+
+class JobStoreFull(Exception):
+    """Raised when no more jobs can be accepted"""
+
+
+class InvalidCallbackURL(ValueError):
+    """Raised when a callback URL is not an allowed http(s) destination"""
+
+
+def _is_public_address(address: str) -> bool:
+    """True for globally routable unicast addresses"""
+    ip = ipaddress.ip_address(address.split('%', 1)[0])
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+class JobManager:
+    """Run slow identification work in the background with a bounded TTL result store.
+
+    Jobs are queued to a fixed number of worker tasks. Each job's record is kept
+    until ``ttl`` seconds after it finishes; at most ``max_jobs`` records are held,
+    evicting the oldest finished ones first. Clients poll (optionally long-poll)
+    for results, or pass a callback URL that receives the record when it is done.
+
+    Callbacks are delivered by their own tasks, at most ``callback_concurrency``
+    at a time, so a slow receiver never holds up a worker. Callback URLs must be
+    http(s); if ``PILL_JOB_CALLBACK_ALLOWED_HOSTS`` is set only those hosts are
+    accepted, otherwise any host that resolves to a private, loopback,
+    link-local or otherwise non-public address is refused, both when the job is
+    submitted and again right before delivery.
+    """
+
+    def __init__(self, workers: Optional[int] = None, max_jobs: Optional[int] = None,
+                 ttl: Optional[float] = None, max_pending: Optional[int] = None):
+        self.workers = workers or int(os.getenv('PILL_JOB_WORKERS', os.cpu_count() or 1))
+        self.max_jobs = max_jobs or int(os.getenv('PILL_JOB_MAX_RESULTS', 1000))
+        self.ttl = ttl or float(os.getenv('PILL_JOB_TTL_SECONDS', 600))
+        self.max_pending = max_pending or int(os.getenv('PILL_JOB_MAX_PENDING', 100))
+        self.callback_timeout = float(os.getenv('PILL_JOB_CALLBACK_TIMEOUT_SECONDS', 10))
+        self.callback_concurrency = int(os.getenv('PILL_JOB_CALLBACK_CONCURRENCY', 4))
+        self.callback_allowed_hosts = {
+            host.strip().lower() for host in os.getenv('PILL_JOB_CALLBACK_ALLOWED_HOSTS', '').split(',') if host.strip()
+        }
+
+        self.jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._events: Dict[str, asyncio.Event] = {}
+        self._work: Dict[str, Callable[[], Awaitable[Any]]] = {}
+        self.queue: Optional[asyncio.Queue] = None
+        self._worker_tasks = []
+        self._callback_tasks: Set[asyncio.Task] = set()
+        self._callback_slots: Optional[asyncio.Semaphore] = None
+
+    async def start(self):
+        """Start the worker tasks"""
+        if self._worker_tasks:
+            return
+        self.queue = asyncio.Queue(maxsize=self.max_pending)
+        self._callback_slots = asyncio.Semaphore(self.callback_concurrency)
+        self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Cancel the worker tasks and any undelivered callbacks"""
+        tasks = self._worker_tasks + list(self._callback_tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._worker_tasks = []
+        self._callback_tasks.clear()
+
+    def _purge(self):
+        """Drop expired results, then the oldest finished ones while over capacity"""
+        now = time.time()
+        for job_id in [job_id for job_id, job in self.jobs.items()
+                       if job['finished_at'] and now - job['finished_at'] > self.ttl]:
+            self._forget(job_id)
+
+        if len(self.jobs) >= self.max_jobs:
+            for job_id in [job_id for job_id, job in self.jobs.items() if job['finished_at']]:
+                if len(self.jobs) < self.max_jobs:
+                    break
+                self._forget(job_id)
+
+    def _forget(self, job_id: str):
+        self.jobs.pop(job_id, None)
+        self._events.pop(job_id, None)
+
+    def submit(self, work: Callable[[], Awaitable[Any]], callback_url: Optional[str] = None,
+               metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Queue a job and return its record immediately.
+
+        The callback URL is checked without DNS lookups here; call
+        ``validate_callback_url`` off the event loop first for the full check.
+        """
+        if callback_url:
+            self.validate_callback_url(callback_url, resolve=False)
+        self._purge()
+        if len(self.jobs) >= self.max_jobs or self.queue is None or self.queue.full():
+            raise JobStoreFull("Too many pending jobs")
+
+        job_id = uuid.uuid4().hex
+        job = {
+            'job_id': job_id,
+            'status': 'queued',
+            'created_at': time.time(),
+            'started_at': None,
+            'finished_at': None,
+            'result': None,
+            'error': None,
+            'callback_url': callback_url,
+            **(metadata or {})
+        }
+        self.jobs[job_id] = job
+        self._events[job_id] = asyncio.Event()
+        self._work[job_id] = work
+        self.queue.put_nowait(job_id)
+        return job
+
+    async def get(self, job_id: str, wait: float = 0) -> Optional[Dict[str, Any]]:
+        """Return a job record, waiting up to ``wait`` seconds for it to finish"""
+        self._purge()
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+
+        event = self._events.get(job_id)
+        if wait > 0 and event is not None and not job['finished_at']:
+            try:
+                await asyncio.wait_for(event.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+
+        return job
+
+    async def _worker(self):
+        """Worker loop running queued jobs one at a time"""
+        while True:
+            job_id = await self.queue.get()
+            job = self.jobs.get(job_id)
+            work = self._work.pop(job_id, None)
+            if job is None or work is None:
+                continue
+
+            job['status'] = 'running'
+            job['started_at'] = time.time()
+            try:
+                job['result'] = await work()
+                job['status'] = 'succeeded'
+            except Exception as e:
+                job['status'] = 'failed'
+                job['error'] = getattr(e, 'detail', None) or str(e)
+            finally:
+                job['finished_at'] = time.time()
+                event = self._events.get(job_id)
+                if event is not None:
+                    event.set()
+
+            if job['callback_url']:
+                task = asyncio.create_task(self._send_callback(job))
+                self._callback_tasks.add(task)
+                task.add_done_callback(self._callback_tasks.discard)
+
+    def validate_callback_url(self, url: str, resolve: bool = True) -> str:
+        """Check that ``url`` is an http(s) URL on an allowed host and return the host.
+
+        Without an allowlist, IP literals must be public and (with ``resolve``)
+        every address the host name resolves to must be public too.
+        """
+        try:
+            parts = urlsplit(url)
+            host = (parts.hostname or '').lower()
+            parts.port  # raises ValueError for a malformed port
+        except ValueError as e:
+            raise InvalidCallbackURL(f"Invalid callback URL: {e}")
+        if parts.scheme not in ('http', 'https') or not host:
+            raise InvalidCallbackURL("Callback URL must be an http or https URL")
+
+        if self.callback_allowed_hosts:
+            if host not in self.callback_allowed_hosts:
+                raise InvalidCallbackURL(f"Callback host {host} is not allowed")
+            return host
+
+        try:
+            addresses = [str(ipaddress.ip_address(host))]
+        except ValueError:
+            addresses = []
+            if resolve:
+                try:
+                    addresses = [info[4][0] for info in socket.getaddrinfo(host, None, proto=socket.IPPROTO_TCP)]
+                except OSError as e:
+                    raise InvalidCallbackURL(f"Callback host {host} does not resolve: {e}")
+        if not all(_is_public_address(address) for address in addresses):
+            raise InvalidCallbackURL(f"Callback host {host} is not a public address")
+        return host
+
+    def _post(self, url: str, job: Dict[str, Any]):
+        import requests
+        # Redirects are not followed: they could point the request at an internal host
+        return requests.post(url, json=job, timeout=self.callback_timeout, allow_redirects=False)
+
+    async def _send_callback(self, job: Dict[str, Any], attempts: int = 3):
+        """POST the finished job record to its callback URL, retrying with backoff"""
+        loop = asyncio.get_running_loop()
+        for attempt in range(attempts):
+            try:
+                async with self._callback_slots:
+                    # Checked again now, so a host re-pointed since submission is still refused
+                    await loop.run_in_executor(None, self.validate_callback_url, job['callback_url'])
+                    response = await loop.run_in_executor(None, self._post, job['callback_url'], job)
+                if response.status_code < 500:
+                    job['callback_status'] = response.status_code
+                    return
+            except InvalidCallbackURL as e:
+                logger.warning("Refusing job callback for %s: %s", job['job_id'], e)
+                break
+            except Exception as e:
+                logger.error("Error delivering job callback for %s: %s", job['job_id'], e)
+            await asyncio.sleep(2 ** attempt)
+
+        job['callback_status'] = 'failed'
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get job statistics"""
+        statuses: Dict[str, int] = {}
+        for job in self.jobs.values():
+            statuses[job['status']] = statuses.get(job['status'], 0) + 1
+        return {
+            'stored': len(self.jobs),
+            'pending': self.queue.qsize() if self.queue else 0,
+            'workers': self.workers,
+            'callbacks_in_flight': len(self._callback_tasks),
+            'by_status': statuses
+        }
@@ -0,0 +1,122 @@
+import gzip
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import Dict, List, Any, Iterable, Optional
+
+# Bump when the artifact layout changes in an incompatible way
+CATALOG_FORMAT_VERSION = 1
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+# Pill attributes the catalog is indexed by
+INDEXED_FIELDS = ['color', 'shape', 'size']
+
+
+def build_index(pills: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, List[str]]]:
+    """Build attribute -> value -> pill IDs lookup tables"""
+    index: Dict[str, Dict[str, List[str]]] = {field: {} for field in INDEXED_FIELDS}
+    index['imprint'] = {}
+
+    for pill_id, pill_info in pills.items():
+        for field in INDEXED_FIELDS:
+            value = str(pill_info.get(field) or 'unknown').lower()
+            index[field].setdefault(value, []).append(pill_id)
+
+        imprint = str(pill_info.get('imprint') or '').lower()
+        if imprint:
+            index['imprint'].setdefault(imprint, []).append(pill_id)
+
+    return index
+
+
+def write_catalog(path: str, pills: Dict[str, Dict[str, Any]], metadata: Optional[Dict[str, Any]] = None) -> str:
+    """Write a gzip-compressed, versioned catalog artifact atomically and return its content hash"""
+    body = json.dumps(pills, sort_keys=True, separators=(',', ':'))
+    content_hash = hashlib.sha256(body.encode('utf-8')).hexdigest()
+
+    artifact = {
+        'format_version': CATALOG_FORMAT_VERSION,
+        'created_at': datetime.now().isoformat(),
+        'content_hash': content_hash,
+        'count': len(pills),
+        'metadata': metadata or {},
+        'index': build_index(pills),
+        'pills': pills
+    }
+
+    tmp_path = f"{path}.tmp"
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+        json.dump(artifact, f, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+    return content_hash
+
+
+def load_catalog(path: str) -> Dict[str, Any]:
+    """Load a catalog artifact (gzip-compressed or plain JSON), rejecting unknown format versions"""
+    with open(path, 'rb') as f:
+        compressed = f.read(2) == GZIP_MAGIC
+    opener = gzip.open if compressed else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        artifact = json.load(f)
+
+    version = artifact.get('format_version')
+    if version != CATALOG_FORMAT_VERSION:
+        raise ValueError(f"Unsupported catalog format version {version} (expected {CATALOG_FORMAT_VERSION})")
+
+    return artifact
+
+
+def _iter_json_array(f, chunk_size: int = 1 << 16) -> Iterable[Dict[str, Any]]:
+    """Decode the elements of a top-level JSON array one at a time"""
+    decoder = json.JSONDecoder()
+    buffer = f.read(chunk_size).lstrip()
+    if not buffer.startswith('['):
+        raise ValueError("Expected a JSON array")
+    buffer = buffer[1:]
+
+    while True:
+        buffer = buffer.lstrip()
+        if buffer.startswith(']'):
+            return
+        if buffer.startswith(','):
+            buffer = buffer[1:]
+            continue
+        try:
+            if not buffer:
+                raise json.JSONDecodeError("Need more data", buffer, 0)
+            row, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            # The next element is cut off at the end of the buffer
+            chunk = f.read(chunk_size)
+            if not chunk:
+                raise ValueError("Unterminated JSON array")
+            buffer += chunk
+            continue
+        yield row
+        buffer = buffer[end:]
+
+
+def iter_catalog_rows(path: str) -> Iterable[Dict[str, Any]]:
+    """Stream catalog rows from a CSV, JSON array or JSON-lines file without loading it whole"""
+    if path.endswith('.csv'):
+        import csv
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                yield row
+        return
+
+    with open(path, encoding='utf-8') as f:
+        first = f.read(1)
+        while first and first.isspace():
+            first = f.read(1)
+        f.seek(0)
+
+        if first == '[':
+            yield from _iter_json_array(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
@@ -0,0 +1,284 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Dict, List, Any, Optional, Tuple
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def _load_interpreter_class():
+    """Return the lightest available TFLite interpreter class"""
+    try:
+        from tflite_runtime.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+
+    try:
+        import tensorflow as tf
+        return tf.lite.Interpreter
+    except ImportError:
+        return None
+
+
+def batch_buckets(max_batch_size: int) -> List[int]:
+    """Batch sizes to compile for: powers of two below ``max_batch_size``, then it"""
+    buckets = []
+    size = 1
+    while size < max_batch_size:
+        buckets.append(size)
+        size *= 2
+    return buckets + [max(max_batch_size, 1)]
+
+
+class PillClassifier:
+    """Optional learned pill classifier running a quantized TFLite model on CPU.
+
+    The model is expected to be exported with INT8 or float16 weights and to take
+    a batch of RGB images. Its outputs are mapped to pill IDs through a JSON
+    labels file (a list of pill IDs, one per output index).
+
+    Resizing a TFLite interpreter's input reallocates all of its tensors, so
+    batch shapes are fixed: each size in ``batch_sizes`` gets its own
+    interpreter, allocated once, and a batch is padded up to the smallest size
+    that holds it (split across the largest if none does).
+
+    Construction only reads the labels. The interpreters, and their thread
+    pools, are built by ``load()`` in the serving process (``MicroBatcher.start``),
+    so under the gunicorn preload launcher every worker gets its own rather than
+    sharing one built in the master. Each uses ``PILL_CLASSIFIER_THREADS``
+    threads, by default the cores divided among the ``WEB_CONCURRENCY`` workers.
+    """
+
+    def __init__(self, model_path: Optional[str] = None, labels_path: Optional[str] = None,
+                 num_threads: Optional[int] = None):
+        self.model_path = model_path or os.getenv('PILL_CLASSIFIER_MODEL')
+        self.labels_path = labels_path or os.getenv('PILL_CLASSIFIER_LABELS')
+        self.num_threads = num_threads or int(os.getenv(
+            'PILL_CLASSIFIER_THREADS', max(1, (os.cpu_count() or 1) // int(os.getenv('WEB_CONCURRENCY', 1)))))
+        self.interpreter = None
+        self.labels: List[str] = []
+        self.input_details = None
+        self.output_details = None
+        self.input_size: Tuple[int, int] = (224, 224)
+        self.batch_sizes: List[int] = [1]
+        self._interpreter_class = None
+        # batch size -> (interpreter, input details, output details)
+        self._runners: Dict[int, Tuple[Any, Dict[str, Any], Dict[str, Any]]] = {}
+        self._load_model()
+
+    @property
+    def configured(self) -> bool:
+        """A model, its labels and a TFLite runtime are available"""
+        return self._interpreter_class is not None
+
+    @property
+    def enabled(self) -> bool:
+        return self.interpreter is not None
+
+    def _load_model(self):
+        """Find a TFLite runtime and read the labels if a model is configured"""
+        if not self.model_path:
+            return
+
+        try:
+            interpreter_class = _load_interpreter_class()
+            if interpreter_class is None:
+                logger.warning("No TFLite runtime available; learned pill classifier disabled")
+                return
+
+            with open(self.labels_path or os.path.splitext(self.model_path)[0] + '.labels.json') as f:
+                self.labels = json.load(f)
+
+            self._interpreter_class = interpreter_class
+
+        except Exception as e:
+            logger.error("Error loading pill classifier labels: %s", e)
+
+    def load(self):
+        """Build the model's interpreter in this process (blocking)"""
+        if not self.configured or self.enabled:
+            return
+
+        try:
+            self.interpreter = self._interpreter_class(model_path=self.model_path, num_threads=self.num_threads)
+            self.interpreter.allocate_tensors()
+            self.input_details = self.interpreter.get_input_details()[0]
+            self.output_details = self.interpreter.get_output_details()[0]
+
+            _, height, width, _ = self.input_details['shape']
+            self.input_size = (int(width), int(height))
+            self._runners[int(self.input_details['shape'][0])] = (
+                self.interpreter, self.input_details, self.output_details
+            )
+
+        except Exception as e:
+            logger.error("Error loading pill classifier: %s", e)
+            self.interpreter = None
+
+    def _prepare_input(self, image: np.ndarray) -> np.ndarray:
+        """Resize a BGR image and convert it to the model's input format"""
+        resized = cv2.resize(image, self.input_size, interpolation=cv2.INTER_AREA)
+        rgb = cv2.cvtColor(resized, cv2.COLOR_BGR2RGB)
+
+        dtype = self.input_details['dtype']
+        if dtype == np.float32 or dtype == np.float16:
+            return (rgb.astype(np.float32) / 255.0).astype(dtype)
+
+        # Quantized input: map [0, 1] floats onto the integer domain
+        scale, zero_point = self.input_details['quantization']
+        if scale == 0:
+            return rgb.astype(dtype)
+        quantized = np.round(rgb.astype(np.float32) / 255.0 / scale + zero_point)
+        info = np.iinfo(dtype)
+        return np.clip(quantized, info.min, info.max).astype(dtype)
+
+    def _dequantize_output(self, output: np.ndarray) -> np.ndarray:
+        """Convert raw model output to float probabilities"""
+        if output.dtype != np.float32:
+            scale, zero_point = self.output_details['quantization']
+            output = (output.astype(np.float32) - zero_point) * (scale or 1.0)
+
+        # Apply softmax if the model emits logits
+        if output.min() < 0 or not np.allclose(output.sum(axis=-1), 1.0, atol=1e-2):
+            output = np.exp(output - output.max(axis=-1, keepdims=True))
+            output /= output.sum(axis=-1, keepdims=True)
+
+        return output
+
+    def _runner(self, batch_size: int) -> Tuple[Any, Dict[str, Any], Dict[str, Any]]:
+        """The interpreter for one fixed batch size, created and allocated on first use"""
+        runner = self._runners.get(batch_size)
+        if runner is None:
+            interpreter = self._interpreter_class(model_path=self.model_path, num_threads=self.num_threads)
+            shape = list(self.input_details['shape'])
+            shape[0] = batch_size
+            interpreter.resize_tensor_input(self.input_details['index'], shape)
+            interpreter.allocate_tensors()
+            runner = (interpreter, interpreter.get_input_details()[0], interpreter.get_output_details()[0])
+            self._runners[batch_size] = runner
+        return runner
+
+    def _run(self, inputs: np.ndarray) -> np.ndarray:
+        """Forward pass over prepared inputs, padded to the nearest fixed batch size"""
+        count = inputs.shape[0]
+        batch_size = next((size for size in self.batch_sizes if size >= count), self.batch_sizes[-1])
+        if count > batch_size:
+            return np.concatenate([self._run(inputs[start:start + batch_size])
+                                   for start in range(0, count, batch_size)])
+
+        if count < batch_size:
+            padding = np.zeros((batch_size - count,) + inputs.shape[1:], dtype=inputs.dtype)
+            inputs = np.concatenate([inputs, padding])
+
+        interpreter, input_details, output_details = self._runner(batch_size)
+        interpreter.set_tensor(input_details['index'], inputs)
+        interpreter.invoke()
+        return self._dequantize_output(interpreter.get_tensor(output_details['index'])[:count])
+
+    def predict_batch(self, images: List[np.ndarray]) -> List[Dict[str, float]]:
+        """Run a forward pass over a batch of images"""
+        if not self.enabled or not images:
+            return [{} for _ in images]
+
+        probabilities = self._run(np.stack([self._prepare_input(image) for image in images]))
+
+        return [
+            {label: float(prob) for label, prob in zip(self.labels, row)}
+            for row in probabilities
+        ]
+
+    def warmup(self, batch_sizes: Optional[List[int]] = None):
+        """Fix the batch sizes and run a dummy batch through each, so no request
+        pays for tensor allocation"""
+        if not self.enabled:
+            return
+
+        self.batch_sizes = sorted(set(batch_sizes or [1]))
+        width, height = self.input_size
+        dummy = np.full((height, width, 3), 255, dtype=np.uint8)
+        for batch_size in self.batch_sizes:
+            self.predict_batch([dummy] * batch_size)
+
+
+class MicroBatcher:
+    """Group concurrent classification requests into a single forward pass"""
+
+    def __init__(self, classifier: PillClassifier, max_batch_size: Optional[int] = None,
+                 max_wait_ms: Optional[float] = None):
+        self.classifier = classifier
+        self.max_batch_size = max_batch_size or int(os.getenv('PILL_CLASSIFIER_BATCH_SIZE', 8))
+        self.max_wait = (max_wait_ms or float(os.getenv('PILL_CLASSIFIER_BATCH_WAIT_MS', 5))) / 1000.0
+        self.queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Load and warm up the model in this worker and start the batching worker"""
+        if not self.classifier.configured or self._worker is not None:
+            return
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.classifier.load)
+        if not self.classifier.enabled:
+            return
+        await loop.run_in_executor(None, self.classifier.warmup, batch_buckets(self.max_batch_size))
+
+        self.queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the batching worker"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def classify(self, image: np.ndarray) -> Dict[str, float]:
+        """Queue an image for classification and wait for its scores"""
+        if self._worker is None:
+            return {}
+
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((image, future))
+        return await future
+
+    async def _collect_batch(self) -> List[Tuple[np.ndarray, asyncio.Future]]:
+        """Wait for one request, then gather more until the batch is full or the window closes"""
+        batch = [await self.queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _run(self):
+        """Batching worker loop"""
+        loop = asyncio.get_running_loop()
+
+        while True:
+            batch = await self._collect_batch()
+            images = [image for image, _ in batch]
+
+            try:
+                results = await loop.run_in_executor(None, self.classifier.predict_batch, images)
+            except Exception as e:
+                logger.error("Error running pill classifier batch: %s", e)
+                results = [{} for _ in batch]
+
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
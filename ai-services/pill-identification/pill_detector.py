@@ -1,24 +1,77 @@
 import cv2
 import numpy as np
 import asyncio
+import logging
 from typing import Dict, List, Any, Optional, Tuple
 import json
-import requests
-from google.cloud import vision
 import os
-from PIL import Image
-import io
+from metrics import timed, STAGE_ERRORS, STAGE_LATENCY
+from pill_catalog import load_catalog, build_index
+from shape_classifier import ShapeClassifier
+
+logger = logging.getLogger(__name__)
+
+# 8-neighbour, radius-1 LBP with rotation-invariant uniform ("riu2") mapping
+LBP_NEIGHBOURS = [(-1, -1), (-1, 0), (-1, 1), (0, 1), (1, 1), (1, 0), (1, -1), (0, -1)]
+LBP_POINTS = len(LBP_NEIGHBOURS)
+LBP_BINS = LBP_POINTS + 2
+
+def _build_riu2_table() -> np.ndarray:
+    table = np.zeros(256, dtype=np.intp)
+    for code in range(256):
+        bits = [(code >> i) & 1 for i in range(LBP_POINTS)]
+        transitions = sum(bits[i] != bits[(i + 1) % LBP_POINTS] for i in range(LBP_POINTS))
+        table[code] = sum(bits) if transitions <= 2 else LBP_POINTS + 1
+    return table
+
+LBP_RIU2_TABLE = _build_riu2_table()
+
+# Minimum match score for identify_pill to report a pill
+MATCH_THRESHOLD = 0.6
+
+# Heuristic scores are divided by at least this much feature weight
+MIN_EVIDENCE_WEIGHT = 0.6
+
+# Candidate narrowing: pills whose shape similarity or classifier probability is
+# at or below these can only reach the threshold by sharing an indexed attribute.
+# Outside the candidates a pill scores at most (0.3 * 0.5 + 0.2 texture) / 0.6
+# = 0.58 heuristically, and at most 0.5 * 0.58 + 0.5 * 0.2 with the classifier.
+CANDIDATE_SHAPE_SIMILARITY = 0.5
+CANDIDATE_CLASSIFIER_SCORE = 2 * MATCH_THRESHOLD - 1
 
 class PillDetector:
     def __init__(self):
         self.pill_database = {}
-        self.vision_client = None
+        self.catalog_index = {}
+        self.catalog_info = {}
+        # The Vision client (and google.cloud) is only loaded on first OCR use
+        self._vision_client = None
+        self._vision_client_initialized = False
+        self.shape_classifier = ShapeClassifier()
         self._load_database()
-        self._init_vision_client()
+    
+    @property
+    def vision_client(self):
+        if not self._vision_client_initialized:
+            self._init_vision_client()
+        return self._vision_client
+    
+    @vision_client.setter
+    def vision_client(self, client):
+        self._vision_client = client
+        self._vision_client_initialized = True
     
     def _load_database(self):
         """Load pill database with characteristics and information"""
-        # This would typically load from a real database
+        catalog_path = os.getenv('PILL_CATALOG_PATH')
+        if catalog_path:
+            try:
+                self._load_catalog_artifact(catalog_path)
+                return
+            except Exception as e:
+                logger.error("Error loading pill catalog %s: %s", catalog_path, e)
+        
+        # Built-in sample catalog
         self.pill_database = {
             "aspirin_81mg": {
                 "pill_id": "aspirin_81mg",
@@ -69,50 +122,83 @@ class PillDetector:
                 "administration": "Take at the same time each day"
             }
         }
+        self.catalog_index = build_index(self.pill_database)
+    
+    def _load_catalog_artifact(self, path: str):
+        """Load a precomputed catalog produced by catalog_ingest.py"""
+        artifact = load_catalog(path)
+        self.pill_database = artifact['pills']
+        self.catalog_index = artifact['index']
+        self.catalog_info = {
+            'path': path,
+            'format_version': artifact['format_version'],
+            'content_hash': artifact['content_hash'],
+            'created_at': artifact['created_at']
+        }
     
     def _init_vision_client(self):
         """Initialize Google Cloud Vision client"""
         try:
+            from google.cloud import vision
+            
             # Set up authentication
             os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = os.getenv('GOOGLE_APPLICATION_CREDENTIALS')
             self.vision_client = vision.ImageAnnotatorClient()
         except Exception as e:
-            print(f"Error initializing Vision client: {e}")
+            logger.error("Error initializing Vision client: %s", e)
             self.vision_client = None
     
-    def extract_characteristics(self, image: np.ndarray) -> Dict[str, Any]:
+    @timed('extract')
+    def extract_characteristics(self, image: np.ndarray, profile: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """Extract pill characteristics from image"""
         try:
             characteristics = {}
+            profile = profile or {}
+            detectors = set(profile.get('detectors', ['color', 'shape', 'size', 'imprint', 'edges', 'texture']))
             
-            # Convert to different color spaces for analysis
-            hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+            # Convert to grayscale for shape and texture analysis
             gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
             
             # Detect color
-            characteristics['color'] = self._detect_color(image)
+            if 'color' in detectors:
+                characteristics['color'] = self._detect_color(image)
+            
+            # Shape and size share one contour
+            contour = None
+            if 'shape' in detectors or 'size' in detectors:
+                contour = self._find_pill_contour(gray)
             
             # Detect shape
-            characteristics['shape'] = self._detect_shape(gray)
+            if 'shape' in detectors:
+                shape = self._detect_shape(gray, contour)
+                characteristics['shape'] = shape['shape']
+                characteristics['shape_score'] = shape['score']
+                characteristics['shape_similarities'] = shape['similarities']
             
             # Detect size
-            characteristics['size'] = self._detect_size(gray)
+            if 'size' in detectors:
+                characteristics['size'] = self._detect_size(gray, contour)
             
             # Detect imprint using OCR
-            characteristics['imprint'] = self._detect_imprint(image)
+            if 'imprint' in detectors:
+                characteristics['imprint'] = self._detect_imprint(image, use_ocr=profile.get('ocr', True))
             
             # Detect edges and contours
-            characteristics['edges'] = self._detect_edges(gray)
+            if 'edges' in detectors:
+                characteristics['edges'] = self._detect_edges(gray)
             
             # Detect texture
-            characteristics['texture'] = self._detect_texture(gray)
+            if 'texture' in detectors:
+                characteristics['texture_descriptor'] = self._detect_texture(gray)
+                characteristics['texture'] = self._texture_label(characteristics['texture_descriptor'])
             
             return characteristics
             
         except Exception as e:
-            print(f"Error extracting characteristics: {e}")
+            logger.error("Error extracting characteristics: %s", e)
             return {}
     
+    @timed('color')
     def _detect_color(self, image: np.ndarray) -> str:
         """Detect the dominant color of the pill"""
         try:
@@ -150,74 +236,77 @@ class PillDetector:
             return dominant_color
             
         except Exception as e:
-            print(f"Error detecting color: {e}")
+            STAGE_ERRORS.inc(stage='color')
+            logger.error("Error detecting color: %s", e)
             return 'unknown'
     
-    def _detect_shape(self, gray_image: np.ndarray) -> str:
-        """Detect the shape of the pill"""
+    @timed('contour')
+    def _find_pill_contour(self, gray_image: np.ndarray) -> Optional[np.ndarray]:
+        """Find the pill outline once so shape and size detection can share it"""
         try:
-            # Apply threshold
-            _, thresh = cv2.threshold(gray_image, 127, 255, cv2.THRESH_BINARY)
-            
-            # Find contours
-            contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            blurred = cv2.GaussianBlur(gray_image, (5, 5), 0)
+            kernel = np.ones((5, 5), np.uint8)
+            
+            # Candidate foreground masks: both Otsu polarities (light pill on dark
+            # background and vice versa) plus filled edges for uneven backgrounds
+            _, thresh = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+            edges = cv2.dilate(cv2.Canny(blurred, 30, 100), np.ones((3, 3), np.uint8), iterations=2)
+            masks = [thresh, cv2.bitwise_not(thresh), edges]
+            
+            height, width = gray_image.shape[:2]
+            min_area = 0.001 * gray_image.size
+            best_contour, best_area = None, 0.0
+            
+            for mask in masks:
+                # Close small gaps such as imprints and score lines
+                mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
+                contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+                
+                for contour in contours:
+                    # Regions touching the frame are background, letterboxing or clutter
+                    x, y, w, h = cv2.boundingRect(contour)
+                    if x <= 1 or y <= 1 or x + w >= width - 1 or y + h >= height - 1:
+                        continue
+                    
+                    area = cv2.contourArea(contour)
+                    if area > best_area and area >= min_area:
+                        best_contour, best_area = contour, area
+            
+            return best_contour
             
-            if not contours:
-                return 'unknown'
+        except Exception as e:
+            STAGE_ERRORS.inc(stage='contour')
+            logger.error("Error finding pill contour: %s", e)
+            return None
+    
+    @timed('shape')
+    def _detect_shape(self, gray_image: np.ndarray, contour: Optional[np.ndarray] = None) -> Dict[str, Any]:
+        """Classify the pill shape by nearest prototype over contour moments"""
+        try:
+            if contour is None:
+                contour = self._find_pill_contour(gray_image)
             
-            # Get the largest contour
-            largest_contour = max(contours, key=cv2.contourArea)
-            
-            # Approximate the contour
-            epsilon = 0.02 * cv2.arcLength(largest_contour, True)
-            approx = cv2.approxPolyDP(largest_contour, epsilon, True)
-            
-            # Determine shape based on number of vertices
-            vertices = len(approx)
-            
-            if vertices == 3:
-                return 'triangle'
-            elif vertices == 4:
-                # Check if it's square or rectangle
-                x, y, w, h = cv2.boundingRect(approx)
-                aspect_ratio = float(w) / h
-                if 0.95 <= aspect_ratio <= 1.05:
-                    return 'square'
-                else:
-                    return 'rectangle'
-            elif vertices == 5:
-                return 'pentagon'
-            elif vertices == 6:
-                return 'hexagon'
-            elif vertices > 6:
-                # Check if it's circular
-                area = cv2.contourArea(largest_contour)
-                perimeter = cv2.arcLength(largest_contour, True)
-                circularity = 4 * np.pi * area / (perimeter * perimeter)
-                
-                if circularity > 0.7:
-                    return 'round'
-                else:
-                    return 'oval'
-            else:
-                return 'unknown'
+            return self.shape_classifier.classify(contour)
                 
         except Exception as e:
-            print(f"Error detecting shape: {e}")
-            return 'unknown'
+            STAGE_ERRORS.inc(stage='shape')
+            logger.error("Error detecting shape: %s", e)
+            return {'shape': 'unknown', 'score': 0.0, 'similarities': {}}
     
-    def _detect_size(self, gray_image: np.ndarray) -> str:
+    @timed('size')
+    def _detect_size(self, gray_image: np.ndarray, contour: Optional[np.ndarray] = None) -> str:
         """Detect the size of the pill"""
         try:
-            # Find contours
-            contours, _ = cv2.findContours(gray_image, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            if contour is None:
+                contour = self._find_pill_contour(gray_image)
             
-            if not contours:
+            if contour is None:
                 return 'unknown'
             
-            # Get the largest contour
-            largest_contour = max(contours, key=cv2.contourArea)
-            area = cv2.contourArea(largest_contour)
+            area = cv2.contourArea(contour)
+            
+            # Normalize to the 512x512 reference resolution so profiles agree
+            area *= (512 * 512) / (gray_image.shape[0] * gray_image.shape[1])
             
             # Categorize by area (these thresholds would need to be calibrated)
             if area < 1000:
@@ -228,24 +317,29 @@ class PillDetector:
                 return 'large'
                 
         except Exception as e:
-            print(f"Error detecting size: {e}")
+            STAGE_ERRORS.inc(stage='size')
+            logger.error("Error detecting size: %s", e)
             return 'unknown'
     
-    def _detect_imprint(self, image: np.ndarray) -> str:
+    @timed('imprint')
+    def _detect_imprint(self, image: np.ndarray, use_ocr: bool = True) -> str:
         """Detect text/imprint on the pill using OCR"""
         try:
-            if not self.vision_client:
-                return self._detect_imprint_opencv(image)
+            # OpenCV alone cannot read imprint text: report none so matching skips it
+            if not use_ocr or not self.vision_client:
+                return ''
             
             # Convert image to bytes
             _, buffer = cv2.imencode('.jpg', image)
             image_bytes = buffer.tobytes()
             
             # Create Vision API image
+            from google.cloud import vision
             vision_image = vision.Image(content=image_bytes)
             
             # Perform text detection
-            response = self.vision_client.text_detection(image=vision_image)
+            with STAGE_LATENCY.time(stage='ocr'):
+                response = self.vision_client.text_detection(image=vision_image)
             texts = response.text_annotations
             
             if texts:
@@ -255,51 +349,11 @@ class PillDetector:
             return ''
             
         except Exception as e:
-            print(f"Error detecting imprint with Vision API: {e}")
-            return self._detect_imprint_opencv(image)
-    
-    def _detect_imprint_opencv(self, image: np.ndarray) -> str:
-        """Fallback imprint detection using OpenCV"""
-        try:
-            # Convert to grayscale
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-            
-            # Apply threshold
-            _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-            
-            # Apply morphological operations to clean up
-            kernel = np.ones((2, 2), np.uint8)
-            thresh = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel)
-            
-            # Find contours
-            contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            
-            # Filter contours by area and aspect ratio
-            text_contours = []
-            for contour in contours:
-                area = cv2.contourArea(contour)
-                x, y, w, h = cv2.boundingRect(contour)
-                aspect_ratio = w / h
-                
-                if area > 50 and 0.2 < aspect_ratio < 5:
-                    text_contours.append(contour)
-            
-            # Sort by x-coordinate (left to right)
-            text_contours.sort(key=lambda c: cv2.boundingRect(c)[0])
-            
-            # Extract text regions
-            text_regions = []
-            for contour in text_contours:
-                x, y, w, h = cv2.boundingRect(contour)
-                text_regions.append((x, y, w, h))
-            
-            # This is a simplified approach - in practice, you'd use OCR
-            return f"Text regions detected: {len(text_regions)}"
-            
-        except Exception as e:
-            print(f"Error detecting imprint with OpenCV: {e}")
+            STAGE_ERRORS.inc(stage='ocr')
+            logger.error("Error detecting imprint with Vision API: %s", e)
             return ''
     
+    @timed('edges')
     def _detect_edges(self, gray_image: np.ndarray) -> np.ndarray:
         """Detect edges in the image"""
         try:
@@ -307,31 +361,73 @@ class PillDetector:
             edges = cv2.Canny(gray_image, 50, 150)
             return edges
         except Exception as e:
-            print(f"Error detecting edges: {e}")
+            STAGE_ERRORS.inc(stage='edges')
+            logger.error("Error detecting edges: %s", e)
             return np.array([])
     
-    def _detect_texture(self, gray_image: np.ndarray) -> str:
-        """Detect texture characteristics"""
+    @timed('texture')
+    def _detect_texture(self, gray_image: np.ndarray) -> np.ndarray:
+        """Compute a rotation-invariant uniform LBP histogram over the pill region"""
         try:
-            # Calculate texture using Local Binary Pattern (simplified)
-            # This is a basic implementation
-            kernel = np.array([[-1, -1, -1], [-1, 8, -1], [-1, -1, -1]])
-            texture = cv2.filter2D(gray_image, -1, kernel)
-            
-            # Calculate texture variance
-            texture_variance = np.var(texture)
-            
-            if texture_variance < 100:
-                return 'smooth'
-            elif texture_variance < 500:
-                return 'medium'
-            else:
-                return 'rough'
+            region, mask = self._crop_pill_region(gray_image)
+            if region.shape[0] < 3 or region.shape[1] < 3:
+                return np.zeros(LBP_BINS, dtype=np.float32)
+            
+            # Compare every interior pixel with its 8 neighbours in one vectorized pass
+            region = region.astype(np.int16)
+            center = region[1:-1, 1:-1]
+            h, w = center.shape
+            codes = np.zeros((h, w), dtype=np.uint8)
+            for bit, (dy, dx) in enumerate(LBP_NEIGHBOURS):
+                neighbour = region[1 + dy:1 + dy + h, 1 + dx:1 + dx + w]
+                codes |= ((neighbour >= center).astype(np.uint8) << bit)
+            
+            # Map the 256 raw codes onto the P + 2 rotation-invariant uniform bins
+            labels = LBP_RIU2_TABLE[codes][mask[1:-1, 1:-1]]
+            histogram = np.bincount(labels, minlength=LBP_BINS).astype(np.float32)
+            total = histogram.sum()
+            
+            return histogram / total if total > 0 else histogram
                 
         except Exception as e:
-            print(f"Error detecting texture: {e}")
+            STAGE_ERRORS.inc(stage='texture')
+            logger.error("Error detecting texture: %s", e)
+            return np.zeros(LBP_BINS, dtype=np.float32)
+    
+    def _crop_pill_region(self, gray_image: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Crop to the non-background (non-white) pixels left by background removal"""
+        mask = gray_image < 250
+        if mask.sum() < 0.01 * mask.size:
+            return gray_image, np.ones(gray_image.shape, dtype=bool)
+        
+        rows = np.flatnonzero(mask.any(axis=1))
+        cols = np.flatnonzero(mask.any(axis=0))
+        y0, y1, x0, x1 = rows[0], rows[-1] + 1, cols[0], cols[-1] + 1
+        return gray_image[y0:y1, x0:x1], mask[y0:y1, x0:x1]
+    
+    def _texture_label(self, descriptor: np.ndarray) -> str:
+        """Summarize the LBP histogram as smooth / medium / rough"""
+        if descriptor is None or not descriptor.any():
             return 'unknown'
+        
+        # Bin P holds flat neighbourhoods (all neighbours >= centre)
+        flat_share = float(descriptor[LBP_POINTS])
+        if flat_share > 0.6:
+            return 'smooth'
+        elif flat_share > 0.3:
+            return 'medium'
+        else:
+            return 'rough'
+    
+    def _texture_similarity(self, descriptor_a, descriptor_b) -> float:
+        """Histogram intersection of two normalized LBP histograms"""
+        a = np.asarray(descriptor_a, dtype=np.float32)
+        b = np.asarray(descriptor_b, dtype=np.float32)
+        if a.shape != b.shape:
+            return 0.0
+        return float(np.minimum(a, b).sum())
     
+    @timed('matching')
     async def identify_pill(self, characteristics: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """Identify pill based on characteristics"""
         try:
@@ -339,7 +435,14 @@ class PillDetector:
             best_match = None
             best_score = 0
             
-            for pill_id, pill_info in self.pill_database.items():
+            candidate_ids = self._candidate_ids(characteristics)
+            if candidate_ids is None:
+                candidates = self.pill_database.items()
+            else:
+                candidates = [(pill_id, self.pill_database[pill_id])
+                              for pill_id in sorted(candidate_ids) if pill_id in self.pill_database]
+            
+            for pill_id, pill_info in candidates:
                 score = self._calculate_match_score(characteristics, pill_info)
                 
                 if score > best_score:
@@ -347,42 +450,114 @@ class PillDetector:
                     best_match = pill_info
             
             # Only return if confidence is above threshold
-            if best_score > 0.6:
-                return best_match
+            if best_score > MATCH_THRESHOLD:
+                return {**best_match, 'confidence': best_score}
             
             return None
             
         except Exception as e:
-            print(f"Error identifying pill: {e}")
+            STAGE_ERRORS.inc(stage='matching')
+            logger.error("Error identifying pill: %s", e)
+            return None
+    
+    def _candidate_ids(self, characteristics: Dict[str, Any]) -> Optional[set]:
+        """Pills that can still score above MATCH_THRESHOLD, from the catalog index.
+        
+        A pill left out shares no detected color, size, shape or imprint and the
+        classifier gives it little probability, so even a perfect texture match
+        keeps it at or below the threshold. Returns None (score every pill) when
+        nothing usable was detected.
+        """
+        candidates = set()
+        narrowed = False
+        
+        for field in ('color', 'size'):
+            value = characteristics.get(field)
+            if value and value != 'unknown':
+                candidates.update(self.catalog_index.get(field, {}).get(str(value).lower(), []))
+                narrowed = True
+        
+        shapes = {name for name, similarity in (characteristics.get('shape_similarities') or {}).items()
+                  if similarity > CANDIDATE_SHAPE_SIMILARITY}
+        if characteristics.get('shape') and characteristics.get('shape') != 'unknown':
+            shapes.add(characteristics['shape'])
+        for shape in shapes:
+            candidates.update(self.catalog_index.get('shape', {}).get(str(shape).lower(), []))
+            narrowed = True
+        
+        # Imprints match by substring, so scan the distinct imprint values
+        imprint = (characteristics.get('imprint') or '').lower()
+        if imprint:
+            for value, pill_ids in self.catalog_index.get('imprint', {}).items():
+                if imprint in value:
+                    candidates.update(pill_ids)
+            narrowed = True
+        
+        if not narrowed:
             return None
+        
+        for pill_id, probability in (characteristics.get('classifier_scores') or {}).items():
+            if probability > CANDIDATE_CLASSIFIER_SCORE:
+                candidates.add(pill_id)
+        
+        return candidates
     
     def _calculate_match_score(self, characteristics: Dict[str, Any], pill_info: Dict[str, Any]) -> float:
         """Calculate match score between characteristics and pill info"""
         score = 0.0
         total_weight = 0.0
         
+        # A feature counts only when it was detected and the catalog has a value to
+        # compare it with, so profiles that skip a detector are not penalized
+        
         # Color match (weight: 0.3)
-        if characteristics.get('color') == pill_info.get('color'):
-            score += 0.3
-        total_weight += 0.3
+        color = characteristics.get('color')
+        if color and color != 'unknown' and pill_info.get('color'):
+            if color == pill_info.get('color'):
+                score += 0.3
+            total_weight += 0.3
         
-        # Shape match (weight: 0.3)
-        if characteristics.get('shape') == pill_info.get('shape'):
-            score += 0.3
-        total_weight += 0.3
+        # Shape match (weight: 0.3), continuous when the classifier reported similarities
+        shape_similarities = characteristics.get('shape_similarities')
+        shape = characteristics.get('shape')
+        if shape_similarities and pill_info.get('shape') in shape_similarities:
+            score += 0.3 * shape_similarities[pill_info.get('shape')]
+            total_weight += 0.3
+        elif shape and shape != 'unknown' and pill_info.get('shape'):
+            if shape == pill_info.get('shape'):
+                score += 0.3
+            total_weight += 0.3
         
         # Size match (weight: 0.2)
-        if characteristics.get('size') == pill_info.get('size'):
-            score += 0.2
-        total_weight += 0.2
+        size = characteristics.get('size')
+        if size and size != 'unknown' and pill_info.get('size'):
+            if size == pill_info.get('size'):
+                score += 0.2
+            total_weight += 0.2
         
-        # Imprint match (weight: 0.2)
+        # Imprint match (weight: 0.2), only when text was actually read
         if characteristics.get('imprint') and pill_info.get('imprint'):
             if characteristics.get('imprint').lower() in pill_info.get('imprint').lower():
                 score += 0.2
-        total_weight += 0.2
+            total_weight += 0.2
+        
+        # Texture similarity (weight: 0.2), only when the catalog has a reference descriptor
+        reference_texture = pill_info.get('features', {}).get('texture_descriptor')
+        if reference_texture is not None and characteristics.get('texture_descriptor') is not None:
+            score += 0.2 * self._texture_similarity(characteristics['texture_descriptor'], reference_texture)
+            total_weight += 0.2
+        
+        # Too little evidence (e.g. only color compared) can never reach the match threshold alone
+        heuristic_score = score / max(total_weight, MIN_EVIDENCE_WEIGHT)
+        
+        # Blend with the learned classifier's probability when available
+        classifier_scores = characteristics.get('classifier_scores')
+        if classifier_scores:
+            classifier_weight = 0.5
+            classifier_score = classifier_scores.get(pill_info.get('pill_id'), 0.0)
+            return (1 - classifier_weight) * heuristic_score + classifier_weight * classifier_score
         
-        return score / total_weight if total_weight > 0 else 0.0
+        return heuristic_score
     
     async def get_pill_details(self, pill_id: str) -> Optional[Dict[str, Any]]:
         """Get detailed information about a specific pill"""
@@ -525,5 +700,6 @@ class PillDetector:
         return {
             'total_pills': total_pills,
             'color_distribution': color_counts,
-            'shape_distribution': shape_counts
+            'shape_distribution': shape_counts,
+            'catalog': self.catalog_info or {'source': 'built-in'}
         }
@@ -0,0 +1,43 @@
+import os
+from typing import Dict, Any, Optional
+
+ALL_DETECTORS = ['color', 'shape', 'size', 'imprint', 'edges', 'texture']
+
+# Each profile declares the working resolution and which pipeline stages run.
+# "accurate" matches the original fixed pipeline.
+PROCESSING_PROFILES: Dict[str, Dict[str, Any]] = {
+    'fast': {
+        'target_size': (256, 256),
+        'enhance': False,
+        'remove_background': True,
+        'detectors': ['color', 'shape', 'size', 'texture'],
+        'ocr': False,
+        'classifier': False
+    },
+    'balanced': {
+        'target_size': (384, 384),
+        'enhance': True,
+        'remove_background': True,
+        'detectors': ['color', 'shape', 'size', 'texture'],
+        'ocr': False,
+        'classifier': True
+    },
+    'accurate': {
+        'target_size': (512, 512),
+        'enhance': True,
+        'remove_background': True,
+        'detectors': ALL_DETECTORS,
+        'ocr': True,
+        'classifier': True
+    }
+}
+
+DEFAULT_PROFILE = os.getenv('PILL_PROCESSING_PROFILE', 'accurate')
+
+
+def get_profile(name: Optional[str] = None) -> Dict[str, Any]:
+    """Resolve a profile by name, falling back to the deployment default"""
+    name = (name or DEFAULT_PROFILE).lower()
+    if name not in PROCESSING_PROFILES:
+        raise ValueError(f"Unknown processing profile '{name}'. Choose one of: {', '.join(PROCESSING_PROFILES)}")
+    return {'name': name, **PROCESSING_PROFILES[name]}
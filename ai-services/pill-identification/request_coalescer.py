@@ -0,0 +1,47 @@
+import asyncio
+import hashlib
+from typing import Awaitable, Callable, Dict, Any, TypeVar
+
+T = TypeVar('T')
+
+
+class RequestCoalescer:
+    """Single-flight execution: concurrent calls with the same key share one computation"""
+
+    def __init__(self):
+        self._pending: Dict[str, asyncio.Future] = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def content_key(data: bytes) -> str:
+        """Key for raw uploaded content"""
+        return f"sha256:{hashlib.sha256(data).hexdigest()}"
+
+    @staticmethod
+    def url_key(url: str) -> str:
+        """Key for a remote image URL"""
+        return f"url:{url.strip()}"
+
+    async def run(self, key: str, factory: Callable[[], Awaitable[T]]) -> T:
+        """Run factory() unless an identical request is already in flight, then await its result"""
+        task = self._pending.get(key)
+
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.executed += 1
+            task = asyncio.ensure_future(factory())
+            self._pending[key] = task
+            task.add_done_callback(lambda _: self._pending.pop(key, None))
+
+        # Shield so a disconnecting caller does not cancel work others are waiting on
+        return await asyncio.shield(task)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get coalescing statistics"""
+        return {
+            'executed': self.executed,
+            'coalesced': self.coalesced,
+            'in_flight': len(self._pending)
+        }
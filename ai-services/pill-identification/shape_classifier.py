@@ -0,0 +1,123 @@
+import cv2
+import numpy as np
+from typing import Dict, List, Any, Optional, Tuple
+
+# Relative importance of each descriptor component in the distance
+FEATURE_SCALES = np.array([
+    0.04,  # log of the first Hu moment (spread)
+    0.08,  # ellipse minor/major axis ratio
+    0.03,  # convexity (area / hull area)
+    0.05,  # circularity (4*pi*A / P^2)
+    0.05,  # rectangularity (area / min-area-rect area)
+    0.04   # circle fill (area / min-enclosing-circle area)
+], dtype=np.float64)
+
+
+def _regular_polygon(sides: int, radius: float, center: Tuple[int, int], rotation: float = 0.0) -> np.ndarray:
+    angles = rotation + np.arange(sides) * 2 * np.pi / sides
+    points = np.stack([center[0] + radius * np.sin(angles), center[1] - radius * np.cos(angles)], axis=1)
+    return points.astype(np.int32)
+
+
+def _template_masks() -> List[Tuple[str, np.ndarray]]:
+    """Render reference silhouettes for every shape label"""
+    size = 256
+    center = (size // 2, size // 2)
+    templates = []
+
+    def blank():
+        return np.zeros((size, size), dtype=np.uint8)
+
+    mask = blank()
+    cv2.circle(mask, center, 90, 255, -1)
+    templates.append(('round', mask))
+
+    for ratio in (0.55, 0.7, 0.82):
+        mask = blank()
+        cv2.ellipse(mask, center, (100, int(100 * ratio)), 0, 0, 360, 255, -1)
+        templates.append(('oval', mask))
+
+    for half, radius in ((50, 40), (65, 35), (75, 28)):
+        mask = blank()
+        cv2.rectangle(mask, (center[0] - half, center[1] - radius), (center[0] + half, center[1] + radius), 255, -1)
+        cv2.circle(mask, (center[0] - half, center[1]), radius, 255, -1)
+        cv2.circle(mask, (center[0] + half, center[1]), radius, 255, -1)
+        templates.append(('capsule', mask))
+
+    mask = blank()
+    cv2.rectangle(mask, (center[0] - 80, center[1] - 80), (center[0] + 80, center[1] + 80), 255, -1)
+    templates.append(('square', mask))
+
+    for ratio in (0.45, 0.6, 0.75):
+        mask = blank()
+        cv2.rectangle(mask, (center[0] - 100, center[1] - int(100 * ratio)), (center[0] + 100, center[1] + int(100 * ratio)), 255, -1)
+        templates.append(('rectangle', mask))
+
+    for label, sides, rotation in (('triangle', 3, 0.0), ('pentagon', 5, 0.0), ('hexagon', 6, np.pi / 6)):
+        mask = blank()
+        cv2.fillPoly(mask, [_regular_polygon(sides, 95, center, rotation)], 255)
+        templates.append((label, mask))
+
+    return templates
+
+
+class ShapeClassifier:
+    """Nearest-prototype pill shape classifier over contour moment descriptors"""
+
+    def __init__(self):
+        labels, descriptors = [], []
+        for label, mask in _template_masks():
+            contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+            descriptor = self.describe(max(contours, key=cv2.contourArea))
+            if descriptor is not None:
+                labels.append(label)
+                descriptors.append(descriptor)
+
+        self.prototype_labels = np.array(labels)
+        self.prototypes = np.stack(descriptors) / FEATURE_SCALES
+        self.labels = sorted(set(labels))
+
+    def describe(self, contour: np.ndarray) -> Optional[np.ndarray]:
+        """Rotation- and scale-invariant descriptor of a contour"""
+        area = cv2.contourArea(contour)
+        perimeter = cv2.arcLength(contour, True)
+        if area <= 0 or perimeter <= 0 or len(contour) < 5:
+            return None
+
+        hu1 = cv2.HuMoments(cv2.moments(contour))[0, 0]
+        log_hu1 = -np.log10(hu1) if hu1 > 0 else 0.0
+
+        (_, _), (axis_a, axis_b), _ = cv2.fitEllipse(contour)
+        axis_ratio = min(axis_a, axis_b) / max(axis_a, axis_b) if max(axis_a, axis_b) > 0 else 0.0
+
+        hull_area = cv2.contourArea(cv2.convexHull(contour))
+        convexity = area / hull_area if hull_area > 0 else 0.0
+
+        circularity = 4 * np.pi * area / (perimeter * perimeter)
+
+        (_, _), (rect_w, rect_h), _ = cv2.minAreaRect(contour)
+        rectangularity = area / (rect_w * rect_h) if rect_w * rect_h > 0 else 0.0
+
+        _, radius = cv2.minEnclosingCircle(contour)
+        circle_fill = area / (np.pi * radius * radius) if radius > 0 else 0.0
+
+        return np.array([log_hu1, axis_ratio, convexity, circularity, rectangularity, circle_fill], dtype=np.float64)
+
+    def classify(self, contour: Optional[np.ndarray]) -> Dict[str, Any]:
+        """Return the best label, its similarity score and per-label similarities"""
+        descriptor = self.describe(contour) if contour is not None else None
+        if descriptor is None:
+            return {'shape': 'unknown', 'score': 0.0, 'similarities': {}}
+
+        # One vectorized distance computation against every prototype
+        distances = np.linalg.norm(self.prototypes - descriptor / FEATURE_SCALES, axis=1)
+        similarities = np.exp(-0.5 * distances)
+
+        per_label = {label: float(similarities[self.prototype_labels == label].max()) for label in self.labels}
+        best = int(np.argmax(similarities))
+
+        return {
+            'shape': str(self.prototype_labels[best]),
+            'score': float(similarities[best]),
+            'similarities': per_label
+        }
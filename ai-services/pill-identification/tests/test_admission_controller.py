@@ -0,0 +1,118 @@
+import asyncio
+
+import cv2
+import numpy as np
+import pytest
+
+from admission_controller import AdmissionController, AdmissionRejected
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_rejects_when_queue_is_full():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=5)
+        await controller.acquire('a')
+        waiter = asyncio.create_task(controller.acquire('b'))
+        await asyncio.sleep(0)
+
+        with pytest.raises(AdmissionRejected) as rejection:
+            await controller.acquire('c')
+        assert rejection.value.reason == "Server is at capacity"
+        assert rejection.value.retry_after >= 1
+
+        controller.release(0.1)
+        await waiter
+        assert controller.in_flight == 1 and controller.queued == 0
+        assert controller.rejected == 1
+
+    run(scenario())
+
+
+def test_rejects_a_client_over_its_queue_share():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queue=10, max_queue_per_client=1, queue_timeout=5)
+        await controller.acquire('a')
+        waiter = asyncio.create_task(controller.acquire('burst'))
+        await asyncio.sleep(0)
+
+        with pytest.raises(AdmissionRejected) as rejection:
+            await controller.acquire('burst')
+        assert rejection.value.reason == "Too many pending requests for this client"
+        waiter.cancel()
+
+    run(scenario())
+
+
+def test_rejects_up_front_when_estimated_wait_exceeds_deadline():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queue=10, queue_timeout=1)
+        controller._avg_service_time = 2.0
+        await controller.acquire('a')
+
+        with pytest.raises(AdmissionRejected) as rejection:
+            await controller.acquire('b')
+        assert rejection.value.reason == "Estimated wait exceeds deadline"
+        assert rejection.value.retry_after == 2
+
+    run(scenario())
+
+
+def test_slots_are_granted_round_robin_across_clients():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queue=10, max_queue_per_client=4, queue_timeout=5)
+        controller._avg_service_time = 0.01
+        await controller.acquire('holder')
+        order = []
+
+        async def request(client_id):
+            async with controller.slot(client_id):
+                order.append(client_id)
+
+        tasks = [asyncio.create_task(request(client_id)) for client_id in ['busy', 'busy', 'busy', 'quiet']]
+        await asyncio.sleep(0)
+        controller.release(0.01)
+        await asyncio.gather(*tasks)
+        assert order == ['busy', 'quiet', 'busy', 'busy']
+        assert controller.in_flight == 0 and controller.queued == 0
+
+    run(scenario())
+
+
+def test_identify_returns_429_with_retry_after(monkeypatch):
+    from fastapi.testclient import TestClient
+    import app
+
+    controller = AdmissionController(max_in_flight=1, max_queue=0)
+    controller.in_flight = 1  # every slot busy
+    monkeypatch.setattr(app, 'admission_controller', controller)
+
+    ok, png = cv2.imencode('.png', np.zeros((8, 8, 3), dtype=np.uint8))
+    response = TestClient(app.app).post("/identify", files={"file": ("pill.png", png.tobytes(), "image/png")})
+
+    assert response.status_code == 429
+    assert response.json()["detail"] == "Server is at capacity"
+    assert int(response.headers["Retry-After"]) >= 1
+
+
+def test_url_download_does_not_hold_an_admission_slot(monkeypatch):
+    from fastapi.testclient import TestClient
+    import app
+
+    controller = AdmissionController(max_in_flight=1, max_queue=0)
+    monkeypatch.setattr(app, 'admission_controller', controller)
+    in_flight_during_download = []
+
+    async def download(url):
+        in_flight_during_download.append(controller.in_flight)
+        ok, png = cv2.imencode('.png', np.zeros((8, 8, 3), dtype=np.uint8))
+        return bytearray(png.tobytes())
+
+    monkeypatch.setattr(app.image_processor, 'download_image_from_url', download)
+    response = TestClient(app.app).post("/identify-url", json={"image_url": "https://example.com/pill.png"})
+
+    assert response.status_code in (200, 404)
+    assert in_flight_during_download == [0]
+    assert controller.in_flight == 0
@@ -0,0 +1,53 @@
+import tracemalloc
+
+import pytest
+
+from benchmark import benchmark_pipeline, benchmark_stages, build_corpus
+from image_processor import ImageProcessor
+from pill_detector import PillDetector
+from processing_profiles import get_profile
+
+
+@pytest.fixture(scope='module')
+def corpus():
+    return build_corpus(2, seed=7)
+
+
+@pytest.fixture
+def detector():
+    detector = PillDetector()
+    detector.vision_client = None
+    return detector
+
+
+def _spy_on_matching(detector, monkeypatch):
+    calls = []
+    identify_pill = detector.identify_pill
+
+    async def spy(characteristics):
+        calls.append({'characteristics': characteristics, 'tracing': tracemalloc.is_tracing()})
+        return await identify_pill(characteristics)
+
+    monkeypatch.setattr(detector, 'identify_pill', spy)
+    return calls
+
+
+def test_stage_benchmark_matches_on_texture_descriptor(corpus, detector, monkeypatch):
+    calls = _spy_on_matching(detector, monkeypatch)
+    stages = benchmark_stages(corpus, ImageProcessor(), detector)
+
+    assert stages['matching']['count'] == len(corpus)
+    for call in calls:
+        assert call['characteristics']['texture_descriptor'] is not None
+        assert isinstance(call['characteristics']['texture'], str)
+
+
+def test_pipeline_is_timed_with_tracing_off(corpus, detector, monkeypatch):
+    calls = _spy_on_matching(detector, monkeypatch)
+    result = benchmark_pipeline(corpus, ImageProcessor(), detector, get_profile('fast'))
+
+    # One timed pass without tracemalloc, then one traced pass for peak memory
+    assert [call['tracing'] for call in calls] == [False] * len(corpus) + [True] * len(corpus)
+    assert result['latency']['count'] == len(corpus)
+    assert result['peak_traced_memory_mb'] > 0
+    assert not tracemalloc.is_tracing()
@@ -0,0 +1,86 @@
+import asyncio
+import random
+
+import numpy as np
+import pytest
+
+from pill_catalog import build_index
+from pill_detector import PillDetector
+
+COLORS = ['white', 'yellow', 'red', 'blue', 'unknown']
+SHAPES = ['round', 'oval', 'capsule', 'oblong']
+SIZES = ['small', 'medium', 'large']
+
+
+def _descriptor(rng):
+    # Texture descriptors are normalized histograms
+    histogram = rng.random(10)
+    return histogram / histogram.sum()
+
+
+def _random_catalog(rng, count=300):
+    pills = {}
+    for i in range(count):
+        pill_id = f"pill_{i}"
+        pills[pill_id] = {
+            'pill_id': pill_id,
+            'color': rng.choice(COLORS),
+            'shape': rng.choice(SHAPES),
+            'size': rng.choice(SIZES),
+            'imprint': rng.choice(['', f"A{i % 20}", f"B{i % 7}"]),
+            'features': {'texture_descriptor': _descriptor(rng).tolist()} if rng.random() < 0.5 else {}
+        }
+    return pills
+
+
+def _random_characteristics(rng):
+    characteristics = {
+        'color': rng.choice(COLORS),
+        'size': rng.choice(SIZES + ['unknown']),
+        'imprint': rng.choice(['', 'A3', 'B', 'Z9']),
+        'texture_descriptor': _descriptor(rng)
+    }
+    if rng.random() < 0.7:
+        characteristics['shape_similarities'] = {shape: float(rng.random()) for shape in SHAPES}
+        characteristics['shape'] = max(characteristics['shape_similarities'], key=characteristics['shape_similarities'].get)
+    if rng.random() < 0.5:
+        characteristics['classifier_scores'] = {f"pill_{i}": float(rng.random()) for i in rng.integers(0, 300, 5)}
+    return characteristics
+
+
+def _full_scan(detector, characteristics):
+    scores = {pill_id: detector._calculate_match_score(characteristics, pill_info)
+              for pill_id, pill_info in detector.pill_database.items()}
+    return max(scores.values())
+
+
+@pytest.fixture(scope='module')
+def detector():
+    detector = PillDetector()
+    rng = np.random.default_rng(7)
+    detector.pill_database = _random_catalog(rng)
+    detector.catalog_index = build_index(detector.pill_database)
+    return detector
+
+
+def test_index_narrowing_never_misses_a_match(detector):
+    rng = np.random.default_rng(11)
+    for _ in range(300):
+        characteristics = _random_characteristics(rng)
+        best_score = _full_scan(detector, characteristics)
+        match = asyncio.run(detector.identify_pill(characteristics))
+        if best_score > 0.6:
+            assert match is not None
+            assert match['confidence'] == pytest.approx(best_score)
+        else:
+            assert match is None
+
+
+def test_index_narrows_candidates(detector):
+    candidates = detector._candidate_ids({'color': 'blue', 'size': 'small', 'shape': 'round'})
+    assert candidates is not None
+    assert len(candidates) < len(detector.pill_database)
+
+
+def test_nothing_detected_scans_everything(detector):
+    assert detector._candidate_ids({'color': 'unknown'}) is None
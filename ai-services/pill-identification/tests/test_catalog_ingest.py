@@ -0,0 +1,126 @@
+import gzip
+import io
+import json
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+import catalog_ingest
+from pill_catalog import CATALOG_FORMAT_VERSION, _iter_json_array, iter_catalog_rows, load_catalog, write_catalog
+from pill_detector import PillDetector
+
+CSV_ROWS = (
+    "pill_id,name,color,shape,size,imprint,side_effects,image\n"
+    "white_round,Test Aspirin,white,round,small,A81,Nausea; Heartburn,white_round.png\n"
+    "blue_oval,Test Blue,blue,oval,medium,,,\n"
+    ",Missing ID,red,round,small,,,\n"
+)
+
+
+def _write_image(path):
+    image = np.full((200, 200, 3), 40, dtype=np.uint8)
+    cv2.circle(image, (100, 100), 60, (235, 235, 235), -1)
+    cv2.imwrite(str(path), image)
+
+
+def test_rows_stream_from_csv_json_and_jsonl(tmp_path):
+    rows = [{'pill_id': 'a', 'color': 'white'}, {'pill_id': 'b', 'color': 'blue'}]
+    (tmp_path / 'rows.json').write_text('  ' + json.dumps(rows))
+    (tmp_path / 'rows.jsonl').write_text('\n'.join(json.dumps(row) for row in rows) + '\n\n')
+    (tmp_path / 'rows.csv').write_text("pill_id,color\na,white\nb,blue\n")
+
+    for name in ['rows.json', 'rows.jsonl', 'rows.csv']:
+        assert list(iter_catalog_rows(str(tmp_path / name))) == rows
+
+
+def test_json_arrays_are_decoded_element_by_element():
+    rows = [{'pill_id': f'p{i}', 'imprint': 'A], {"x": 1}', 'notes': ['a', {'b': None}]} for i in range(50)]
+    text = ' [\n' + ',\n  '.join(json.dumps(row) for row in rows) + '\n]\n'
+
+    assert list(_iter_json_array(io.StringIO(text), chunk_size=7)) == rows
+    assert list(_iter_json_array(io.StringIO('[ ]'), chunk_size=1)) == []
+    with pytest.raises(ValueError):
+        list(_iter_json_array(io.StringIO('[{"pill_id": "a"}, {"pill_'), chunk_size=8))
+
+
+@pytest.mark.parametrize('name', ['catalog.json.gz', 'catalog.json', 'catalog'])
+def test_artifact_loads_whatever_its_suffix(tmp_path, name):
+    path = str(tmp_path / name)
+    content_hash = write_catalog(path, {'a': {'pill_id': 'a', 'color': 'white'}})
+
+    artifact = load_catalog(path)
+    assert artifact['content_hash'] == content_hash
+    assert artifact['pills'] == {'a': {'pill_id': 'a', 'color': 'white'}}
+
+
+def test_uncompressed_artifact_loads(tmp_path):
+    path = tmp_path / 'catalog.json.gz'
+    write_catalog(str(path), {'a': {'pill_id': 'a'}})
+    plain = tmp_path / 'plain.json'
+    plain.write_bytes(gzip.decompress(path.read_bytes()))
+
+    assert load_catalog(str(plain))['pills'] == {'a': {'pill_id': 'a'}}
+
+
+def test_catalog_round_trip_and_version_check(tmp_path):
+    pills = {'a': {'pill_id': 'a', 'color': 'White', 'shape': 'round', 'imprint': 'A1'}}
+    path = str(tmp_path / 'catalog.json.gz')
+
+    content_hash = write_catalog(path, pills, {'source': 'test'})
+    artifact = load_catalog(path)
+
+    assert artifact['pills'] == pills
+    assert artifact['content_hash'] == content_hash
+    assert artifact['index']['color'] == {'white': ['a']}
+    assert artifact['index']['size'] == {'unknown': ['a']}
+    assert artifact['index']['imprint'] == {'a1': ['a']}
+    assert not os.path.exists(path + '.tmp')
+
+    artifact['format_version'] = CATALOG_FORMAT_VERSION + 1
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        json.dump(artifact, f)
+    with pytest.raises(ValueError):
+        load_catalog(path)
+
+
+def test_ingest_builds_an_artifact_the_detector_loads(tmp_path, monkeypatch):
+    catalog_path = tmp_path / 'catalog.csv'
+    catalog_path.write_text(CSV_ROWS)
+    _write_image(tmp_path / 'white_round.png')
+    output = str(tmp_path / 'catalog.json.gz')
+
+    summary = catalog_ingest.ingest(str(catalog_path), output, workers=1, profile_name='fast')
+
+    assert summary['pills'] == 2
+    assert summary['failed'] == [{'pill_id': '', 'error': 'missing pill_id'}]
+    # The checkpoint is kept while rows failed, so a rerun only retries those
+    assert os.path.exists(output + '.partial.jsonl')
+
+    pills = load_catalog(output)['pills']
+    assert pills['white_round']['side_effects'] == ['Nausea', 'Heartburn']
+    assert pills['white_round']['features']['color'] == 'white'
+    assert pills['blue_oval']['features'] == {}
+    assert 'image' not in pills['white_round']
+
+    monkeypatch.setenv('PILL_CATALOG_PATH', output)
+    detector = PillDetector()
+    assert set(detector.pill_database) == {'white_round', 'blue_oval'}
+    assert detector.catalog_info['content_hash'] == summary['content_hash']
+
+
+def test_ingest_resumes_from_checkpoint(tmp_path):
+    catalog_path = tmp_path / 'catalog.jsonl'
+    catalog_path.write_text('\n'.join(json.dumps({'pill_id': pill_id, 'color': 'white'})
+                                      for pill_id in ['a', 'b', 'c']))
+    output = str(tmp_path / 'catalog.json.gz')
+    done = {'pill_id': 'a', 'color': 'white', 'features': {}, 'name': 'from checkpoint'}
+    # A run interrupted mid-write leaves a truncated last line
+    (tmp_path / 'catalog.json.gz.partial.jsonl').write_text(json.dumps(done) + '\n{"pill_id": "b", "col')
+
+    summary = catalog_ingest.ingest(str(catalog_path), output, workers=1)
+
+    assert summary['resumed'] == 1 and summary['pills'] == 3 and summary['failed'] == []
+    assert load_catalog(output)['pills']['a']['name'] == 'from checkpoint'
+    assert not os.path.exists(output + '.partial.jsonl')
@@ -0,0 +1,171 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from job_manager import InvalidCallbackURL, JobManager, JobStoreFull
+
+
+class FakeResponse:
+    status_code = 200
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.mark.parametrize('url', [
+    'ftp://hooks.example.com/done',
+    'file:///etc/passwd',
+    'http://',
+    'http://127.0.0.1:8080/hook',
+    'http://[::1]/hook',
+    'http://[::ffff:10.0.0.1]/hook',
+    'http://10.1.2.3/hook',
+    'http://192.168.0.10/hook',
+    'http://169.254.169.254/latest/meta-data/',
+    'http://0.0.0.0/hook',
+    'http://localhost/hook',
+])
+def test_rejects_non_public_callback_urls(url):
+    with pytest.raises(InvalidCallbackURL):
+        JobManager(workers=1).validate_callback_url(url)
+
+
+def test_accepts_public_ip_callback():
+    assert JobManager(workers=1).validate_callback_url('https://93.184.216.34/hook') == '93.184.216.34'
+
+
+def test_allowlist_limits_callback_hosts(monkeypatch):
+    monkeypatch.setenv('PILL_JOB_CALLBACK_ALLOWED_HOSTS', 'hooks.example.com, 10.0.0.5')
+    manager = JobManager(workers=1)
+
+    assert manager.validate_callback_url('https://HOOKS.example.com/done') == 'hooks.example.com'
+    assert manager.validate_callback_url('http://10.0.0.5:9000/done') == '10.0.0.5'
+    with pytest.raises(InvalidCallbackURL):
+        manager.validate_callback_url('https://evil.example.com/done')
+
+
+def test_submit_rejects_bad_callback_before_queueing():
+    async def scenario():
+        manager = JobManager(workers=1)
+        await manager.start()
+        try:
+            with pytest.raises(InvalidCallbackURL):
+                manager.submit(lambda: asyncio.sleep(0), callback_url='http://127.0.0.1/hook')
+            assert manager.jobs == {}
+        finally:
+            await manager.stop()
+
+    run(scenario())
+
+
+def test_slow_callbacks_do_not_hold_up_workers(monkeypatch):
+    monkeypatch.setenv('PILL_JOB_CALLBACK_ALLOWED_HOSTS', 'hooks.example.com')
+    monkeypatch.setenv('PILL_JOB_CALLBACK_CONCURRENCY', '1')
+    release = threading.Event()
+    posted = []
+
+    async def scenario():
+        manager = JobManager(workers=1)
+
+        def slow_post(url, job):
+            posted.append(job['job_id'])
+            release.wait(5)
+            return FakeResponse()
+
+        manager._post = slow_post
+        await manager.start()
+        try:
+            async def work(value):
+                return value
+
+            first = manager.submit(lambda: work(1), callback_url='https://hooks.example.com/a')
+            second = manager.submit(lambda: work(2), callback_url='https://hooks.example.com/b')
+
+            # The single worker finishes both jobs while the first callback is still blocked
+            done = await manager.get(second['job_id'], wait=2)
+            assert done['status'] == 'succeeded'
+            assert (await manager.get(first['job_id']))['status'] == 'succeeded'
+            # Only one delivery runs at a time
+            for _ in range(100):
+                if posted:
+                    break
+                await asyncio.sleep(0.01)
+            await asyncio.sleep(0.05)
+            assert posted == [first['job_id']]
+
+            release.set()
+            await asyncio.wait_for(asyncio.gather(*manager._callback_tasks), 5)
+            assert posted == [first['job_id'], second['job_id']]
+            assert first['callback_status'] == second['callback_status'] == 200
+        finally:
+            release.set()
+            await manager.stop()
+
+    run(scenario())
+
+
+def test_callback_host_is_resolved_again_before_delivery():
+    async def scenario():
+        manager = JobManager(workers=1)
+        manager._post = lambda url, job: pytest.fail("callback should not be sent")
+        await manager.start()
+        try:
+            async def work():
+                return 'ok'
+
+            # Passes the submission check; localhost fails the resolving check before delivery
+            job = manager.submit(work, callback_url='http://localhost/hook')
+            await manager.get(job['job_id'], wait=2)
+            await asyncio.wait_for(asyncio.gather(*manager._callback_tasks), 5)
+            assert job['callback_status'] == 'failed'
+        finally:
+            await manager.stop()
+
+    run(scenario())
+
+
+def test_finished_jobs_expire_after_ttl():
+    async def scenario():
+        manager = JobManager(workers=1, ttl=60)
+        await manager.start()
+        try:
+            async def work():
+                return 'ok'
+
+            job = manager.submit(work)
+            assert (await manager.get(job['job_id'], wait=2))['result'] == 'ok'
+
+            job['finished_at'] = time.time() - 61
+            assert await manager.get(job['job_id']) is None
+        finally:
+            await manager.stop()
+
+    run(scenario())
+
+
+def test_full_store_evicts_finished_jobs_then_rejects():
+    async def scenario():
+        manager = JobManager(workers=1, max_jobs=2, max_pending=10)
+        await manager.start()
+        try:
+            async def work():
+                return 'ok'
+
+            first = manager.submit(work)
+            await manager.get(first['job_id'], wait=2)
+
+            blocker = asyncio.Event()
+            manager.submit(blocker.wait)
+            manager.submit(blocker.wait)  # evicts the finished first job
+            assert first['job_id'] not in manager.jobs
+
+            with pytest.raises(JobStoreFull):
+                manager.submit(work)
+            blocker.set()
+        finally:
+            await manager.stop()
+
+    run(scenario())
@@ -0,0 +1,43 @@
+import asyncio
+
+import pytest
+
+from pill_detector import MATCH_THRESHOLD, PillDetector
+
+
+@pytest.fixture(scope='module')
+def detector():
+    return PillDetector()
+
+
+def _identify(detector, characteristics):
+    return asyncio.run(detector.identify_pill(characteristics))
+
+
+def test_fast_profile_exact_match_scores_full(detector):
+    # fast/balanced never read an imprint: its weight must not count against them
+    characteristics = {'color': 'white', 'shape': 'round', 'size': 'small'}
+    pill_info = detector.pill_database['lisinopril_10mg']
+    assert detector._calculate_match_score(characteristics, pill_info) == pytest.approx(1.0)
+
+
+def test_fast_profile_identifies_pill(detector):
+    match = _identify(detector, {'color': 'white', 'shape': 'round', 'size': 'small'})
+    assert match is not None
+    assert match['confidence'] > MATCH_THRESHOLD
+
+
+def test_unreadable_imprint_is_skipped(detector):
+    pill_info = detector.pill_database['lisinopril_10mg']
+    with_blank = {'color': 'white', 'shape': 'round', 'size': 'small', 'imprint': ''}
+    assert detector._calculate_match_score(with_blank, pill_info) == pytest.approx(1.0)
+
+
+def test_wrong_imprint_lowers_score(detector):
+    pill_info = detector.pill_database['lisinopril_10mg']
+    characteristics = {'color': 'white', 'shape': 'round', 'size': 'small', 'imprint': 'XYZ'}
+    assert detector._calculate_match_score(characteristics, pill_info) == pytest.approx(0.8 / 1.0)
+
+
+def test_single_feature_cannot_reach_threshold(detector):
+    assert _identify(detector, {'color': 'white'}) is None
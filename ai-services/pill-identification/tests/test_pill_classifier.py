@@ -0,0 +1,109 @@
+import asyncio
+import json
+
+import numpy as np
+import pytest
+
+import pill_classifier
+from pill_classifier import MicroBatcher, PillClassifier, batch_buckets
+
+
+class FakeInterpreter:
+    """Stands in for a TFLite interpreter scoring two labels by image brightness"""
+
+    instances = []
+
+    def __init__(self, model_path, num_threads):
+        self.num_threads = num_threads
+        self.shape = [1, 4, 4, 3]
+        self.allocations = 0
+        self.invoked_shapes = []
+        FakeInterpreter.instances.append(self)
+
+    def allocate_tensors(self):
+        self.allocations += 1
+
+    def resize_tensor_input(self, index, shape):
+        self.shape = list(shape)
+
+    def get_input_details(self):
+        return [{'index': 0, 'shape': np.array(self.shape), 'dtype': np.float32, 'quantization': (0.0, 0)}]
+
+    def get_output_details(self):
+        return [{'index': 1, 'quantization': (0.0, 0)}]
+
+    def set_tensor(self, index, value):
+        assert list(value.shape) == self.shape
+        self.input = value
+
+    def invoke(self):
+        self.invoked_shapes.append(self.input.shape[0])
+
+    def get_tensor(self, index):
+        brightness = self.input.mean(axis=(1, 2, 3))
+        return np.stack([brightness, 1 - brightness], axis=1).astype(np.float32)
+
+
+@pytest.fixture
+def classifier(tmp_path, monkeypatch):
+    FakeInterpreter.instances = []
+    monkeypatch.setattr(pill_classifier, '_load_interpreter_class', lambda: FakeInterpreter)
+    model_path = tmp_path / 'pills.tflite'
+    model_path.write_bytes(b'')
+    (tmp_path / 'pills.labels.json').write_text(json.dumps(['bright', 'dark']))
+    return PillClassifier(model_path=str(model_path), num_threads=1)
+
+
+def test_batch_buckets():
+    assert batch_buckets(1) == [1]
+    assert batch_buckets(8) == [1, 2, 4, 8]
+    assert batch_buckets(6) == [1, 2, 4, 6]
+
+
+def test_interpreter_is_built_when_the_batcher_starts(classifier):
+    # Nothing is built at import (in the gunicorn master), only in the worker
+    assert classifier.configured and not classifier.enabled
+    assert FakeInterpreter.instances == []
+
+    async def scenario():
+        batcher = MicroBatcher(classifier, max_batch_size=2)
+        await batcher.start()
+        try:
+            scores = await batcher.classify(np.full((10, 10, 3), 255, dtype=np.uint8))
+            assert scores['bright'] == pytest.approx(1.0)
+        finally:
+            await batcher.stop()
+
+    asyncio.run(scenario())
+    assert classifier.enabled
+    assert classifier.batch_sizes == [1, 2]
+    assert [interpreter.num_threads for interpreter in FakeInterpreter.instances] == [1, 1]
+
+
+def test_threads_are_divided_among_workers(tmp_path, monkeypatch):
+    monkeypatch.setattr(pill_classifier.os, 'cpu_count', lambda: 8)
+    monkeypatch.setenv('WEB_CONCURRENCY', '4')
+    monkeypatch.delenv('PILL_CLASSIFIER_THREADS', raising=False)
+    assert PillClassifier().num_threads == 2
+
+
+def test_batches_are_padded_to_warmed_sizes(classifier):
+    classifier.load()
+    classifier.warmup(batch_buckets(8))
+    allocations = [interpreter.allocations for interpreter in FakeInterpreter.instances]
+    assert len(FakeInterpreter.instances) == 4
+
+    for count in [1, 3, 5, 8, 2, 7, 11]:
+        values = [(i * 20) % 255 for i in range(count)]
+        images = [np.full((10, 10, 3), value, dtype=np.uint8) for value in values]
+
+        results = classifier.predict_batch(images)
+
+        assert len(results) == count
+        for value, scores in zip(values, results):
+            assert scores['bright'] == pytest.approx(value / 255.0, abs=1e-5)
+
+    # No interpreter was created or reallocated after warmup
+    assert [interpreter.allocations for interpreter in FakeInterpreter.instances] == allocations
+    invoked = {size for interpreter in FakeInterpreter.instances for size in interpreter.invoked_shapes}
+    assert invoked <= {1, 2, 4, 8}
@@ -0,0 +1,70 @@
+from fastapi.testclient import TestClient
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from upload_limit import UploadSizeLimitMiddleware
+
+CHUNK = b'x' * 1024
+
+
+def _chunks(count):
+    # A generator body is sent with Transfer-Encoding: chunked and no Content-Length
+    for _ in range(count):
+        yield CHUNK
+
+
+def _limited_app(seen):
+    async def upload(request: Request):
+        async for chunk in request.stream():
+            seen.append(len(chunk))
+        return JSONResponse({"received": sum(seen)})
+
+    app = Starlette(routes=[Route('/upload', upload, methods=['POST'])])
+    app.add_middleware(UploadSizeLimitMiddleware, max_body_bytes=4 * 1024)
+    return app
+
+
+def test_declared_length_over_cap_is_rejected_unread():
+    seen = []
+    response = TestClient(_limited_app(seen)).post('/upload', content=CHUNK * 5)
+    assert response.status_code == 413
+    assert seen == []
+
+
+def test_chunked_upload_over_cap_is_rejected():
+    seen = []
+    response = TestClient(_limited_app(seen)).post('/upload', content=_chunks(64))
+    assert response.status_code == 413
+    assert response.json() == {"detail": "Image upload too large"}
+    # The app never got more than the cap
+    assert sum(seen) <= 4 * 1024
+
+
+def test_chunked_upload_under_cap_passes():
+    seen = []
+    response = TestClient(_limited_app(seen)).post('/upload', content=_chunks(3))
+    assert response.status_code == 200
+    assert response.json() == {"received": 3 * 1024}
+
+
+def test_identify_rejects_chunked_upload_over_cap(monkeypatch):
+    import app
+
+    size = app.image_processor.max_image_bytes + 128 * 1024
+    boundary = 'pillboundary'
+
+    def multipart():
+        yield (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="pill.png"\r\n'
+               f'Content-Type: image/png\r\n\r\n').encode()
+        chunk = b'\0' * (1024 * 1024)
+        for _ in range(size // len(chunk) + 1):
+            yield chunk
+        yield f'\r\n--{boundary}--\r\n'.encode()
+
+    response = TestClient(app.app).post(
+        '/identify', content=multipart(),
+        headers={'Content-Type': f'multipart/form-data; boundary={boundary}'}
+    )
+    assert response.status_code == 413
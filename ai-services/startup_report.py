@@ -0,0 +1,90 @@
+"""Report where an AI service's cold start time goes.
+
+Usage:
+    python startup_report.py pill-identification
+    python startup_report.py chatbot --top 15
+
+Imports the service's ``app`` module in a fresh interpreter with
+``-X importtime``, breaks the import cost down by top-level package, and prints
+the component initialization times the app records in ``startup_timings``.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List, Any, Optional, Tuple
+
+PROBE = (
+    "import json, time\n"
+    "start = time.perf_counter()\n"
+    "import app\n"
+    "print(json.dumps({'wall_seconds': time.perf_counter() - start,"
+    " 'startup_timings': getattr(app, 'startup_timings', {})}))\n"
+)
+
+
+def parse_importtime(stderr: str) -> Dict[str, float]:
+    """Sum self import time (seconds) per top-level package from -X importtime output"""
+    totals: Dict[str, float] = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            # The column header line
+            continue
+        package = fields[2].strip().split('.')[0]
+        totals[package] = totals.get(package, 0.0) + int(fields[0]) / 1e6
+    return totals
+
+
+def profile_service(service_dir: str) -> Dict[str, Any]:
+    """Import a service's app in a subprocess and collect its startup costs"""
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', PROBE],
+        cwd=service_dir, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing app failed:\n{completed.stderr[-2000:]}")
+
+    # The app may print to stdout while importing; the probe's report is last
+    report = json.loads(completed.stdout.strip().splitlines()[-1])
+    report['imports'] = parse_importtime(completed.stderr)
+    return report
+
+
+def _top(costs: Dict[str, float], count: int) -> List[Tuple[str, float]]:
+    return sorted(costs.items(), key=lambda item: item[1], reverse=True)[:count]
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Break down an AI service's cold start time")
+    parser.add_argument('service', help="Service directory, e.g. chatbot or pill-identification")
+    parser.add_argument('--top', type=int, default=10, help="Number of packages to list")
+    parser.add_argument('--json', action='store_true', help="Print the full report as JSON")
+    args = parser.parse_args(argv)
+
+    service_dir = args.service
+    if not os.path.isdir(service_dir):
+        service_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), args.service)
+
+    report = profile_service(service_dir)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    import_total = sum(report['imports'].values())
+    init_total = sum(report['startup_timings'].values())
+    print(f"app import wall time  {report['wall_seconds']:8.3f} s")
+    print(f"  module imports      {import_total:8.3f} s")
+    for package, seconds in _top(report['imports'], args.top):
+        print(f"    {package:<24} {seconds:8.3f} s")
+    print(f"  component init      {init_total:8.3f} s")
+    for component, seconds in _top(report['startup_timings'], len(report['startup_timings'])):
+        print(f"    {component:<24} {seconds:8.3f} s")
+
+
+if __name__ == "__main__":
+    main()